@@ -0,0 +1,122 @@
+"""Compare embedding backends on latency, throughput and agreement with the fp32 reference.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py --onnx-path bge-m3-onnx/model.int8.onnx --threads 4 --dims 1024 512 256
+
+Export the ONNX model first with ``hanabi.models.embedding.export_onnx``.
+Agreement is measured on pairs of Falco-style tokens: the share of pairs where
+``cosine >= DEFAULT_THRESHOLD`` gives the same decision as torch fp32, plus the
+mean absolute cosine difference.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hanabi.models.embedding import DEFAULT_MODEL_NAME, DEFAULT_THRESHOLD, _BACKENDS, EmbeddingBackend
+
+
+def falco_tokens(count: int, seed: int = 7) -> List[str]:
+    """Synthetic tokens shaped like evt.type / proc.name / fd.name / cmdline keys."""
+
+    rng = random.Random(seed)
+    procs = ["bash", "sh", "python3", "nginx", "node", "java", "curl", "wget", "sshd", "runc", "containerd-shim"]
+    dirs = ["/etc", "/usr/lib", "/var/log/nginx", "/proc", "/sys/fs/cgroup", "/tmp", "/home/app/.cache"]
+    files = ["passwd", "shadow", "access.log", "status", "cgroup.freeze", "libssl.so.3", "config.json"]
+    args = ["--help", "-c", "--config", "-v", "--port", "--daemon", "-rf", "--user"]
+    evts = ["execve", "clone", "open", "openat", "connect", "accept", "close", "unlink"]
+    tokens = set()
+    while len(tokens) < count:
+        kind = rng.randrange(5)
+        if kind == 0:
+            tokens.add(rng.choice(procs) + (str(rng.randrange(10)) if rng.random() < 0.2 else ""))
+        elif kind == 1:
+            tokens.add(f"{rng.choice(dirs)}/{rng.randrange(4096) if rng.random() < 0.3 else rng.choice(files)}")
+        elif kind == 2:
+            tokens.add(rng.choice(args))
+        elif kind == 3:
+            tokens.add(f"10.0.{rng.randrange(4)}.{rng.randrange(255)}:{rng.choice([80, 443, 5432, 6379])}:ipv4")
+        else:
+            tokens.add(rng.choice(evts))
+    return sorted(tokens)
+
+
+def build(kind: str, args: argparse.Namespace, truncate_dim: int | None) -> EmbeddingBackend:
+    return _BACKENDS[kind](
+        model_name=args.model,
+        device="cpu",
+        batch_size=args.batch_size,
+        num_threads=args.threads,
+        truncate_dim=truncate_dim,
+        onnx_path=args.onnx_path,
+    )
+
+
+def measure(backend: EmbeddingBackend, tokens: List[str], singles: int) -> Dict[str, float]:
+    backend.encode(tokens[:2])  # warm up kernels and allocator
+    latencies = []
+    for token in tokens[:singles]:
+        started = time.perf_counter()
+        backend.encode([token])
+        latencies.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    backend.encode(tokens)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "texts_per_s": len(tokens) / elapsed,
+    }
+
+
+def agreement(reference: np.ndarray, candidate: np.ndarray, pairs: np.ndarray) -> Dict[str, float]:
+    ref_scores = np.einsum("ij,ij->i", reference[pairs[:, 0]], reference[pairs[:, 1]])
+    cand_scores = np.einsum("ij,ij->i", candidate[pairs[:, 0]], candidate[pairs[:, 1]])
+    same = (ref_scores >= DEFAULT_THRESHOLD) == (cand_scores >= DEFAULT_THRESHOLD)
+    return {"agreement": float(same.mean()), "mean_abs_delta": float(np.abs(ref_scores - cand_scores).mean())}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--tokens", type=int, default=512)
+    parser.add_argument("--singles", type=int, default=64, help="single-text calls used for latency")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--onnx-path", default=os.environ.get("HANABI_EMBEDDING_ONNX_PATH"))
+    parser.add_argument("--dims", type=int, nargs="*", default=[], help="extra Matryoshka truncation sizes")
+    args = parser.parse_args()
+
+    tokens = falco_tokens(args.tokens)
+    rng = np.random.default_rng(0)
+    pairs = np.array(list(itertools.combinations(range(len(tokens)), 2)))
+    pairs = pairs[rng.choice(len(pairs), size=min(len(pairs), 20_000), replace=False)]
+
+    kinds = ["torch", "torch-int8"] + (["onnx"] if args.onnx_path else [])
+    variants = [(kind, None) for kind in kinds] + [(kind, dim) for dim in args.dims for kind in kinds]
+
+    reference = build("torch", args, None).encode(tokens)
+    print(f"{'backend':<14}{'dim':>6}{'p50 ms':>10}{'p95 ms':>10}{'texts/s':>10}{'agree':>9}{'|dcos|':>9}")
+    for kind, dim in variants:
+        backend = build(kind, args, dim)
+        timing = measure(backend, tokens, args.singles)
+        quality = agreement(reference, backend.encode(tokens), pairs)
+        print(
+            f"{kind:<14}{dim or reference.shape[1]:>6}{timing['p50_ms']:>10.2f}{timing['p95_ms']:>10.2f}"
+            f"{timing['texts_per_s']:>10.1f}{quality['agreement']:>9.4f}{quality['mean_abs_delta']:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Throughput of the event sources fed by a local Falco event generator.
+
+Usage:
+    python benchmarks/bench_event_sources.py --events 200000 --http-events 20000
+
+A generator writes synthetic Falco JSON events into each source the way Falco
+would: appending lines to a file (file_output), streaming lines into a Unix
+socket and a named pipe (program_output), and POSTing one event per request
+(http_output). The consumer drains the source with ``get_batch`` and the
+benchmark reports events/s from the first write to the last event consumed.
+The docker source needs a running daemon and is not measured here.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hanabi.utils.queue import EventSource
+from hanabi.utils.sources import FileTailSource, HttpWebhookSource, UnixSocketSource
+
+
+def falco_events(count: int) -> List[bytes]:
+    lines = []
+    for i in range(count):
+        event = {
+            "hostname": "node-1",
+            "output": f"Syscall event {i}",
+            "priority": "Notice",
+            "rule": ("process", "network", "file")[i % 3],
+            "time": "2025-01-01T00:00:00.000000000Z",
+            "output_fields": {
+                "container.name": f"app-{i % 8}",
+                "evt.type": ("execve", "connect", "openat")[i % 3],
+                "proc.name": ("bash", "curl", "cat")[i % 3],
+                "fd.name": f"/var/lib/app/{i % 500}/data.json",
+                "evt.time": 1735689600000000000 + i,
+            },
+        }
+        lines.append(json.dumps(event).encode() + b"\n")
+    return lines
+
+
+def write_file(path: str, lines: List[bytes]) -> None:
+    with open(path, "ab") as f:
+        for start in range(0, len(lines), 64):
+            f.write(b"".join(lines[start:start + 64]))
+            f.flush()
+
+
+def write_socket(path: str, lines: List[bytes]) -> None:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        for start in range(0, len(lines), 64):
+            sock.sendall(b"".join(lines[start:start + 64]))
+
+
+def write_fifo(path: str, lines: List[bytes]) -> None:
+    with open(path, "wb") as fifo:
+        for start in range(0, len(lines), 64):
+            fifo.write(b"".join(lines[start:start + 64]))
+
+
+def write_http(source: HttpWebhookSource, lines: List[bytes]) -> None:
+    host, port = source._server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port)
+    for line in lines:
+        conn.request("POST", "/", body=line, headers={"Content-Type": "application/json"})
+        conn.getresponse().read()
+    conn.close()
+
+
+def measure(source: EventSource, write: Callable[[List[bytes]], None], lines: List[bytes]) -> Dict[str, float]:
+    source.start()
+    time.sleep(0.1)
+    started = time.perf_counter()
+    writer = threading.Thread(target=write, args=(lines,))
+    writer.start()
+    received = 0
+    deadline = time.monotonic() + 120
+    while received < len(lines) and time.monotonic() < deadline:
+        received += len(source.get_batch(1024, timeout=1))
+    elapsed = time.perf_counter() - started
+    writer.join()
+    source.stop()
+    return {"events": received, "seconds": elapsed, "events_per_s": received / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--http-events", type=int, default=20_000, help="one POST per event, so keep it smaller")
+    args = parser.parse_args()
+
+    lines = falco_events(args.events)
+    workdir = tempfile.mkdtemp(prefix="hanabi-sources-")
+    file_path = os.path.join(workdir, "events.json")
+    open(file_path, "wb").close()
+    fifo_path = os.path.join(workdir, "events.fifo")
+    os.mkfifo(fifo_path)
+    socket_path = os.path.join(workdir, "events.sock")
+
+    http_source = HttpWebhookSource("127.0.0.1:0", max_queue_size=100_000)
+    runs = [
+        ("file", FileTailSource(file_path, max_queue_size=100_000), lambda l: write_file(file_path, l), lines),
+        ("socket", UnixSocketSource(socket_path, max_queue_size=100_000), lambda l: write_socket(socket_path, l), lines),
+        ("fifo", UnixSocketSource(fifo_path, max_queue_size=100_000), lambda l: write_fifo(fifo_path, l), lines),
+        ("http", http_source, lambda l: write_http(http_source, l), lines[:args.http_events]),
+    ]
+
+    results = []
+    for label, source, write, batch in runs:
+        results.append((label, measure(source, write, batch)))
+    print(f"{'source':<10}{'events':>10}{'seconds':>10}{'events/s':>12}")
+    for label, result in results:
+        print(f"{label:<10}{result['events']:>10}{result['seconds']:>10.2f}{result['events_per_s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
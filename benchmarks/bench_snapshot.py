@@ -0,0 +1,97 @@
+"""Size and speed of the binary HBT snapshot against the JSON model dict.
+
+Usage:
+    python benchmarks/bench_snapshot.py --operations 20 --processes 100 --attributes 20 --touched 0.01
+
+Builds a synthetic three-branch columnar tree and compares:
+
+* ``json``: ``json.dumps(tree.to_dict())``, what ``get_model()`` returns and
+  ``main.py`` prints, and ``json.loads`` of the result;
+* ``full``: ``snapshot.encode_full`` and decoding it back into a tree;
+* ``delta``: ``snapshot.encode_delta`` after incrementing a fraction of the
+  leaves since the last checkpoint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hanabi.models import snapshot
+from hanabi.models.hbt_columnar import ColumnarTree
+
+
+def build(operations: int, processes: int, attributes: int) -> Tuple[ColumnarTree, list]:
+    tree = ColumnarTree()
+    leaves = []
+    for branch in ("process_branch", "network_branch", "file_branch"):
+        branch_node = tree.root.add_child(branch, "branch")
+        for op in range(operations):
+            op_node = branch_node.add_child(f"op_{op}", "operation")
+            for proc in range(processes):
+                proc_node = op_node.add_child(f"proc_{proc % 97}", "process_name")
+                for attr in range(attributes):
+                    leaf = proc_node.add_child(f"/var/lib/app/{proc}/{attr}", "file_name")
+                    leaf.increment_events_count(1 + (proc * attr) % 7)
+                    leaves.append(leaf)
+    return tree, leaves
+
+
+def timed(func: Callable[[], object], repeat: int = 3) -> Tuple[object, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def load_full(data: bytes) -> ColumnarTree:
+    arrays, _ = snapshot.merge([snapshot.decode(data)])
+    return ColumnarTree.from_arrays(arrays)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=100)
+    parser.add_argument("--attributes", type=int, default=20)
+    parser.add_argument("--touched", type=float, default=0.01, help="fraction of leaves updated before the delta")
+    args = parser.parse_args()
+
+    tree, leaves = build(args.operations, args.processes, args.attributes)
+    results: Dict[str, Dict[str, float]] = {}
+
+    text, dump_s = timed(lambda: json.dumps(tree.to_dict()))
+    _, parse_s = timed(lambda: json.loads(text))
+    results["json"] = {"bytes": len(text.encode()), "write_s": dump_s, "read_s": parse_s}
+
+    full, encode_s = timed(lambda: snapshot.encode_full(tree))
+    restored, decode_s = timed(lambda: load_full(full))
+    assert restored.to_dict() == tree.to_dict()
+    results["full"] = {"bytes": len(full), "write_s": encode_s, "read_s": decode_s}
+
+    checkpoint_ns = time.monotonic_ns()
+    base = (len(tree), len(tree.names), len(tree.types))
+    for leaf in random.Random(0).sample(leaves, int(len(leaves) * args.touched)):
+        leaf.increment_events_count()
+    delta, delta_s = timed(lambda: snapshot.encode_delta(tree, checkpoint_ns, *base))
+    merged, merge_s = timed(lambda: ColumnarTree.from_arrays(
+        snapshot.merge([snapshot.decode(full), snapshot.decode(delta)])[0]))
+    assert merged.to_dict() == tree.to_dict()
+    results["delta"] = {"bytes": len(delta), "write_s": delta_s, "read_s": merge_s}
+
+    print(f"{len(tree)} nodes, {args.touched:.1%} of {len(leaves)} leaves touched before the delta")
+    print(f"{'format':<8}{'bytes':>14}{'write ms':>12}{'read ms':>12}")
+    for label, result in results.items():
+        print(f"{label:<8}{result['bytes']:>14,}{result['write_s'] * 1000:>12.1f}{result['read_s'] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
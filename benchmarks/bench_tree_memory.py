@@ -0,0 +1,103 @@
+"""Bytes per node of the HBT tree: dict-based, slotted and columnar storage.
+
+Usage:
+    python benchmarks/bench_tree_memory.py --operations 50 --processes 200 --attributes 20
+
+Builds the same synthetic three-branch tree with each storage layout and
+measures the allocated memory with tracemalloc, plus the time spent on
+``increment_events_count`` for every leaf.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from hanabi.models.hbt_columnar import ColumnarTree
+from hanabi.models.tree_node import TreeNode
+
+
+class LegacyTreeNode:
+    """The TreeNode layout before __slots__: per-instance dicts and datetime stamps."""
+
+    def __init__(self, name: str, node_type: str):
+        self.name = name
+        self.node_type = node_type
+        self.children: Dict[str, LegacyTreeNode] = {}
+        self.events_count = 0
+        self.metadata: Dict[str, Any] = {}
+        self.last_updated = datetime.now()
+
+    def add_child(self, child_name: str, child_type: str) -> "LegacyTreeNode":
+        if child_name not in self.children:
+            self.children[child_name] = LegacyTreeNode(child_name, child_type)
+        return self.children[child_name]
+
+    def increment_events_count(self, count: int = 1):
+        self.events_count += count
+        self.last_updated = datetime.now()
+
+
+def columnar_root(name: str, node_type: str):
+    return ColumnarTree().root
+
+
+def build(node_class, operations: int, processes: int, attributes: int):
+    root = node_class("root", "root")
+    leaves = []
+    for branch in ("process_branch", "network_branch", "file_branch"):
+        branch_node = root.add_child(branch, "branch")
+        for op in range(operations):
+            op_node = branch_node.add_child(f"op_{op}", "operation")
+            for proc in range(processes):
+                # Names are rebuilt per node, as they are when decoded from Falco JSON.
+                proc_node = op_node.add_child("".join(["proc_", str(proc % 97)]), "process_name")
+                for attr in range(attributes):
+                    leaves.append(proc_node.add_child(f"/var/lib/app/{proc}/{attr}", "file_name"))
+    return root, leaves
+
+
+def count_nodes(node) -> int:
+    return 1 + sum(count_nodes(child) for child in node.children.values())
+
+
+def measure(node_class, args: argparse.Namespace) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    root, leaves = build(node_class, args.operations, args.processes, args.attributes)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The leaves list is bookkeeping for the benchmark, not part of the tree.
+    allocated -= sys.getsizeof(leaves)
+    nodes = count_nodes(root)
+
+    started = time.perf_counter()
+    for leaf in leaves:
+        leaf.increment_events_count()
+    increment_ns = (time.perf_counter() - started) / len(leaves) * 1e9
+    del root, leaves
+    return {"nodes": nodes, "bytes_per_node": allocated / nodes, "increment_ns": increment_ns}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=100)
+    parser.add_argument("--attributes", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'layout':<10}{'nodes':>10}{'bytes/node':>12}{'increment ns':>14}")
+    for label, node_class in (("legacy", LegacyTreeNode), ("slotted", TreeNode), ("columnar", columnar_root)):
+        result = measure(node_class, args)
+        print(f"{label:<10}{result['nodes']:>10}{result['bytes_per_node']:>12.1f}{result['increment_ns']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+# 检测期告警
+#
+# 分支处理器在检测期发现偏离画像的行为时，生成结构化的Alert并发布到AlertChannel。
+# 告警走独立的通道，不排在批量事件之后：订阅者各自持有有界队列，发布时立即唤醒；
+# 分片模式下各进程的告警经专用队列转发回主进程（见manager.py）。
+# AlertMetrics按security_alerts_total{container_name,rule,priority,source}计数，
+# 并统计从Falco事件时间到告警发布的延迟；AlertServer以SSE推送告警并提供/metrics。
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+# security_alerts_total 的 source 标签：由HBT检测产生
+ALERT_SOURCE = "hanabi"
+# 告警HTTP服务（SSE与/metrics）的监听地址
+ALERT_HTTP_ENV = "HANABI_ALERT_HTTP"
+DEFAULT_ALERT_HTTP = "0.0.0.0:9877"
+# 未命中层级 -> (规则, 优先级)，层级越浅偏离越大
+LEVEL_RULES = {
+    "operation": ("hbt_unknown_operation", "Critical"),
+    "process": ("hbt_unknown_process", "Error"),
+    "attribute": ("hbt_unknown_attribute", "Warning"),
+}
+LEVELS = ("operation", "process", "attribute")
+# Falco优先级 -> SSE封装中的severity
+SEVERITY = {"Critical": "error", "Error": "error", "Warning": "warn"}
+# 告警延迟直方图的桶（秒），0.8对应路线图中800ms的推送目标
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.8, 1.0, 2.5, 5.0, 10.0)
+# SSE心跳间隔（秒）
+HEARTBEAT_SECONDS = 30
+
+
+class Alert:
+    """一次检测期的偏离"""
+
+    __slots__ = ("container_name", "rule", "priority", "source", "branch", "path",
+                 "event_time_ns", "emitted_ns", "fields")
+
+    def __init__(self, container_name: str, rule: str, priority: str, branch: str,
+                 path: Tuple[str, ...], fields: Dict[str, Any], event_time_ns: Optional[int] = None,
+                 source: str = ALERT_SOURCE):
+        """
+        Args:
+            container_name: 容器名
+            rule: 告警规则，见LEVEL_RULES
+            priority: Falco风格的优先级
+            branch: 产生告警的分支（process/network/file）
+            path: 从分支根开始的名称路径，最后一个元素是未命中的一层
+            fields: 触发告警的Falco事件输出字段
+            event_time_ns: Falco事件时间（纳秒），未知时为None
+            source: 告警来源
+        """
+        self.container_name = container_name
+        self.rule = rule
+        self.priority = priority
+        self.source = source
+        self.branch = branch
+        self.path = path
+        self.event_time_ns = event_time_ns
+        self.emitted_ns = None
+        self.fields = fields
+
+    @property
+    def latency_seconds(self) -> Optional[float]:
+        """从Falco事件时间到告警发布的延迟"""
+        if self.event_time_ns is None or self.emitted_ns is None:
+            return None
+        return (self.emitted_ns - self.event_time_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "container_name": self.container_name,
+            "rule": self.rule,
+            "priority": self.priority,
+            "severity": SEVERITY.get(self.priority, "info"),
+            "source": self.source,
+            "branch": self.branch,
+            "path": list(self.path),
+            "event_time_ns": self.event_time_ns,
+            "emitted_ns": self.emitted_ns,
+            "output_fields": self.fields,
+        }
+
+    def envelope(self) -> Dict[str, Any]:
+        """SSE封装，见docs/sse-envelope.md"""
+        stamp = self.emitted_ns if self.emitted_ns is not None else time.time_ns()
+        return {
+            "type": "alert",
+            "ts": datetime.fromtimestamp(stamp / 1e9, tz=timezone.utc).isoformat(),
+            "container": self.container_name,
+            "payload": self.to_dict(),
+        }
+
+
+def make_alert(container_name: str, branch: str, path: Tuple[str, ...], depth: int,
+               fields: Dict[str, Any]) -> Alert:
+    """
+    按未命中的层级生成告警
+
+    Args:
+        container_name: 容器名
+        branch: 分支名
+        path: 事件在分支中的完整路径
+        depth: 能匹配上的前缀层数，path[depth]是未命中的一层
+        fields: Falco事件输出字段
+
+    Returns:
+        Alert: 告警
+    """
+    rule, priority = LEVEL_RULES[LEVELS[min(depth, len(LEVELS) - 1)]]
+    event_time = fields.get("evt.time")
+    return Alert(container_name, rule, priority, branch, path[:depth + 1], fields,
+                 event_time if isinstance(event_time, int) else None)
+
+
+class AlertStream:
+    """
+    一个订阅者的告警流：有界队列，满时丢弃最旧的告警，可迭代
+    """
+
+    def __init__(self, channel: "AlertChannel", maxsize: int = 1024):
+        self.channel = channel
+        self._items: deque = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def _push(self, alert: Alert):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(alert)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Alert]:
+        """
+        取出下一条告警
+
+        Args:
+            timeout: 最长等待秒数，None为一直等待
+
+        Returns:
+            Alert: 告警，超时或流已关闭时返回None
+        """
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def __iter__(self) -> Iterator[Alert]:
+        while not self.closed:
+            alert = self.get(timeout=1.0)
+            if alert is not None:
+                yield alert
+
+    def close(self):
+        self.channel.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class AlertChannel:
+    """
+    进程内的告警通道。发布时同步调用监听函数（计数、跨进程转发），
+    并把告警放入每个订阅者的流
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: List[AlertStream] = []
+        self._listeners: List[Callable[[Alert], None]] = []
+        self.published = 0
+
+    def publish(self, alert: Alert):
+        # 发布时刻即告警的发出时间，转发到主进程的告警在主进程重新记录
+        alert.emitted_ns = time.time_ns()
+        with self._lock:
+            self.published += 1
+            listeners = list(self._listeners)
+            streams = list(self._streams)
+        for listener in listeners:
+            listener(alert)
+        for stream in streams:
+            stream._push(alert)
+
+    def subscribe(self, maxsize: int = 1024) -> AlertStream:
+        stream = AlertStream(self, maxsize)
+        with self._lock:
+            self._streams.append(stream)
+        return stream
+
+    def unsubscribe(self, stream: AlertStream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def add_listener(self, listener: Callable[[Alert], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Alert], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+# 默认通道，分支处理器的告警发布到这里
+ALERTS = AlertChannel()
+
+
+class AlertMetrics:
+    """
+    prometheus_client的自定义collector：security_alerts_total与告警延迟直方图，
+    计数在发布时累加，抓取时生成指标
+    """
+
+    def __init__(self, channel: AlertChannel = ALERTS):
+        self.channel = channel
+        self._lock = threading.Lock()
+        # (container_name, rule, priority, source) -> 告警数
+        self.counts: Dict[Tuple[str, str, str, str], int] = {}
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        channel.add_listener(self.observe)
+
+    def observe(self, alert: Alert):
+        key = (alert.container_name, alert.rule, alert.priority, alert.source)
+        latency = alert.latency_seconds
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if latency is not None:
+                index = 0
+                while index < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[index]:
+                    index += 1
+                self.bucket_counts[index] += 1
+                self.latency_sum += latency
+
+    def collect(self):
+        with self._lock:
+            counts = list(self.counts.items())
+            bucket_counts = list(self.bucket_counts)
+            latency_sum = self.latency_sum
+
+        alerts = CounterMetricFamily(
+            'security_alerts', 'Security alerts raised by HBT detection.',
+            labels=['container_name', 'rule', 'priority', 'source'])
+        for key, count in counts:
+            alerts.add_metric(list(key), count)
+        yield alerts
+
+        buckets = []
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, float("inf")), bucket_counts):
+            cumulative += count
+            buckets.append(("+Inf" if bound == float("inf") else str(bound), cumulative))
+        latency = HistogramMetricFamily(
+            'hanabi_alert_latency_seconds', 'Delay from Falco event time to alert emission.')
+        latency.add_metric([], buckets, latency_sum)
+        yield latency
+
+
+class AlertServer:
+    """
+    告警HTTP服务：GET /alerts/stream 以SSE推送告警（可用?container=过滤），GET /metrics 导出告警指标
+    """
+
+    def __init__(self, address: str = DEFAULT_ALERT_HTTP, channel: AlertChannel = ALERTS):
+        """
+        Args:
+            address: host:port
+            channel: 推送的告警通道
+        """
+        host, _, port = address.rpartition(":")
+        self.address = (host or "0.0.0.0", int(port))
+        self.channel = channel
+        self.registry = CollectorRegistry()
+        self.metrics = AlertMetrics(channel)
+        self.registry.register(self.metrics)
+        self._server = None
+        self._thread = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                if path == "/metrics":
+                    body = generate_latest(server.registry)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif path == "/alerts/stream":
+                    params = dict(pair.partition("=")[::2] for pair in query.split("&") if pair)
+                    self._stream(params.get("container"))
+                else:
+                    self.send_error(404)
+
+            def _stream(self, container):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                stream = server.channel.subscribe()
+                last_write = time.monotonic()
+                try:
+                    while True:
+                        alert = stream.get(timeout=1.0)
+                        if alert is not None and container in (None, alert.container_name):
+                            self._send(alert.envelope())
+                            last_write = time.monotonic()
+                        elif time.monotonic() - last_write >= HEARTBEAT_SECONDS:
+                            self._send({"type": "heartbeat", "ts": datetime.now(timezone.utc).isoformat(),
+                                        "container": container, "payload": {}})
+                            last_write = time.monotonic()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    stream.close()
+
+            def _send(self, envelope):
+                self.wfile.write(b"event: " + envelope["type"].encode() + b"\ndata: "
+                                 + json.dumps(envelope, ensure_ascii=False, default=str).encode() + b"\n\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "AlertServer":
+        self._server = ThreadingHTTPServer(self.address, self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.2},
+                                        name="alert-http", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self.channel.remove_listener(self.metrics.observe)
@@ -0,0 +1,228 @@
+# 按镜像共享的基线
+#
+# 同一镜像的每个容器（贡献者）把收敛后的模型发布为镜像目录下的一个快照文件，
+# 重复发布只覆盖自己的文件。读取基线时合并全部贡献者（见merge.py），
+# 合并结果按贡献者文件的签名缓存为同目录下的merged-<签名>.hbtm，
+# 没有贡献者变化时新副本直接读取缓存，不再重新合并；多个进程共用同一目录时缓存同样有效。
+# 超过保留时间未再发布的贡献者（容器已退出）不参与合并，并在发布和关闭时删除。
+
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .hbt_builder import HBTBuilder
+
+# 共享基线目录：同一镜像的容器学到的模型合并为一个基线，新副本直接继承
+BASELINE_DIR_ENV = "HANABI_BASELINE_DIR"
+# 贡献者的保留时间（秒），超过该时间未再发布的贡献者被剪除，0表示永久保留
+BASELINE_MAX_AGE_ENV = "HANABI_BASELINE_MAX_AGE"
+DEFAULT_BASELINE_MAX_AGE = 7 * 24 * 3600
+_MERGED_PREFIX = "merged-"
+_MERGED_SUFFIX = ".hbtm"
+# Falco中容器镜像仓库的字段
+IMAGE_FIELD = "container.image.repository"
+
+
+def image_repository(event: Dict[str, Any]) -> Optional[str]:
+    """
+    事件所属容器的镜像仓库
+
+    Args:
+        event: Falco事件，可以带output_fields，也可以本身就是输出字段
+
+    Returns:
+        str: 镜像仓库，宿主机进程或没有该字段时返回None
+    """
+    fields = event.get("output_fields", event)
+    value = fields.get(IMAGE_FIELD)
+    return str(value) if value else None
+
+
+class BaselineStore:
+    """
+    按image_repository保存共享基线。
+
+    每个贡献者（容器）只保存自己最新的一份快照，重复发布只会覆盖而不会重复计数；
+    读取基线时把同一镜像的全部贡献者合并，合并满足结合律与交换律，与顺序无关。
+    合并结果按贡献者签名缓存，贡献者不变时不再重新合并。
+    """
+
+    def __init__(self, directory: str, semantic: bool = False, max_age: float = None):
+        """
+        初始化基线存储
+
+        Args:
+            directory: 基线目录，每个镜像一个子目录
+            semantic: 合并时是否按n-gram/向量相似度对账节点名
+            max_age: 贡献者保留时间（秒），默认读取HANABI_BASELINE_MAX_AGE，未设置为7天
+        """
+        self.directory = directory
+        self.semantic = semantic
+        if max_age is None:
+            max_age = float(os.environ.get(BASELINE_MAX_AGE_ENV, DEFAULT_BASELINE_MAX_AGE))
+        self.max_age = max_age
+        self.merges = 0
+        self.cache_hits = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _digest(value: str) -> str:
+        return hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+
+    def _image_dir(self, image: str) -> str:
+        return os.path.join(self.directory, self._digest(image))
+
+    def _expired(self, path: str, now: float) -> bool:
+        try:
+            return bool(self.max_age) and now - os.stat(path).st_mtime > self.max_age
+        except FileNotFoundError:
+            return True
+
+    def contributors(self, image: str) -> List[str]:
+        """某镜像仍在保留期内的贡献者的快照路径"""
+        directory = self._image_dir(image)
+        if not os.path.isdir(directory):
+            return []
+        now = time.time()
+        paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".hbts")]
+        return [path for path in paths if not self._expired(path, now)]
+
+    def prune(self, image: str = None) -> int:
+        """
+        删除超过保留时间的贡献者快照以及过期的合并缓存
+
+        Args:
+            image: 镜像仓库，默认处理全部镜像
+
+        Returns:
+            int: 删除的贡献者数
+        """
+        if image is not None:
+            directories = [self._image_dir(image)]
+        else:
+            directories = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+        now = time.time()
+        removed = 0
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            names = os.listdir(directory)
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith(".hbts") and self._expired(path, now):
+                    os.unlink(path)
+                    removed += 1
+            if removed or not any(name.endswith(".hbts") for name in names):
+                self._drop_merged(directory)
+        return removed
+
+    def _signature(self, paths: List[str]) -> str:
+        """贡献者集合及各自版本的签名，任一贡献者重新发布、新增或被剪除都会改变签名"""
+        parts = [f"semantic={self.semantic}"]
+        for path in paths:
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_ino}:{st.st_mtime_ns}:{st.st_size}")
+        return self._digest("\n".join(parts))
+
+    @staticmethod
+    def _drop_merged(directory: str, keep: str = None):
+        for name in os.listdir(directory):
+            if name.startswith(_MERGED_PREFIX) and name.endswith(_MERGED_SUFFIX) and name != keep:
+                try:
+                    os.unlink(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def publish(self, image: str, contributor: str, builder: HBTBuilder):
+        """
+        发布（覆盖）一个贡献者的模型
+
+        Args:
+            image: 镜像仓库
+            contributor: 贡献者标识，通常为容器ID
+            builder: 贡献者的模型
+        """
+        directory = self._image_dir(image)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self._digest(contributor)}.hbts")
+        tmp_path = f"{path}.tmp"
+        builder.save(tmp_path)
+        os.replace(tmp_path, path)
+        self.prune(image)
+
+    def load(self, image: str, embedding_service=None, storage: str = None) -> Optional[HBTBuilder]:
+        """
+        合并某镜像全部贡献者，得到基线模型；贡献者没有变化时读取上次的合并结果
+
+        Args:
+            image: 镜像仓库
+            embedding_service: 可选的EmbeddingService
+            storage: 基线使用的存储引擎
+
+        Returns:
+            HBTBuilder: 基线模型，还没有贡献者时返回None
+        """
+        paths = self.contributors(image)
+        if not paths:
+            return None
+        if len(paths) == 1:
+            baseline = HBTBuilder.load(paths[0], embedding_service, storage)
+            baseline.container_id = image
+            return baseline
+        directory = self._image_dir(image)
+        try:
+            merged_name = f"{_MERGED_PREFIX}{self._signature(paths)}{_MERGED_SUFFIX}"
+        except FileNotFoundError:
+            # 贡献者刚被其他进程剪除，按新的贡献者集合重试
+            return self.load(image, embedding_service, storage)
+        merged_path = os.path.join(directory, merged_name)
+        if os.path.exists(merged_path):
+            try:
+                baseline = HBTBuilder.load(merged_path, embedding_service, storage)
+                self.cache_hits += 1
+                return baseline
+            except (OSError, ValueError):
+                pass
+        builders = [HBTBuilder.load(path, embedding_service, storage) for path in paths]
+        baseline = builders[0]
+        baseline.merge(*builders[1:], semantic=self.semantic)
+        baseline.container_id = image
+        self.merges += 1
+        tmp_path = f"{merged_path}.{os.getpid()}.tmp"
+        baseline.save(tmp_path)
+        os.replace(tmp_path, merged_path)
+        self._drop_merged(directory, keep=merged_name)
+        return baseline
+
+    def inherit(self, image: str, container_id: str, embedding_service=None,
+                storage: str = None) -> Optional[HBTBuilder]:
+        """
+        新副本从基线继承已学到的行为结构
+
+        继承的节点事件数清零，副本之后发布的只是自己的计数，
+        基线中各贡献者的计数不会被重复累加。
+
+        Args:
+            image: 镜像仓库
+            container_id: 新容器的key
+            embedding_service: 可选的EmbeddingService
+            storage: 存储引擎
+
+        Returns:
+            HBTBuilder: 继承了基线的构建器，没有基线时返回None
+        """
+        baseline = self.load(image, embedding_service, storage)
+        if baseline is None:
+            return None
+        builder = HBTBuilder(container_id, embedding_service, storage)
+        builder.merge(baseline, semantic=self.semantic)
+        stack = [builder.root]
+        while stack:
+            node = stack.pop()
+            node.events_count = 0
+            stack.extend(node.children.values())
+        # 基线已收敛时新副本直接进入检测期
+        builder.learn_state.learning = baseline.learn_state.learning
+        builder.learn_state.converged_at = baseline.learn_state.converged_at
+        return builder
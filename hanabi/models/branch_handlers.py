@@ -1,12 +1,13 @@
+from collections import deque
 from typing import Dict, Any
 from .tree_node import TreeNode
 import json
 import re
 import time
 from ..utils.timeCount import EventCounter
-from .embedding import has_semantic_match
-
-learnState = True
+from .embedding import PendingMatch, has_semantic_match
+from .detection_index import DetectionIndex
+from .alerts import ALERTS, make_alert
 
 def is_semantic_match(query: str, candidates_dict: dict) -> bool:
     """
@@ -17,57 +18,122 @@ def is_semantic_match(query: str, candidates_dict: dict) -> bool:
     candidates = list(candidates_dict.keys())
     return has_semantic_match(query, candidates)
 
-def find_semantic_key(query: str, candidates_dict: dict) -> str:
+def find_semantic_key(query: str, parent: TreeNode) -> str:
     """
-    在candidates_dict中查找与query语义匹配的key，如果没有匹配则返回query本身
+    在parent的子节点中查找与query语义匹配的key，如果没有匹配则返回query本身
     """
-    if candidates_dict is None or len(candidates_dict) == 0:
-        return query
-    
-    # 先尝试精确匹配
-    if query in candidates_dict:
+    if parent is None or len(parent.children) == 0:
         return query
     
-    # 再尝试语义匹配
-    for key in candidates_dict.keys():
-        if has_semantic_match(query, [key]):
-            return key
-    
-    return query
+    # 依次经过精确、归一化、n-gram和向量模型四级匹配，由最先能判定的一级决定
+    key = parent.find_semantic_child(query)
+    return query if key is None else key
 
-def update_learn_state(eventCounter: EventCounter):
-    """
-    根据事件速率和时间窗口更新learnState
-    在预热期间不进行判断，预热结束后才开始统计
-    """
-    global learnState
+class LearnState:
+    """学习/检测状态，每个HBTBuilder一份，由其三个分支处理器共享"""
     
-    # 如果还在预热期，直接返回，不进行判断
-    if eventCounter.is_warmup_period():
-        print("training (warmup period), eventCounter.get_rate():", eventCounter.get_rate())
-        return
+    def __init__(self):
+        # True为学习期，False为检测期
+        self.learning = True
+        # 学习收敛（切换到检测期）的时间戳（毫秒），从快照恢复后沿用
+        self.converged_at = None
     
-    now = int(time.time() * 1000)
-    earliest_time = eventCounter.timestamps[0] if eventCounter.timestamps else now
-    print("training, eventCounter.get_rate():", eventCounter.get_rate())
-    print("time window:", now - earliest_time)
-    if now - earliest_time >= 1000 * 60:
-        eventCounter.clean_expired_events()  # 清理过期事件
-        if eventCounter.get_rate() < 1:
-            learnState = False
+    def update(self, eventCounter: EventCounter):
+        """
+        根据事件速率和时间窗口更新学习状态
+        在预热期间不进行判断，预热结束后才开始统计
+        """
+        # 如果还在预热期，直接返回，不进行判断
+        if eventCounter.is_warmup_period():
+            print("training (warmup period), eventCounter.get_rate():", eventCounter.get_rate())
+            return
+        
+        rate = eventCounter.get_rate()
+        print("training, eventCounter.get_rate():", rate)
+        # 计数满一个窗口（60秒）且窗口内没有新行为时收敛
+        if eventCounter.window_covered() and rate < 1:
+            self.learning = False
+            self.converged_at = int(time.time() * 1000)
             print("Learning completed! Switching to detecting...")
 
 class BranchHandler:
     """基础分支处理器"""
     
-    def __init__(self, branch_root: TreeNode):
+    # 告警中的分支名
+    branch = ""
+    
+    def __init__(self, branch_root: TreeNode, embedding_service=None, learn_state: LearnState = None):
         """
         初始化分支处理器
         
         Args:
             branch_root: 分支根节点
+            embedding_service: 可选的EmbeddingService，提供后语义匹配不再阻塞事件处理
+            learn_state: 所属模型的学习状态，未提供时处理器单独持有一份
         """
         self.root = branch_root
+        self.learn_state = learn_state if learn_state is not None else LearnState()
+        self.embedding_service = embedding_service
+        # 等待向量的暂存token: (PendingMatch, 父节点, 暂存的子节点名)
+        self._parked = deque()
+        # 检测期首次处理事件时由分支树编译，树被修改后置为None重新编译
+        self.detection_index = None
+        # 所属模型的容器key，事件不带container.name时用于告警
+        self.container_id = None
+        # 检测期的偏离发布到该告警通道
+        self.alerts = ALERTS
+    
+    def _frozen_index(self) -> DetectionIndex:
+        """检测期使用的只读索引，见DetectionIndex"""
+        if self.detection_index is None:
+            self.detection_index = DetectionIndex(self.root, self.embedding_service)
+        return self.detection_index
+    
+    def _alert(self, event: Dict[str, Any], path: tuple, depth: int):
+        """
+        发布检测期告警
+
+        Args:
+            event: 事件输出字段
+            path: 事件在分支中的路径
+            depth: 能匹配上的前缀层数
+        """
+        container = event.get("container.name") or self.container_id or "unknown"
+        self.alerts.publish(make_alert(container, self.branch, path, depth, event))
+
+    def _learn_key(self, query: str, parent: TreeNode) -> str:
+        """
+        学习期查找key，向量未就绪的未知token先按原名暂存计数，待向量返回后再对账
+        """
+        if self.embedding_service is None:
+            return find_semantic_key(query, parent)
+        if parent is None or len(parent.children) == 0:
+            return query
+        key = parent.find_semantic_child(query, service=self.embedding_service)
+        if isinstance(key, PendingMatch):
+            self._parked.append((key, parent, query))
+            return query
+        return query if key is None else key
+    
+    def reconcile(self):
+        """
+        对账向量已就绪的暂存token：与兄弟节点语义匹配则合并进去，否则保留为新节点
+        """
+        while self._parked and self._parked[0][0].done():
+            _, parent, name = self._parked.popleft()
+            node = parent.remove_child(name)
+            if node is None:
+                continue
+            self.detection_index = None
+            key = parent.find_semantic_child(name, service=self.embedding_service)
+            if isinstance(key, PendingMatch):
+                # 暂存期间又新增了兄弟节点，等这些节点的向量就绪后再对账
+                parent.attach_child(node)
+                self._parked.append((key, parent, name))
+            elif key is None:
+                parent.attach_child(node)
+            else:
+                parent.children[key].absorb(node)
     
     def handle_event(self, event: Dict[str, Any],eventCounter: EventCounter):
         """
@@ -82,6 +148,8 @@ class BranchHandler:
 class ProcessBranchHandler(BranchHandler):
     """进程分支处理器"""
     
+    branch = "process"
+    
     def handle_event(self, event: Dict[str, Any],eventCounter: EventCounter):
         """
         处理进程相关事件
@@ -89,30 +157,27 @@ class ProcessBranchHandler(BranchHandler):
         Args:
             event: 进程事件数据
         """
-        if learnState == False:
-            print("handle_event called with learnState=False")  # Debugging line
+        if self._parked:
+            self.reconcile()
+        if not self.learn_state.learning:
+            index = self._frozen_index()
             evt_type = event.get("evt.type", "")
             proc_name = event.get("proc.name", "unknown")
-            evt_key = find_semantic_key(evt_type, self.root.children)
-            if evt_key not in self.root.children:
-                print("warning(T):    " + json.dumps(event, ensure_ascii=False)+"\n")
-                return
-            proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
-            if proc_key not in self.root.children[evt_key].children:
-                print("Warning(T):    " + json.dumps(event, ensure_ascii=False)+"\n")
+            depth = index.match((evt_type, proc_name))
+            if depth < 2:
+                self._alert(event, (evt_type, proc_name), depth)
                 return
             cmdline = event.get("proc.cmdline", "")
             keys = re.findall(r'-{1,2}[^\s-]+', cmdline)
             for k in keys:
-                arg_key = find_semantic_key(k, self.root.children[evt_key].children[proc_key].children)
-                if arg_key not in self.root.children[evt_key].children[proc_key].children:
-                    print("Warning(T):    " + json.dumps(event, ensure_ascii=False)+"\n")
+                if not index.known((evt_type, proc_name, k)):
+                    self._alert(event, (evt_type, proc_name, k), 2)
                     break
             return
         # 获取进程相关信息
         # 获取operation layer级别的节点，即start、exit、prctl等
         evt_type = event.get("evt.type", "")
-        evt_key = find_semantic_key(evt_type, self.root.children)
+        evt_key = self._learn_key(evt_type, self.root)
         if evt_key not in self.root.children:
             eventCounter.on_event()
             print("Warning(F):    " + json.dumps(event, ensure_ascii=False)+"\n")
@@ -120,7 +185,7 @@ class ProcessBranchHandler(BranchHandler):
             evt_key = evt_type
         # 获取process layer级别的节点,即相应的proc.name
         proc_name = event.get("proc.name", "unknown")
-        proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
+        proc_key = self._learn_key(proc_name, self.root.children[evt_key])
         if proc_key not in self.root.children[evt_key].children:
             eventCounter.on_event()
             print("Warning(F):    " + json.dumps(event, ensure_ascii=False)+"\n")
@@ -130,20 +195,22 @@ class ProcessBranchHandler(BranchHandler):
         cmdline = event.get("proc.cmdline", "")
         keys = re.findall(r'-{1,2}[^\s-]+', cmdline)
         for k in keys:
-            arg_key = find_semantic_key(k, self.root.children[evt_key].children[proc_key].children)
+            arg_key = self._learn_key(k, self.root.children[evt_key].children[proc_key])
             if arg_key not in self.root.children[evt_key].children[proc_key].children:
                 eventCounter.on_event()
                 print("Warning(F):    " + json.dumps(event, ensure_ascii=False)+"\n")
                 self.root.children[evt_key].children[proc_key].add_child(k, "cmd_argument")
                 arg_key = k
-            self.root.children[evt_key].children[proc_key].children[arg_key].events_count += 1
+            self.root.children[evt_key].children[proc_key].children[arg_key].increment_events_count()
 
-        if learnState == True:
-            update_learn_state(eventCounter)
+        if self.learn_state.learning:
+            self.learn_state.update(eventCounter)
 
 class NetworkBranchHandler(BranchHandler):
     """网络分支处理器"""
     
+    branch = "network"
+    
     def handle_event(self, event: Dict[str, Any],eventCounter: EventCounter):
         """
         处理网络相关事件
@@ -151,17 +218,15 @@ class NetworkBranchHandler(BranchHandler):
         Args:
             event: 网络事件数据
         """
-        if learnState == False:
-            print("handle_event called with learnState=False")  # Debugging line
+        if self._parked:
+            self.reconcile()
+        if not self.learn_state.learning:
+            index = self._frozen_index()
             evt_type = event.get("evt.type", "")
             proc_name = event.get("proc.name", "unknown")
-            evt_key = find_semantic_key(evt_type, self.root.children)
-            if evt_key not in self.root.children:
-                print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
-                return
-            proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
-            if proc_key not in self.root.children[evt_key].children:
-                print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
+            depth = index.match((evt_type, proc_name))
+            if depth < 2:
+                self._alert(event, (evt_type, proc_name), depth)
                 return
             protocol = event.get("fd.type", "")
             str = event.get("fd.name", "")
@@ -174,23 +239,20 @@ class NetworkBranchHandler(BranchHandler):
             else:
                 _ , right = str.split("->")
             value = right + ":" + protocol
-            attr_key = find_semantic_key(value, self.root.children[evt_key].children[proc_key].children)
-            if attr_key not in self.root.children[evt_key].children[proc_key].children:
-                print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
-            else:
-                pass
+            if not index.known((evt_type, proc_name, value)):
+                self._alert(event, (evt_type, proc_name, value), 2)
             return
         # 获取网络相关信息
         # 获取operation layer级别的节点，即connection、listen、shutdown等
         evt_type = event.get("evt.type", "")
-        evt_key = find_semantic_key(evt_type, self.root.children)
+        evt_key = self._learn_key(evt_type, self.root)
         if evt_key not in self.root.children:
             eventCounter.on_event()
             self.root.add_child(evt_type, "network_operation")
             evt_key = evt_type
         # 获取process layer级别的节点,即相应的proc.name
         proc_name = event.get("proc.name", "unknown")
-        proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
+        proc_key = self._learn_key(proc_name, self.root.children[evt_key])
         if proc_key not in self.root.children[evt_key].children:
             eventCounter.on_event()
             self.root.children[evt_key].add_child(proc_name, "process_name")
@@ -206,20 +268,22 @@ class NetworkBranchHandler(BranchHandler):
         else:
             _ , right = str.split("->")
         value = right + ":" + protocol
-        attr_key = find_semantic_key(value, self.root.children[evt_key].children[proc_key].children)
+        attr_key = self._learn_key(value, self.root.children[evt_key].children[proc_key])
         if attr_key not in self.root.children[evt_key].children[proc_key].children:
             eventCounter.on_event()
             print("Warning(F): " + json.dumps(event, ensure_ascii=False)+"\n")
             self.root.children[evt_key].children[proc_key].add_child(value, "network_attribute")
             attr_key = value
-        self.root.children[evt_key].children[proc_key].children[attr_key].events_count += 1
+        self.root.children[evt_key].children[proc_key].children[attr_key].increment_events_count()
 
-        if learnState == True:
-            update_learn_state(eventCounter)
+        if self.learn_state.learning:
+            self.learn_state.update(eventCounter)
 
 class FileBranchHandler(BranchHandler):
     """文件分支处理器"""
     
+    branch = "file"
+    
     def handle_event(self, event: Dict[str, Any],eventCounter: EventCounter):
         """
         处理文件相关事件
@@ -227,43 +291,37 @@ class FileBranchHandler(BranchHandler):
         Args:
             event: 文件事件数据
         """
-        if learnState == False:
-            print("handle_event called with learnState=False")  # Debugging line
+        if self._parked:
+            self.reconcile()
+        if not self.learn_state.learning:
+            index = self._frozen_index()
             evt_type = event.get("evt.type", "")
             proc_name = event.get("proc.name", "unknown")
-            evt_key = find_semantic_key(evt_type, self.root.children)
-            if evt_key not in self.root.children:
-                print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
-                return
-            proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
-            if proc_key not in self.root.children[evt_key].children:
-                print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
+            depth = index.match((evt_type, proc_name))
+            if depth < 2:
+                self._alert(event, (evt_type, proc_name), depth)
                 return
             directory = event.get("fd.directory", "")
             filename = event.get("fd.name", "")
-            if directory:
-                dir_key = find_semantic_key(directory, self.root.children[evt_key].children[proc_key].children)
-                if dir_key not in self.root.children[evt_key].children[proc_key].children:
-                    print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
-                    return
-            if filename:
-                file_key = find_semantic_key(filename, self.root.children[evt_key].children[proc_key].children)
-                if file_key not in self.root.children[evt_key].children[proc_key].children:
-                    print("Warning(T): " + json.dumps(event, ensure_ascii=False)+"\n")
-                    return
+            if directory and not index.known((evt_type, proc_name, directory)):
+                self._alert(event, (evt_type, proc_name, directory), 2)
+                return
+            if filename and not index.known((evt_type, proc_name, filename)):
+                self._alert(event, (evt_type, proc_name, filename), 2)
+                return
             # 匹配画像放行
             return
         # 获取文件相关信息
         # 获取operation layer级别的节点，即create、open、read、write、close等
         evt_type = event.get("evt.type", "")
-        evt_key = find_semantic_key(evt_type, self.root.children)
+        evt_key = self._learn_key(evt_type, self.root)
         if evt_key not in self.root.children:
             eventCounter.on_event()
             self.root.add_child(evt_type, "file_operation")
             evt_key = evt_type
         # 获取process layer级别的节点,即相应的proc.name
         proc_name = event.get("proc.name", "unknown")
-        proc_key = find_semantic_key(proc_name, self.root.children[evt_key].children)
+        proc_key = self._learn_key(proc_name, self.root.children[evt_key])
         if proc_key not in self.root.children[evt_key].children:
             eventCounter.on_event()
             self.root.children[evt_key].add_child(proc_name, "process_name")
@@ -272,21 +330,21 @@ class FileBranchHandler(BranchHandler):
         directory = event.get("fd.directory", "")
         filename = event.get("fd.name", "")
         if directory:
-            dir_key = find_semantic_key(directory, self.root.children[evt_key].children[proc_key].children)
+            dir_key = self._learn_key(directory, self.root.children[evt_key].children[proc_key])
             if dir_key not in self.root.children[evt_key].children[proc_key].children:
                 eventCounter.on_event()
                 print("Warning(F): " + json.dumps(event, ensure_ascii=False)+"\n")
                 self.root.children[evt_key].children[proc_key].add_child(directory, "directory_path")
                 dir_key = directory
-            self.root.children[evt_key].children[proc_key].children[dir_key].events_count += 1
+            self.root.children[evt_key].children[proc_key].children[dir_key].increment_events_count()
         if filename:
-            file_key = find_semantic_key(filename, self.root.children[evt_key].children[proc_key].children)
+            file_key = self._learn_key(filename, self.root.children[evt_key].children[proc_key])
             if file_key not in self.root.children[evt_key].children[proc_key].children:
                 eventCounter.on_event()
                 print("Warning(F): " + json.dumps(event, ensure_ascii=False)+"\n")
                 self.root.children[evt_key].children[proc_key].add_child(filename, "file_name")
                 file_key = filename
-            self.root.children[evt_key].children[proc_key].children[file_key].events_count += 1
+            self.root.children[evt_key].children[proc_key].children[file_key].increment_events_count()
 
-        if learnState == True:
-            update_learn_state(eventCounter)
+        if self.learn_state.learning:
+            self.learn_state.update(eventCounter)
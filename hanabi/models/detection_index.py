@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from .embedding import PendingMatch, SemanticIndex
+
+# 模糊匹配结果缓存的容量
+DEFAULT_CACHE_SIZE = 8192
+# 等待EmbeddingService返回向量的最长秒数，超时或推理失败按未命中处理
+DEFAULT_WAIT_TIMEOUT = 0.5
+
+
+class DetectionIndex:
+    """检测期使用的只读索引，由学习完成的分支树编译而成
+
+    - 树中每个节点从分支根开始的名称路径（元组）放在一个集合中，
+      已知事件的判断只需一次集合查找；
+    - 每个非叶子节点预先建立子节点名的SemanticIndex（归一化、n-gram与向量矩阵），
+      精确查找未命中时逐层做模糊匹配；
+    - 模糊匹配的结果（包括未知路径）按LRU缓存，重复出现的未知路径不再重新匹配；
+    - 向量推理超时或失败时该层按未命中处理，结果不进入缓存，服务恢复后重新匹配。
+
+    检测期分支树不再变化；树被修改（对账、合并、替换）后需要重新编译。
+    """
+
+    def __init__(self, branch_root, embedding_service=None, cache_size: int = DEFAULT_CACHE_SIZE,
+                 wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        编译检测索引
+
+        Args:
+            branch_root: 分支根节点（TreeNode或ColumnarNode）
+            embedding_service: 可选的EmbeddingService，模糊匹配时与其他请求合并推理
+            cache_size: 模糊匹配结果缓存的容量
+            wait_timeout: 等待向量的最长秒数
+        """
+        self.embedding_service = embedding_service
+        self.cache_size = cache_size
+        self.wait_timeout = wait_timeout
+        self.paths = set()
+        self.levels: Dict[Tuple[str, ...], SemanticIndex] = {}
+        self._cache: "OrderedDict[Tuple[str, ...], int]" = OrderedDict()
+        self.exact_hits = 0
+        self.cache_hits = 0
+        self.fuzzy_lookups = 0
+        self.model_failures = 0
+        stack = [((), branch_root)]
+        while stack:
+            path, node = stack.pop()
+            children = node.children
+            if not children:
+                continue
+            self.levels[path] = SemanticIndex(children.keys())
+            for name, child in children.items():
+                child_path = path + (name,)
+                self.paths.add(child_path)
+                stack.append((child_path, child))
+
+    def _resolve(self, path: Tuple[str, ...]) -> Tuple[int, bool]:
+        """逐层解析路径，返回(能匹配上的前缀层数, 结果是否可以缓存)"""
+        resolved: Tuple[str, ...] = ()
+        for depth, token in enumerate(path):
+            candidate = resolved + (token,)
+            if candidate in self.paths:
+                resolved = candidate
+                continue
+            index = self.levels.get(resolved)
+            if index is None:
+                return depth, True
+            key = index.match(token, service=self.embedding_service)
+            if isinstance(key, PendingMatch):
+                try:
+                    key.wait(self.wait_timeout)
+                except Exception:
+                    # 超时或推理失败：不在检测热路径上同步调用模型
+                    self.model_failures += 1
+                    return depth, False
+                key = index.match(token)
+            if key is None:
+                return depth, True
+            resolved = resolved + (key,)
+        return len(path), True
+
+    def match(self, path: Tuple[str, ...]) -> int:
+        """
+        查找事件路径
+
+        Args:
+            path: 从分支根开始的名称路径，如(evt.type, proc.name, 属性)
+
+        Returns:
+            int: 匹配上的前缀层数，等于len(path)表示已知行为
+        """
+        if path in self.paths:
+            self.exact_hits += 1
+            return len(path)
+        depth = self._cache.get(path)
+        if depth is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(path)
+            return depth
+        self.fuzzy_lookups += 1
+        depth, cacheable = self._resolve(path)
+        if cacheable:
+            self._cache[path] = depth
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return depth
+
+    def known(self, path: Tuple[str, ...]) -> bool:
+        return self.match(path) == len(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "paths": len(self.paths),
+            "levels": len(self.levels),
+            "cached": len(self._cache),
+            "exact_hits": self.exact_hits,
+            "cache_hits": self.cache_hits,
+            "fuzzy_lookups": self.fuzzy_lookups,
+            "model_failures": self.model_failures,
+        }
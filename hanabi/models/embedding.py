@@ -2,20 +2,27 @@
 
 from __future__ import annotations
 
-from functools import lru_cache
+from collections import Counter
+from functools import lru_cache, partial
 from itertools import islice
-from typing import Iterable, Iterator, List, Sequence
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
 import logging
+import os
+import re
+import threading
+import zlib
 
-try:  # Import optional dependencies lazily so we can emit friendly errors.
+import numpy as np
+
+from ..utils.startup import STARTUP
+from .embedding_cache import DEFAULT_CACHE_CAPACITY, EmbeddingCache, content_key
+
+if TYPE_CHECKING:
     import torch  # type: ignore[import]
-    from transformers import AutoModel, AutoTokenizer  # type: ignore[import]
-except ImportError as exc:  # pragma: no cover - depends on optional deps.
-    raise ImportError(
-        "Embedding utilities require `torch` and `transformers`. "
-        "Install them with `pip install torch transformers`."
-    ) from exc
+
+    from .embedding_service import EmbeddingService
 
 LOGGER = logging.getLogger(__name__)
 
@@ -23,6 +30,21 @@ DEFAULT_MODEL_NAME = "BAAI/bge-m3"
 DEFAULT_BATCH_SIZE = 16
 DEFAULT_MAX_LENGTH = 256
 DEFAULT_THRESHOLD = 0.80
+DEFAULT_NGRAM_SIZE = 3
+DEFAULT_NUM_PERM = 64
+DEFAULT_NGRAM_ACCEPT = 0.90
+DEFAULT_NGRAM_REJECT = 0.10
+
+CACHE_DIR_ENV = "HANABI_EMBEDDING_CACHE_DIR"
+CACHE_SIZE_ENV = "HANABI_EMBEDDING_CACHE_SIZE"
+BACKEND_ENV = "HANABI_EMBEDDING_BACKEND"
+THREADS_ENV = "HANABI_EMBEDDING_THREADS"
+TRUNCATE_DIM_ENV = "HANABI_EMBEDDING_DIM"
+ONNX_PATH_ENV = "HANABI_EMBEDDING_ONNX_PATH"
+SERVER_ENV = "HANABI_EMBEDDING_SERVER"
+# With the remote backend the server's shared-memory matrix is the real cache;
+# each worker keeps only a small LRU of hot vectors and no disk tier.
+REMOTE_CACHE_CAPACITY = 512
 
 
 def _batch_iterator(items: Sequence[str], batch_size: int) -> Iterator[List[str]]:
@@ -34,6 +56,26 @@ def _batch_iterator(items: Sequence[str], batch_size: int) -> Iterator[List[str]
         yield chunk
 
 
+@lru_cache(maxsize=1)
+def _load_torch():
+    """Import ``torch`` and ``transformers`` on first real use.
+
+    They cost seconds and hundreds of MB of RSS, which exact-only matching,
+    ``HBTBuilder`` and the CLI tools should not pay at import time.
+    """
+
+    try:
+        with STARTUP.phase("import torch/transformers"):
+            import torch  # type: ignore[import]
+            import transformers  # type: ignore[import]
+    except ImportError as exc:  # pragma: no cover - depends on optional deps.
+        raise ImportError(
+            "Embedding utilities require `torch` and `transformers`. "
+            "Install them with `pip install torch transformers`."
+        ) from exc
+    return torch, transformers
+
+
 def _mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
     mask = attention_mask.unsqueeze(-1).type_as(last_hidden_state)
     masked_state = last_hidden_state * mask
@@ -42,8 +84,79 @@ def _mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) ->
     return summed / counts
 
 
-class _EmbeddingBackend:
-    """Thin wrapper around a HF model/tokenizer pair."""
+def _mean_pool_numpy(last_hidden_state: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    mask = attention_mask[..., None].astype(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+def _cache_namespace(
+    model_name: str, max_length: int, kind: str = "torch", truncate_dim: int | None = None
+) -> str:
+    """Identify the embedding space so cached vectors are never mixed across models or variants."""
+
+    return f"{model_name}|max_length={max_length}|mean_pool|{kind}|dim={truncate_dim or 'full'}"
+
+
+class EmbeddingBackend:
+    """Interface shared by embedding backends.
+
+    Subclasses implement :meth:`_encode_batch` returning pooled, unnormalized
+    vectors; :meth:`encode` handles input validation, batching, optional
+    Matryoshka-style truncation to the leading ``truncate_dim`` dimensions and
+    L2 normalization.
+    """
+
+    kind = "abstract"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_length: int = DEFAULT_MAX_LENGTH,
+        truncate_dim: int | None = None,
+    ) -> None:
+        if truncate_dim is not None and truncate_dim <= 0:
+            raise ValueError("truncate_dim must be positive.")
+        self._model_name = model_name
+        self._batch_size = batch_size
+        self._max_length = max_length
+        self._truncate_dim = truncate_dim
+
+    @property
+    def cache_namespace(self) -> str:
+        return _cache_namespace(self._model_name, self._max_length, self.kind, self._truncate_dim)
+
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            raise ValueError("No texts provided for encoding.")
+
+        normalized: List[str] = [text.strip() for text in texts if text and text.strip()]
+        if not normalized:
+            raise ValueError("All texts were empty after stripping whitespace.")
+
+        pooled = np.concatenate(
+            [self._encode_batch(batch) for batch in _batch_iterator(normalized, self._batch_size)], axis=0
+        ).astype(np.float32, copy=False)
+        if self._truncate_dim is not None:
+            pooled = pooled[:, : self._truncate_dim]
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+
+class _EmbeddingBackend(EmbeddingBackend):
+    """Thin wrapper around a HF model/tokenizer pair.
+
+    ``quantize`` applies dynamic int8 quantization to the linear layers, which
+    only runs on CPU.
+    """
+
+    kind = "torch"
 
     def __init__(
         self,
@@ -53,65 +166,661 @@ class _EmbeddingBackend:
         batch_size: int = DEFAULT_BATCH_SIZE,
         max_length: int = DEFAULT_MAX_LENGTH,
         use_fp16: bool = True,
+        quantize: bool = False,
+        num_threads: int | None = None,
+        truncate_dim: int | None = None,
+        **_: object,
     ) -> None:
+        super().__init__(model_name, batch_size=batch_size, max_length=max_length, truncate_dim=truncate_dim)
+        if quantize:
+            self.kind = "torch-int8"
+            device = "cpu"
+        torch, transformers = _load_torch()
+        self._torch = torch
         resolved_device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self._device = torch.device(resolved_device)
-        self._batch_size = batch_size
-        self._max_length = max_length
+        if num_threads:
+            torch.set_num_threads(num_threads)
 
         LOGGER.debug("Loading tokenizer and model for %s on %s", model_name, self._device)
-        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self._model = AutoModel.from_pretrained(model_name)
+        self._tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        self._model = transformers.AutoModel.from_pretrained(model_name)
 
-        if use_fp16 and self._device.type == "cuda":
+        if quantize:
+            self._model = torch.ao.quantization.quantize_dynamic(self._model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif use_fp16 and self._device.type == "cuda":
             self._model = self._model.half()
 
         self._model.to(self._device)
         self._model.eval()
 
-    def encode(self, texts: Sequence[str]) -> torch.Tensor:
-        if not texts:
-            raise ValueError("No texts provided for encoding.")
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        with self._torch.inference_mode():
+            tokens = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self._max_length,
+                return_tensors="pt",
+            )
+            tokens = {key: value.to(self._device) for key, value in tokens.items()}
+            outputs = self._model(**tokens)
+            pooled = _mean_pool(outputs.last_hidden_state, tokens["attention_mask"])
+            return pooled.float().cpu().numpy()
 
-        normalized: List[str] = [text.strip() for text in texts if text and text.strip()]
-        if not normalized:
-            raise ValueError("All texts were empty after stripping whitespace.")
 
-        embeddings: List[torch.Tensor] = []
-        with torch.inference_mode():
-            for batch in _batch_iterator(normalized, self._batch_size):
-                tokens = self._tokenizer(
-                    batch,
-                    padding=True,
-                    truncation=True,
-                    max_length=self._max_length,
-                    return_tensors="pt",
-                )
-                tokens = {key: value.to(self._device) for key, value in tokens.items()}
-                outputs = self._model(**tokens)
-                pooled = _mean_pool(outputs.last_hidden_state, tokens["attention_mask"])
-                normalized_batch = torch.nn.functional.normalize(pooled, p=2, dim=1)
-                embeddings.append(normalized_batch.cpu())
-
-        return torch.cat(embeddings, dim=0)
+class _OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime CPU backend for a model exported by :func:`export_onnx`."""
+
+    kind = "onnx"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        *,
+        onnx_path: str | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_length: int = DEFAULT_MAX_LENGTH,
+        num_threads: int | None = None,
+        truncate_dim: int | None = None,
+        **_: object,
+    ) -> None:
+        super().__init__(model_name, batch_size=batch_size, max_length=max_length, truncate_dim=truncate_dim)
+        if not onnx_path:
+            raise ValueError(f"The onnx backend needs a model path; set {ONNX_PATH_ENV} or pass onnx_path.")
+        try:
+            import onnxruntime as ort  # type: ignore[import]
+        except ImportError as exc:  # pragma: no cover - depends on optional deps.
+            raise ImportError(
+                "The onnx embedding backend requires `onnxruntime`. Install it with `pip install onnxruntime`."
+            ) from exc
+
+        # The exported file name tells int8 and fp32 graphs apart in the cache namespace.
+        self.kind = f"onnx:{os.path.basename(onnx_path)}"
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        LOGGER.debug("Loading ONNX model %s", onnx_path)
+        self._session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {item.name for item in self._session.get_inputs()}
+        _, transformers = _load_torch()
+        self._tokenizer = transformers.AutoTokenizer.from_pretrained(os.path.dirname(onnx_path) or model_name)
+
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        tokens = self._tokenizer(
+            batch,
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="np",
+        )
+        feeds = {name: value.astype(np.int64) for name, value in tokens.items() if name in self._input_names}
+        last_hidden_state = self._session.run(None, feeds)[0]
+        return _mean_pool_numpy(last_hidden_state, tokens["attention_mask"])
+
+
+def export_onnx(
+    output_dir: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    *,
+    quantize: bool = True,
+    opset: int = 17,
+) -> str:
+    """Export ``model_name`` to ONNX under ``output_dir`` and return the model path.
+
+    With ``quantize`` the graph is additionally quantized to dynamic int8 and
+    the quantized file is returned.  The tokenizer is saved alongside so the
+    onnx backend can load without network access.
+    """
+
+    torch, transformers = _load_torch()
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(output_dir)
+    model = transformers.AutoModel.from_pretrained(model_name).eval()
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    sample = tokenizer(["warmup"], return_tensors="pt")
+    dynamic = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state", "pooler_output"],
+        dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+        opset_version=opset,
+    )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore[import]
+
+    int8_path = os.path.join(output_dir, "model.int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _remote_backend(**kwargs) -> EmbeddingBackend:
+    from .embedding_server import RemoteBackend
+
+    return RemoteBackend(**kwargs)
+
+
+_BACKENDS: Dict[str, Callable[..., EmbeddingBackend]] = {
+    "torch": _EmbeddingBackend,
+    "torch-int8": partial(_EmbeddingBackend, quantize=True),
+    "onnx": _OnnxBackend,
+    "remote": _remote_backend,
+}
+
+_backend_settings: Dict[str, object] = {
+    # A configured embedding server makes workers thin clients unless told otherwise.
+    "kind": os.environ.get(BACKEND_ENV) or ("remote" if os.environ.get(SERVER_ENV) else "torch"),
+    "num_threads": int(os.environ[THREADS_ENV]) if os.environ.get(THREADS_ENV) else None,
+    "truncate_dim": int(os.environ[TRUNCATE_DIM_ENV]) if os.environ.get(TRUNCATE_DIM_ENV) else None,
+    "onnx_path": os.environ.get(ONNX_PATH_ENV) or None,
+    "server_address": os.environ.get(SERVER_ENV) or None,
+}
+
+
+def register_backend(kind: str, factory: Callable[..., EmbeddingBackend]) -> None:
+    """Make ``factory`` selectable as ``kind`` through :func:`configure_backend`."""
+
+    _BACKENDS[kind] = factory
+
+
+def configure_backend(
+    kind: str | None = None,
+    *,
+    num_threads: int | None = None,
+    truncate_dim: int | None = None,
+    onnx_path: str | None = None,
+    server_address: str | None = None,
+) -> None:
+    """Select the embedding backend used by :func:`encode_texts`.
+
+    ``kind`` is one of the registered backends (``torch``, ``torch-int8``,
+    ``onnx``, ``remote``).  Every setting can also come from the environment:
+    ``HANABI_EMBEDDING_BACKEND``, ``HANABI_EMBEDDING_THREADS``,
+    ``HANABI_EMBEDDING_DIM``, ``HANABI_EMBEDDING_ONNX_PATH`` and
+    ``HANABI_EMBEDDING_SERVER`` (the socket of an embedding server).
+    Arguments left as ``None`` keep their current setting.
+    """
+
+    if kind is not None:
+        if kind not in _BACKENDS:
+            raise ValueError(f"Unknown embedding backend {kind!r}; expected one of {sorted(_BACKENDS)}.")
+        _backend_settings["kind"] = kind
+    if num_threads is not None:
+        _backend_settings["num_threads"] = num_threads
+    if truncate_dim is not None:
+        _backend_settings["truncate_dim"] = truncate_dim
+    if onnx_path is not None:
+        _backend_settings["onnx_path"] = onnx_path
+    if server_address is not None:
+        _backend_settings["server_address"] = server_address
+    _clear_backend()
+
+
+def _settings_namespace(model_name: str, max_length: int) -> str:
+    """Cache namespace of the configured backend, computed without loading it."""
+
+    kind = str(_backend_settings["kind"])
+    if kind == "remote":
+        # Connecting costs no model load, and the server decides the embedding space.
+        return _current_backend(model_name=model_name, max_length=max_length).cache_namespace
+    if kind == "onnx" and _backend_settings["onnx_path"]:
+        kind = f"onnx:{os.path.basename(str(_backend_settings['onnx_path']))}"
+    return _cache_namespace(model_name, max_length, kind, _backend_settings["truncate_dim"])
+
+
+def _current_backend(
+    *,
+    model_name: str = DEFAULT_MODEL_NAME,
+    device: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    use_fp16: bool = True,
+) -> EmbeddingBackend:
+    return _get_backend(
+        model_name=model_name,
+        kind=str(_backend_settings["kind"]),
+        device=device,
+        batch_size=batch_size,
+        max_length=max_length,
+        use_fp16=use_fp16,
+        num_threads=_backend_settings["num_threads"],
+        truncate_dim=_backend_settings["truncate_dim"],
+        onnx_path=_backend_settings["onnx_path"],
+        server_address=_backend_settings["server_address"],
+    )
+
+
+# Backend construction and cache creation are serialized: the pre-warm thread,
+# the EmbeddingService worker and the first query can all miss at once, and each
+# would otherwise load its own copy of the model or open the same disk tier twice.
+_BACKEND_LOCK = threading.Lock()
+_backend_slot: Tuple[tuple, EmbeddingBackend] | None = None
+
+
+def _clear_backend() -> None:
+    global _backend_slot
+    with _BACKEND_LOCK:
+        _backend_slot = None
 
 
-@lru_cache(maxsize=1)
 def _get_backend(
     model_name: str = DEFAULT_MODEL_NAME,
     *,
+    kind: str = "torch",
+    device: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    use_fp16: bool = True,
+    num_threads: int | None = None,
+    truncate_dim: int | None = None,
+    onnx_path: str | None = None,
+    server_address: str | None = None,
+) -> EmbeddingBackend:
+    global _backend_slot
+    key = (model_name, kind, device, batch_size, max_length, use_fp16, num_threads, truncate_dim,
+           onnx_path, server_address)
+    slot = _backend_slot
+    if slot is not None and slot[0] == key:
+        return slot[1]
+    with _BACKEND_LOCK:
+        slot = _backend_slot
+        if slot is not None and slot[0] == key:
+            return slot[1]
+        with STARTUP.phase(f"load {kind} embedding backend"):
+            backend = _BACKENDS[kind](
+                model_name=model_name,
+                device=device,
+                batch_size=batch_size,
+                max_length=max_length,
+                use_fp16=use_fp16,
+                num_threads=num_threads,
+                truncate_dim=truncate_dim,
+                onnx_path=onnx_path,
+                server_address=server_address,
+            )
+        _backend_slot = (key, backend)
+        return backend
+
+
+def prewarm(texts: Sequence[str] = (), *, background: bool = True) -> threading.Thread | None:
+    """Load the embedding backend (and encode ``texts``) ahead of the first semantic query.
+
+    With ``background`` the work runs on a daemon thread, which is returned,
+    so startup does not wait for the model.
+    """
+
+    def _warm() -> None:
+        try:
+            _current_backend()
+            cleaned = [text.strip() for text in texts if text and text.strip()]
+            if cleaned:
+                encode_texts(cleaned)
+        except Exception as exc:  # pragma: no cover - depends on optional deps.
+            LOGGER.error("Embedding pre-warm failed: %s", exc)
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name="embedding-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHE_LOCK = threading.Lock()
+_cache_settings: Dict[str, object] = {
+    "capacity": int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_CAPACITY)),
+    "directory": os.environ.get(CACHE_DIR_ENV) or None,
+}
+
+
+def configure_embedding_cache(*, capacity: int | None = None, directory: str | None = None) -> None:
+    """Set the LRU capacity and on-disk location used by subsequently created caches.
+
+    ``directory`` may also be given through ``HANABI_EMBEDDING_CACHE_DIR``;
+    each model gets its own sub-directory so vectors are never mixed.
+    Arguments left as ``None`` keep their current setting.
+    """
+
+    if capacity is not None:
+        _cache_settings["capacity"] = capacity
+    if directory is not None:
+        _cache_settings["directory"] = directory
+    with _CACHE_LOCK:
+        for cache in _CACHES.values():
+            cache.close()
+        _CACHES.clear()
+
+
+def _get_cache(namespace: str, *, remote: bool = False) -> EmbeddingCache:
+    cache = _CACHES.get(namespace)
+    if cache is not None:
+        return cache
+    with _CACHE_LOCK:
+        cache = _CACHES.get(namespace)
+        if cache is None:
+            capacity = int(_cache_settings["capacity"])
+            base_dir = _cache_settings["directory"]
+            if remote:
+                capacity = min(capacity, REMOTE_CACHE_CAPACITY)
+                base_dir = None
+            directory = os.path.join(str(base_dir), content_key("dir", namespace)) if base_dir else None
+            cache = EmbeddingCache(namespace, capacity=capacity, directory=directory)
+            _CACHES[namespace] = cache
+        return cache
+
+
+def get_embedding_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Return hit/miss/eviction counters of every embedding cache, keyed by namespace."""
+
+    return {namespace: cache.stats() for namespace, cache in _CACHES.items()}
+
+
+def missing_from_cache(
+    texts: Iterable[str],
+    *,
+    model_name: str = DEFAULT_MODEL_NAME,
+    max_length: int = DEFAULT_MAX_LENGTH,
+    **_: object,
+) -> List[str]:
+    """Return the distinct ``texts`` that would need a model call, without loading the model."""
+
+    cache = _get_cache(_settings_namespace(model_name, max_length), remote=_backend_settings["kind"] == "remote")
+    return [text for text in dict.fromkeys(texts) if text not in cache]
+
+
+def encode_texts(
+    texts: Sequence[str],
+    *,
+    model_name: str = DEFAULT_MODEL_NAME,
     device: str | None = None,
     batch_size: int = DEFAULT_BATCH_SIZE,
     max_length: int = DEFAULT_MAX_LENGTH,
     use_fp16: bool = True,
-) -> _EmbeddingBackend:
-    return _EmbeddingBackend(
+) -> np.ndarray:
+    """Return L2-normalized embeddings for ``texts``, encoding each distinct text once.
+
+    Texts must already be stripped and non-empty.
+    """
+
+    backend = _current_backend(
         model_name=model_name,
         device=device,
         batch_size=batch_size,
         max_length=max_length,
         use_fp16=use_fp16,
     )
+    cache = _get_cache(backend.cache_namespace, remote=backend.kind == "remote")
+    return cache.get_or_encode(texts, backend.encode)
+
+
+_HEX_ID = re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b")
+_TEMP_SUFFIX = re.compile(r"(?<=tmp)[a-z0-9_]{6,}")
+_DIGITS = re.compile(r"\d+")
+# ``ip:port:proto`` attributes from the network branch: every digit is significant.
+_ADDRESS_ATTRIBUTE = re.compile(r"^\S*:\d*:[a-z0-9]+$")
+_MINHASH_PRIME = (1 << 31) - 1
+# Never produced by a real signature, so masked rows cannot collide with a query.
+_MINHASH_MASK = np.uint32(0xFFFFFFFF)
+
+_matcher_settings: Dict[str, float] = {
+    "ngram_accept": DEFAULT_NGRAM_ACCEPT,
+    "ngram_reject": DEFAULT_NGRAM_REJECT,
+}
+_TIER_COUNTS: Counter = Counter()
+
+
+def configure_matcher(*, ngram_accept: float | None = None, ngram_reject: float | None = None) -> None:
+    """Tune the n-gram tier of :class:`SemanticIndex`.
+
+    A candidate whose estimated n-gram Jaccard similarity reaches
+    ``ngram_accept`` is taken without consulting the model; when no candidate
+    reaches ``ngram_reject`` the query is declared unmatched.  Set
+    ``ngram_reject`` to ``0`` to always defer undecided queries to the model.
+    """
+
+    if ngram_accept is not None:
+        _matcher_settings["ngram_accept"] = ngram_accept
+    if ngram_reject is not None:
+        _matcher_settings["ngram_reject"] = ngram_reject
+    if _matcher_settings["ngram_reject"] > _matcher_settings["ngram_accept"]:
+        raise ValueError("ngram_reject must not exceed ngram_accept.")
+
+
+def get_matcher_stats() -> Dict[str, int]:
+    """Return how many lookups each matching tier decided."""
+
+    return dict(_TIER_COUNTS)
+
+
+def reset_matcher_stats() -> None:
+    _TIER_COUNTS.clear()
+
+
+def normalize_token(text: str) -> str:
+    """Fold case and replace hex IDs, temp-file suffixes and numbers with placeholders.
+
+    Network ``ip:port:proto`` attributes are only case-folded.
+    """
+
+    token = text.strip().lower()
+    if _ADDRESS_ATTRIBUTE.match(token):
+        return token
+    token = _HEX_ID.sub("<hex>", token)
+    token = _TEMP_SUFFIX.sub("<tmp>", token)
+    return _DIGITS.sub("<n>", token)
+
+
+@lru_cache(maxsize=1)
+def _minhash_params(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0x4A4E4249)
+    a = rng.integers(1, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MINHASH_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(
+    text: str, *, ngram: int = DEFAULT_NGRAM_SIZE, num_perm: int = DEFAULT_NUM_PERM
+) -> np.ndarray:
+    """Return the MinHash signature of the character n-grams of ``text``."""
+
+    padded = f"\x02{text}\x03"
+    grams = {padded[i : i + ngram] for i in range(max(1, len(padded) - ngram + 1))}
+    hashes = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) & _MINHASH_PRIME for gram in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    a, b = _minhash_params(num_perm)
+    return ((a[:, None] * hashes[None, :] + b[:, None]) % _MINHASH_PRIME).min(axis=1).astype(np.uint32)
+
+
+class _GrowableRows:
+    """Row-append buffer that doubles its capacity instead of re-allocating per row."""
+
+    _INITIAL_ROWS = 8
+
+    def __init__(self, dtype: type) -> None:
+        self._dtype = dtype
+        self._data: np.ndarray | None = None
+        self.size = 0
+
+    def extend(self, rows: np.ndarray) -> None:
+        needed = self.size + len(rows)
+        if self._data is None or needed > self._data.shape[0]:
+            capacity = max(needed, self._INITIAL_ROWS, 0 if self._data is None else 2 * self._data.shape[0])
+            grown = np.empty((capacity, rows.shape[1]), dtype=self._dtype)
+            if self._data is not None:
+                grown[: self.size] = self._data[: self.size]
+            self._data = grown
+        self._data[self.size : needed] = rows
+        self.size = needed
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[: self.size]
+
+
+class PendingMatch:
+    """Model-tier lookup parked until an :class:`EmbeddingService` has encoded its texts."""
+
+    __slots__ = ("query", "future")
+
+    def __init__(self, query: str, future: Future) -> None:
+        self.query = query
+        self.future = future
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout: float | None = None) -> None:
+        self.future.result(timeout=timeout)
+
+
+class SemanticIndex:
+    """Tiered matcher over an incrementally grown set of keys.
+
+    A lookup is decided by the cheapest tier that can: exact key, normalized
+    key (:func:`normalize_token`), MinHash estimate of character n-gram
+    similarity, and only then the embedding model.  Keys are queued by
+    :meth:`add` and signed/embedded in one batch when a lookup first needs
+    them, so the model tier costs one cached query encoding plus one dot
+    product instead of a model call per key.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), **encode_options) -> None:
+        self._encode_options = encode_options
+        self._exact: Dict[str, None] = {}
+        self._normalized: Dict[str, str] = {}
+        self._signed_keys: List[str] = []
+        self._signatures = _GrowableRows(np.uint32)
+        self._unsigned: List[str] = []
+        self._embedded_keys: List[str] = []
+        self._embeddings = _GrowableRows(np.float32)
+        self._unembedded: List[str] = []
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._exact
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, key: str) -> None:
+        """Register ``key``; blank keys can never match and are ignored."""
+
+        if not key or not key.strip() or key in self._exact:
+            return
+        self._exact[key] = None
+        self._normalized.setdefault(normalize_token(key), key)
+        self._unsigned.append(key)
+        self._unembedded.append(key)
+
+    def remove(self, key: str) -> None:
+        """Forget ``key``; its matrix rows are masked rather than compacted."""
+
+        if key not in self._exact:
+            return
+        del self._exact[key]
+        normalized = normalize_token(key)
+        if self._normalized.get(normalized) == key:
+            del self._normalized[normalized]
+        for pending in (self._unsigned, self._unembedded):
+            if key in pending:
+                pending.remove(key)
+        if key in self._signed_keys:
+            row = self._signed_keys.index(key)
+            self._signed_keys[row] = None
+            self._signatures.view[row] = _MINHASH_MASK
+        if key in self._embedded_keys:
+            row = self._embedded_keys.index(key)
+            self._embedded_keys[row] = None
+            self._embeddings.view[row] = 0.0
+
+    def _lexical_best(self, query: str) -> Tuple[str | None, float]:
+        if self._unsigned:
+            pending, self._unsigned = self._unsigned, []
+            self._signatures.extend(np.stack([minhash_signature(normalize_token(key)) for key in pending]))
+            self._signed_keys.extend(pending)
+        similarity = (self._signatures.view == minhash_signature(normalize_token(query))).mean(axis=1)
+        best = int(np.argmax(similarity))
+        key = self._signed_keys[best]
+        return key, float(similarity[best]) if key is not None else 0.0
+
+    def best_match(self, query: str) -> Tuple[str | None, float]:
+        """Return the closest key to ``query`` by embedding cosine similarity."""
+
+        query_text = query.strip()
+        if not query_text or not self._exact:
+            return None, 0.0
+
+        pending, self._unembedded = self._unembedded, []
+        embeddings = encode_texts([query_text, *(key.strip() for key in pending)], **self._encode_options)
+        if pending:
+            self._embeddings.extend(embeddings[1:])
+            self._embedded_keys.extend(pending)
+
+        scores = self._embeddings.view @ embeddings[0]
+        best = int(np.argmax(scores))
+        key = self._embedded_keys[best]
+        return key, float(scores[best]) if key is not None else 0.0
+
+    def match(
+        self,
+        query: str,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        service: "EmbeddingService | None" = None,
+    ) -> str | PendingMatch | None:
+        """Return the key matching ``query`` or ``None``, using the cheapest deciding tier.
+
+        With a ``service``, a lookup that needs model embeddings which are not
+        cached yet is submitted to it and returned as a :class:`PendingMatch`
+        instead of blocking; repeat the lookup once it is done.
+        """
+
+        if not query or not query.strip() or not self._exact:
+            return None
+        if query in self._exact:
+            _TIER_COUNTS["exact"] += 1
+            return query
+        key = self._normalized.get(normalize_token(query))
+        if key is not None:
+            _TIER_COUNTS["normalized"] += 1
+            return key
+
+        key, similarity = self._lexical_best(query)
+        if similarity >= _matcher_settings["ngram_accept"]:
+            _TIER_COUNTS["ngram_accept"] += 1
+            return key
+        if similarity < _matcher_settings["ngram_reject"]:
+            _TIER_COUNTS["ngram_reject"] += 1
+            return None
+
+        if service is not None:
+            uncached = missing_from_cache(
+                [query.strip(), *(pending.strip() for pending in self._unembedded)], **self._encode_options
+            )
+            if uncached:
+                _TIER_COUNTS["deferred"] += 1
+                return PendingMatch(query, service.submit_many(uncached))
+
+        key, score = self.best_match(query)
+        LOGGER.debug("Best semantic key for %r: %r (%.4f)", query, key, score)
+        if score >= threshold:
+            _TIER_COUNTS["model_match"] += 1
+            return key
+        _TIER_COUNTS["model_reject"] += 1
+        return None
 
 
 def has_semantic_match(
@@ -131,27 +840,35 @@ def has_semantic_match(
     if not query_text:
         return False
 
-    cleaned_candidates = [candidate.strip() for candidate in candidates if candidate and candidate.strip()]
-    if not cleaned_candidates:
-        LOGGER.debug("No valid candidates passed to has_semantic_match.")
-        return False
-
-    backend = _get_backend(
+    index = SemanticIndex(
+        candidates,
         model_name=model_name,
         device=device,
         batch_size=batch_size,
         max_length=max_length,
         use_fp16=use_fp16,
     )
+    if not len(index):
+        LOGGER.debug("No valid candidates passed to has_semantic_match.")
+        return False
 
-    query_embedding = backend.encode([query_text])[0]
-    candidate_embeddings = backend.encode(cleaned_candidates)
-
-    scores = candidate_embeddings @ query_embedding
-    max_score = float(scores.max().item())
-    LOGGER.debug("Max cosine similarity for semantic match: %.4f", max_score)
-
-    return max_score >= threshold
-
-
-__all__ = ["has_semantic_match"]
+    return index.match(query_text, threshold=threshold) is not None
+
+
+__all__ = [
+    "EmbeddingBackend",
+    "PendingMatch",
+    "SemanticIndex",
+    "configure_backend",
+    "configure_embedding_cache",
+    "configure_matcher",
+    "encode_texts",
+    "export_onnx",
+    "get_embedding_cache_stats",
+    "get_matcher_stats",
+    "has_semantic_match",
+    "missing_from_cache",
+    "normalize_token",
+    "prewarm",
+    "register_backend",
+]
@@ -0,0 +1,265 @@
+"""Content-addressed embedding store with an in-memory LRU and an optional disk tier."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_CAPACITY = 50_000
+DEFAULT_DISK_GROWTH_ROWS = 4096
+
+_INDEX_FILE = "index.txt"
+_VECTORS_FILE = "vectors.f16"
+_META_FILE = "meta.json"
+
+
+def content_key(namespace: str, text: str) -> str:
+    """Return the stable content address of ``text`` within ``namespace``."""
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(namespace.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """Memory-mapped float16 matrix plus an append-only ``key -> row`` index.
+
+    Row ``i`` of ``vectors.f16`` belongs to the key on line ``i`` of
+    ``index.txt``.  The index is written after the vector so a crash can at
+    worst lose the last entry, never point a key at garbage.
+    """
+
+    def __init__(self, directory: str, namespace: str, dim: int) -> None:
+        self._directory = directory
+        self._dim = dim
+        os.makedirs(directory, exist_ok=True)
+
+        meta_path = os.path.join(directory, _META_FILE)
+        meta = {"namespace": namespace, "dim": dim, "dtype": "float16"}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(
+                    f"Embedding cache at {directory} was built for {existing}, "
+                    f"refusing to reuse it for {meta}."
+                )
+        else:
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        self._rows: Dict[str, int] = {}
+        index_path = os.path.join(directory, _INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                for row, line in enumerate(f):
+                    key = line.strip()
+                    if key:
+                        self._rows[key] = row
+
+        self._vectors_path = os.path.join(directory, _VECTORS_FILE)
+        self._capacity = 0
+        self._matrix: np.memmap | None = None
+        self._ensure_capacity(max(len(self._rows), DEFAULT_DISK_GROWTH_ROWS))
+        self._index_file = open(index_path, "a")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, DEFAULT_DISK_GROWTH_ROWS)
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        size = capacity * self._dim * np.dtype(np.float16).itemsize
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._matrix = np.memmap(
+            self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self._dim)
+        )
+        self._capacity = capacity
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def get(self, key: str) -> np.ndarray | None:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.asarray(self._matrix[row], dtype=np.float32)
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if key in self._rows:
+            return
+        row = len(self._rows)
+        self._ensure_capacity(row + 1)
+        self._matrix[row] = vector.astype(np.float16)
+        self._index_file.write(key + "\n")
+        self._rows[key] = row
+
+    def flush(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._index_file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._index_file.close()
+
+
+class EmbeddingCache:
+    """Bounded LRU of normalized embeddings, optionally backed by a disk tier.
+
+    Entries are addressed by :func:`content_key` so the same text always maps
+    to the same slot for a given model, across processes and restarts.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        capacity: int = DEFAULT_CACHE_CAPACITY,
+        directory: str | None = None,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive.")
+        self.namespace = namespace
+        self.capacity = capacity
+        self.directory = directory
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk: _DiskTier | None = None
+        self._disk_probed = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _disk_tier(self, dim: int) -> _DiskTier | None:
+        if self.directory is None:
+            return None
+        if self._disk is None:
+            self._disk = _DiskTier(self.directory, self.namespace, dim)
+            LOGGER.debug("Opened embedding disk cache at %s (%d rows)", self.directory, len(self._disk))
+        return self._disk
+
+    def _open_existing_disk(self) -> None:
+        # The dimension is only known once something was encoded, so a cold
+        # process opens a previously written tier using its recorded meta.
+        if self._disk_probed or self.directory is None:
+            return
+        self._disk_probed = True
+        meta_path = os.path.join(self.directory, _META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self._disk_tier(int(json.load(f)["dim"]))
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, text: str) -> bool:
+        """Whether ``text`` is cached in either tier, without touching the counters or LRU order."""
+
+        key = content_key(self.namespace, text)
+        with self._lock:
+            if key in self._entries:
+                return True
+            if self._disk is None:
+                self._open_existing_disk()
+            return self._disk is not None and key in self._disk
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = content_key(self.namespace, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._disk is None:
+                self._open_existing_disk()
+            if self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        key = content_key(self.namespace, text)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            disk = self._disk_tier(vector.shape[-1])
+            if disk is not None:
+                disk.put(key, vector)
+
+    def get_or_encode(
+        self, texts: Sequence[str], encode: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """Return embeddings for ``texts``, calling ``encode`` only for misses.
+
+        ``encode`` receives the distinct missing texts in first-seen order and
+        must return one row per text.
+        """
+
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for text in dict.fromkeys(texts):
+            vector = self.get(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                found[text] = vector
+
+        if missing:
+            encoded = np.asarray(encode(missing), dtype=np.float32)
+            for text, vector in zip(missing, encoded):
+                self.put(text, vector)
+                found[text] = vector
+            if self._disk is not None:
+                with self._lock:
+                    self._disk.flush()
+
+        return np.stack([found[text] for text in texts])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "disk_size": len(self._disk) if self._disk is not None else 0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+__all__ = ["EmbeddingCache", "content_key", "DEFAULT_CACHE_CAPACITY"]
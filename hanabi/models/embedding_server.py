@@ -0,0 +1,362 @@
+"""Local embedding server sharing one model and one embedding cache across worker processes.
+
+The server owns the embedding backend and a float16 embedding matrix in POSIX
+shared memory.  Clients send texts over a Unix socket and receive row numbers;
+they read the vectors straight out of the shared segment, so N workers pay for
+one model and one cache.
+
+Run it with::
+
+    python -m hanabi.models.embedding_server --socket /run/hanabi/embedding.sock
+
+and point workers at it with ``HANABI_EMBEDDING_SERVER=/run/hanabi/embedding.sock``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import Process
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .embedding import SERVER_ENV, EmbeddingBackend, _current_backend
+from .embedding_service import EmbeddingService
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY_ROWS = 65_536
+DEFAULT_MAX_PENDING_TEXTS = 1024
+
+_RETRY_INITIAL_SECONDS = 0.005
+_RETRY_MAX_SECONDS = 0.5
+
+
+class _SharedMatrix:
+    """Fixed-size float16 matrix plus a per-row generation counter in one shared segment.
+
+    A row's generation is bumped whenever the row is reassigned, which lets a
+    reader detect that the vector it copied was overwritten underneath it.
+    """
+
+    def __init__(self, rows: int, dim: int, *, name: str | None = None) -> None:
+        vector_bytes = rows * dim * np.dtype(np.float16).itemsize
+        size = vector_bytes + rows * np.dtype(np.uint32).itemsize
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name, track=False)
+        self.rows = rows
+        self.dim = dim
+        self.vectors = np.ndarray((rows, dim), dtype=np.float16, buffer=self.shm.buf)
+        self.generations = np.ndarray((rows,), dtype=np.uint32, buffer=self.shm.buf, offset=vector_bytes)
+
+    def close(self, unlink: bool = False) -> None:
+        del self.vectors, self.generations
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class _ClientMetrics:
+    __slots__ = ("requests", "texts", "busy", "total_seconds", "max_seconds")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.texts = 0
+        self.busy = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, texts: int, seconds: float) -> None:
+        self.requests += 1
+        self.texts += texts
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "busy_rejections": self.busy,
+            "mean_latency_ms": self.total_seconds / self.requests * 1000 if self.requests else 0.0,
+            "max_latency_ms": self.max_seconds * 1000,
+        }
+
+
+class EmbeddingServer:
+    """Serve embeddings from one backend to many local client processes.
+
+    Encode requests from all clients are coalesced by an :class:`EmbeddingService`.
+    When more than ``max_pending_texts`` texts are waiting for the model, new
+    requests are answered with ``busy`` so clients back off instead of
+    queueing unbounded work.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        capacity_rows: int = DEFAULT_CAPACITY_ROWS,
+        max_pending_texts: int = DEFAULT_MAX_PENDING_TEXTS,
+        backend: EmbeddingBackend | None = None,
+    ) -> None:
+        self.address = address
+        self._backend = backend or _current_backend()
+        dim = self._backend.encode(["warmup"]).shape[1]
+        self._matrix = _SharedMatrix(capacity_rows, dim)
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._free_rows = list(range(capacity_rows - 1, -1, -1))
+        self._lock = threading.Lock()
+        self._pending_texts = 0
+        self._max_pending_texts = max_pending_texts
+        self._service = EmbeddingService(self._backend.encode)
+        self._metrics: Dict[str, _ClientMetrics] = {}
+        self._listener: Listener | None = None
+        self._stopping = threading.Event()
+        self.evictions = 0
+
+    def _assign(self, text: str, vector: np.ndarray) -> Tuple[int, int]:
+        # Caller holds self._lock.
+        row = self._rows.get(text)
+        if row is not None:
+            self._rows.move_to_end(text)
+            return row, int(self._matrix.generations[row])
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            _, row = self._rows.popitem(last=False)
+            self.evictions += 1
+        self._matrix.generations[row] += 1
+        self._matrix.vectors[row] = vector.astype(np.float16)
+        self._rows[text] = row
+        return row, int(self._matrix.generations[row])
+
+    def _encode(self, client: str, texts: Sequence[str]) -> Tuple[str, object]:
+        started = time.perf_counter()
+        metrics = self._metrics.setdefault(client, _ClientMetrics())
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts) if text not in self._rows]
+            # An idle server always accepts, so a request larger than the limit still makes progress.
+            if missing and self._pending_texts and self._pending_texts + len(missing) > self._max_pending_texts:
+                metrics.busy += 1
+                return "busy", _RETRY_INITIAL_SECONDS
+            self._pending_texts += len(missing)
+
+        vectors: Dict[str, np.ndarray] = {}
+        while True:
+            if missing:
+                try:
+                    encoded = self._service.submit_many(missing).result()
+                finally:
+                    with self._lock:
+                        self._pending_texts -= len(missing)
+                vectors.update(zip(missing, encoded))
+
+            with self._lock:
+                rows = []
+                evicted = []
+                for text in texts:
+                    row = self._rows.get(text)
+                    if row is not None:
+                        self._rows.move_to_end(text)
+                    elif text in vectors:
+                        row, _ = self._assign(text, vectors[text])
+                    else:
+                        # Evicted by a concurrent request; re-encode it outside the lock.
+                        evicted.append(text)
+                        continue
+                    rows.append((row, int(self._matrix.generations[row])))
+                if not evicted:
+                    break
+                missing = list(dict.fromkeys(evicted))
+                self._pending_texts += len(missing)
+        metrics.observe(len(texts), time.perf_counter() - started)
+        return "rows", rows
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "resident_rows": len(self._rows),
+                "capacity_rows": self._matrix.rows,
+                "evictions": self.evictions,
+                "pending_texts": self._pending_texts,
+                "service": self._service.stats(),
+                "clients": {name: metrics.as_dict() for name, metrics in self._metrics.items()},
+            }
+
+    def _serve_client(self, conn: Connection) -> None:
+        client = "anonymous"
+        try:
+            while not self._stopping.is_set():
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    break
+                kind = message[0]
+                if kind == "hello":
+                    client = message[1]
+                    conn.send(("ok", self._matrix.shm.name, self._matrix.rows, self._matrix.dim,
+                               self._backend.cache_namespace))
+                elif kind == "encode":
+                    conn.send(self._encode(client, message[1]))
+                elif kind == "stats":
+                    conn.send(("stats", self.stats()))
+                else:
+                    conn.send(("error", f"unknown request {kind!r}"))
+        except Exception as exc:
+            LOGGER.error("Embedding client %s failed: %s", client, exc)
+        finally:
+            conn.close()
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._service.start()
+        self._listener = Listener(self.address, family="AF_UNIX")
+        LOGGER.info("Embedding server listening on %s (shm %s)", self.address, self._matrix.shm.name)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        listener = self._listener
+        if listener is not None:
+            # Closing the listener does not wake a thread blocked in accept();
+            # a throwaway connection does, and the loop then sees _stopping.
+            try:
+                Client(self.address, family="AF_UNIX").close()
+            except OSError:
+                pass
+            listener.close()
+
+    def close(self) -> None:
+        self._service.stop()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._matrix.close(unlink=True)
+
+
+class RemoteBackend(EmbeddingBackend):
+    """Backend that forwards encode requests to an :class:`EmbeddingServer`.
+
+    Vectors are read from the server's shared memory segment, so each worker
+    process only holds a small LRU cache (``REMOTE_CACHE_CAPACITY`` entries,
+    no disk tier), not a model.
+    """
+
+    kind = "remote"
+
+    def __init__(self, *, server_address: str | None = None, client_name: str | None = None, **_: object) -> None:
+        address = server_address or os.environ.get(SERVER_ENV)
+        if not address:
+            raise ValueError(f"The remote embedding backend needs a server address; set {SERVER_ENV}.")
+        self._conn = Client(address, family="AF_UNIX")
+        self._lock = threading.Lock()
+        self._conn.send(("hello", client_name or f"pid-{os.getpid()}"))
+        _, shm_name, rows, dim, namespace = self._conn.recv()
+        self._matrix = _SharedMatrix(rows, dim, name=shm_name)
+        self._namespace = namespace
+        self.busy_retries = 0
+
+    @property
+    def cache_namespace(self) -> str:
+        return self._namespace
+
+    def _request(self, texts: List[str]) -> List[Tuple[int, int]]:
+        delay = _RETRY_INITIAL_SECONDS
+        while True:
+            with self._lock:
+                self._conn.send(("encode", texts))
+                kind, payload = self._conn.recv()
+            if kind == "rows":
+                return payload
+            if kind != "busy":
+                raise RuntimeError(f"Embedding server error: {payload}")
+            self.busy_retries += 1
+            time.sleep(delay)
+            delay = min(delay * 2, _RETRY_MAX_SECONDS)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        normalized = [text.strip() for text in texts if text and text.strip()]
+        if not normalized:
+            raise ValueError("All texts were empty after stripping whitespace.")
+
+        result = np.empty((len(normalized), self._matrix.dim), dtype=np.float32)
+        todo = list(range(len(normalized)))
+        while todo:
+            rows = self._request([normalized[i] for i in todo])
+            stale = []
+            for i, (row, generation) in zip(todo, rows):
+                result[i] = self._matrix.vectors[row]
+                if self._matrix.generations[row] != generation:
+                    stale.append(i)
+            todo = stale
+        return result
+
+    def server_stats(self) -> Dict[str, object]:
+        with self._lock:
+            self._conn.send(("stats",))
+            return self._conn.recv()[1]
+
+
+def start_server_process(address: str, **kwargs) -> Process:
+    """Start an :class:`EmbeddingServer` in a child process and wait until it accepts clients."""
+
+    if os.path.exists(address):
+        os.unlink(address)
+    process = Process(target=_run_server, args=(address,), kwargs=kwargs, name="embedding-server", daemon=True)
+    process.start()
+    while not os.path.exists(address):
+        if not process.is_alive():
+            raise RuntimeError("Embedding server exited during startup.")
+        time.sleep(0.05)
+    return process
+
+
+def _run_server(address: str, **kwargs) -> None:
+    server = EmbeddingServer(address, **kwargs)
+    # Release the shared segment and socket when the parent terminates us.
+    signal.signal(signal.SIGTERM, lambda *_: server.stop())
+    server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve embeddings to local Hanabi workers.")
+    parser.add_argument("--socket", default=os.environ.get(SERVER_ENV, "/tmp/hanabi-embedding.sock"))
+    parser.add_argument("--capacity-rows", type=int, default=DEFAULT_CAPACITY_ROWS)
+    parser.add_argument("--max-pending-texts", type=int, default=DEFAULT_MAX_PENDING_TEXTS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    server = EmbeddingServer(
+        args.socket, capacity_rows=args.capacity_rows, max_pending_texts=args.max_pending_texts
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+__all__ = ["EmbeddingServer", "RemoteBackend", "start_server_process", "SERVER_ENV"]
+
+
+if __name__ == "__main__":
+    main()
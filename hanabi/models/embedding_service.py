@@ -0,0 +1,140 @@
+"""Background micro-batching of embedding requests."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .embedding import DEFAULT_BATCH_SIZE, encode_texts
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WAIT_SECONDS = 0.005
+
+_STOP = object()
+
+
+class EmbeddingService:
+    """Worker thread that coalesces encode requests from many callers into model batches.
+
+    Requests submitted within ``max_wait`` seconds of each other are encoded
+    together, up to ``batch_size`` distinct texts per model call, so bursts of
+    unknown tokens cost a few full batches instead of many single-text calls.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[Sequence[str]], np.ndarray] = encode_texts,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT_SECONDS,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive.")
+        self._encode = encode
+        self._batch_size = batch_size
+        self._max_wait = max_wait
+        self._requests: "Queue[Tuple[List[str], Future] | object]" = Queue()
+        self._thread: threading.Thread | None = None
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.failures = 0
+
+    def start(self) -> "EmbeddingService":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 2.0) -> None:
+        if self._thread is not None:
+            self._requests.put(_STOP)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def submit_many(self, texts: Sequence[str]) -> Future:
+        """Queue ``texts`` for encoding; the future resolves to one row per text."""
+
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        self.requests += 1
+        self._requests.put((list(texts), future))
+        return future
+
+    def submit(self, text: str) -> Future:
+        """Queue a single text; the future resolves to its embedding vector."""
+
+        future: Future = Future()
+        batch = self.submit_many([text])
+        batch.add_done_callback(lambda done: _chain(done, future, lambda rows: rows[0]))
+        return future
+
+    def _collect(self, first: Tuple[List[str], Future]) -> Tuple[List[Tuple[List[str], Future]], bool]:
+        pending = [first]
+        distinct = set(first[0])
+        deadline = time.monotonic() + self._max_wait
+        while len(distinct) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._requests.get(timeout=remaining)
+            except Empty:
+                break
+            if item is _STOP:
+                return pending, True
+            pending.append(item)
+            distinct.update(item[0])
+        return pending, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._requests.get()
+            if item is _STOP:
+                break
+            pending, stopping = self._collect(item)
+            texts = list(dict.fromkeys(text for request, _ in pending for text in request))
+            try:
+                encoded = self._encode(texts)
+            except Exception as exc:  # pragma: no cover - depends on the model backend.
+                self.failures += 1
+                LOGGER.error("Embedding batch of %d texts failed: %s", len(texts), exc)
+                for _, future in pending:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            rows = {text: row for text, row in zip(texts, encoded)}
+            for request, future in pending:
+                future.set_result(np.stack([rows[text] for text in request]))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "failures": self.failures,
+            "queued": self._requests.qsize(),
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+def _chain(source: Future, target: Future, transform: Callable) -> None:
+    exc = source.exception()
+    if exc is not None:
+        target.set_exception(exc)
+    else:
+        target.set_result(transform(source.result()))
+
+
+__all__ = ["EmbeddingService", "DEFAULT_MAX_WAIT_SECONDS"]
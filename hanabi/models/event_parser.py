@@ -1,5 +1,19 @@
+import gzip
+import io
 import json
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, Iterator, List, Tuple, Union
+
+try:
+    # orjson为可选依赖，解析速度比标准库快数倍，直接接受bytes
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# 跳过起始偏移量、读取压缩流时每次读取的块大小
+_READ_CHUNK = 1 << 20
 
 
 class EventParser:
@@ -27,42 +41,135 @@ class EventParser:
         else:
             return {}
     
+    @staticmethod
+    def open_event_file(file_path: str) -> io.BufferedIOBase:
+        """
+        以二进制方式打开事件文件，按文件头自动识别gzip/zstd压缩
+
+        Args:
+            file_path: 事件文件路径
+
+        Returns:
+            二进制可读流，读出的是解压后的内容
+        """
+        raw = open(file_path, 'rb')
+        magic = raw.peek(4)[:4]
+        if magic.startswith(_GZIP_MAGIC):
+            return gzip.GzipFile(fileobj=raw, mode='rb')
+        if magic == _ZSTD_MAGIC:
+            try:
+                import zstandard
+            except ImportError:
+                raw.close()
+                raise RuntimeError(f"{file_path} is zstd-compressed; install the 'zstandard' package to read it.")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), _READ_CHUNK)
+        return raw
+
+    @staticmethod
+    def _skip_to(stream: io.BufferedIOBase, offset: int):
+        """把流定位到offset处，压缩流只能向前读取并丢弃"""
+        if offset <= 0:
+            return
+        if stream.seekable():
+            try:
+                stream.seek(offset)
+                return
+            except (OSError, ValueError):
+                pass
+        remaining = offset
+        while remaining > 0:
+            chunk = stream.read(min(remaining, _READ_CHUNK))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+    @staticmethod
+    def iter_event_records(file_path: str, start_offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        流式读取JSONL事件文件，内存占用与文件大小无关
+
+        Args:
+            file_path: 事件文件路径，支持gzip/zstd压缩
+            start_offset: 起始字节偏移量（解压后的偏移量），用于断点续读
+
+        Returns:
+            生成器，产出(该事件之后的字节偏移量, 事件字典)；把偏移量作为start_offset即可从下一个事件继续
+        """
+        offset = max(start_offset, 0)
+        parsed = 0
+        failed = 0
+        whole_array = False
+        # 第一个非空字节，只有'['或'{'开头的文件才可能是整体的JSON文档
+        first = b''
+        with EventParser.open_event_file(file_path) as stream:
+            EventParser._skip_to(stream, offset)
+            for line in stream:
+                offset += len(line)
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                if not first:
+                    first = stripped[:1]
+                if not parsed and not failed and start_offset <= 0 and first == b'[':
+                    # 文件本身是一个JSON数组
+                    whole_array = True
+                    break
+                try:
+                    event = _json_loads(line)
+                except ValueError:
+                    # 单行解析失败（例如格式化输出的多行JSON），跳过
+                    failed += 1
+                    continue
+                if isinstance(event, dict):
+                    parsed += 1
+                    yield offset, event
+                else:
+                    failed += 1
+
+        # 如果按行解析没有结果且文件以'['或'{'开头，尝试将整个文件作为JSON处理（整体加载，不再流式）；
+        # 其他内容不是JSON文档，不再把整个文件读入内存
+        if whole_array or (not parsed and failed and start_offset <= 0 and first == b'{'):
+            with EventParser.open_event_file(file_path) as stream:
+                content = stream.read()
+            try:
+                events = _json_loads(content)
+            except ValueError:
+                return
+            # 确保返回的是列表
+            if not isinstance(events, list):
+                events = [events]
+            for event in events:
+                yield len(content), event
+
+    @staticmethod
+    def iter_event_file(file_path: str, start_offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        流式读取事件文件
+
+        Args:
+            file_path: 事件文件路径，支持gzip/zstd压缩
+            start_offset: 起始字节偏移量
+
+        Returns:
+            生成器，逐个产出事件字典
+        """
+        for _, event in EventParser.iter_event_records(file_path, start_offset):
+            yield event
+
     @staticmethod
     def parse_event_file(file_path: str) -> List[Dict[str, Any]]:
         """
         解析事件文件
-        
+
         Args:
             file_path: 事件文件路径
-            
+
         Returns:
             list: 事件字典列表
         """
         events = []
         try:
-            with open(file_path, 'r') as f:
-                content = f.read().strip()
-                # 处理可能包含多个JSON对象的文件
-                for line in content.split('\n'):
-                    if line.strip():
-                        # 尝试解析每一行
-                        try:
-                            event = json.loads(line)
-                            events.append(event)
-                        except json.JSONDecodeError:
-                            # 如果单行解析失败，尝试将整个内容作为JSON处理
-                            pass
-                
-                # 如果按行解析没有结果，尝试将整个文件作为JSON数组处理
-                if not events:
-                    try:
-                        events = json.loads(content)
-                        # 确保返回的是列表
-                        if not isinstance(events, list):
-                            events = [events]
-                    except json.JSONDecodeError:
-                        pass
-                        
+            events.extend(EventParser.iter_event_file(file_path))
         except FileNotFoundError:
             print(f"Warning: File {file_path} not found.")
         except Exception as e:
@@ -3,6 +3,7 @@
 # hierarchical models that represent the behavior of containers based on
 # system call events and other relevant metrics.
 
+import os
 from typing import List, Dict, Any
 from .hbt_builder import HBTBuilder
 
@@ -11,9 +12,34 @@ from .hbt_builder import HBTBuilder
 # HBT从根节点开始有三个分支，分别为进程分支，网络分支，文件分支，这个对所有的HBTModel都是一样的
 # 对于每个分支进一步细分为不同路径节点
 class HBTModel:
-    def __init__(self, container_id: str):
+    def __init__(self, container_id: str, embedding_service=None, storage: str = None, snapshot: str = None,
+                 prewarm: bool = True):
+        # snapshot为HBTBuilder.save写出的文件或checkpoint目录，存在时从中热启动：
+        # 沿用学习状态与事件计数窗口，已收敛的模型直接进入检测期，不再经历预热和学习
         self.container_id = container_id
-        self.hbt_builder = HBTBuilder(container_id)
+        builder = None
+        if snapshot and os.path.isdir(snapshot):
+            builder = HBTBuilder.load_checkpoint(snapshot, embedding_service, storage)
+        elif snapshot and os.path.exists(snapshot):
+            builder = HBTBuilder.load(snapshot, embedding_service, storage)
+        if builder is None:
+            builder = HBTBuilder(container_id, embedding_service, storage)
+        elif prewarm:
+            # 已有节点名预先向量化进缓存
+            builder.prewarm_semantic()
+        self.hbt_builder = builder
+    
+    @classmethod
+    def from_builder(cls, builder: HBTBuilder) -> "HBTModel":
+        # 用已构建好的HBTBuilder（例如从共享基线继承的）创建模型
+        model = cls.__new__(cls)
+        model.container_id = builder.container_id
+        model.hbt_builder = builder
+        return model
+
+    @property
+    def learning(self) -> bool:
+        return self.hbt_builder.learn_state.learning
 
     def add_process_event(self, event: Dict[str, Any]):
         # 处理进程相关事件，更新 process_branch
@@ -27,5 +53,13 @@ class HBTModel:
         # 处理文件相关事件，更新 file_branch
         self.hbt_builder.add_event({"rule": "file", "output_fields": event})
 
+    def add_event(self, event: Dict[str, Any]):
+        # 原始Falco事件，由构建器按类别分发到对应分支
+        self.hbt_builder.add_event(event)
+
+    def reconcile(self):
+        # 对账等待向量的暂存token
+        self.hbt_builder.reconcile()
+
     def get_model(self) -> Dict[str, Any]:
         return self.hbt_builder.get_model()
\ No newline at end of file
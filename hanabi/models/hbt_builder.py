@@ -1,22 +1,43 @@
+import os
+import time
 from typing import Dict, Any, List
 from .tree_node import TreeNode
-from .branch_handlers import ProcessBranchHandler, NetworkBranchHandler, FileBranchHandler
+from .hbt_columnar import ColumnarTree
+from . import snapshot
+from .merge import merge_learning, merge_trees
+from .branch_handlers import LearnState, ProcessBranchHandler, NetworkBranchHandler, FileBranchHandler
 from .event_parser import EventParser
 from ..utils.timeCount import EventCounter
 
+# 存储引擎：tree为嵌套TreeNode，columnar为列式数组
+STORAGE_ENV = "HANABI_HBT_STORAGE"
+STORAGE_KINDS = ("tree", "columnar")
+# 每个节点的估算内存（字节），取自benchmarks/bench_tree_memory.py，包含节点名字符串
+NODE_BYTES_ESTIMATE = {"tree": 200, "columnar": 140}
+
 
 class HBTBuilder:
     """HBT模型构建器"""
     
-    def __init__(self, container_id: str):
+    def __init__(self, container_id: str, embedding_service=None, storage: str = None):
         """
         初始化HBT构建器
         
         Args:
             container_id: 容器ID
+            embedding_service: 可选的EmbeddingService，语义匹配改为后台批量推理
+            storage: 存储引擎，tree或columnar，默认读取环境变量HANABI_HBT_STORAGE，未设置为tree
         """
         self.container_id = container_id
-        self.root = TreeNode("root", "root")
+        self.storage = storage or os.environ.get(STORAGE_ENV, "tree")
+        if self.storage not in STORAGE_KINDS:
+            raise ValueError(f"Unknown HBT storage {self.storage!r}; expected one of {', '.join(STORAGE_KINDS)}")
+        if self.storage == "columnar":
+            self.tree = ColumnarTree()
+            self.root = self.tree.root
+        else:
+            self.tree = None
+            self.root = TreeNode("root", "root")
         
         # 创建三个主分支
         self.process_branch = self.root.add_child("process_branch", "branch")
@@ -24,13 +45,184 @@ class HBTBuilder:
         self.file_branch = self.root.add_child("file_branch", "branch")
         
         # 初始化分支处理器
+        # 学习状态与事件计数按模型独立，多个容器的模型互不影响
         self.eventCounter = EventCounter()
-        self.process_handler = ProcessBranchHandler(self.process_branch)
-        self.network_handler = NetworkBranchHandler(self.network_branch)
-        self.file_handler = FileBranchHandler(self.file_branch)
+        self.learn_state = LearnState()
+        self.process_handler = ProcessBranchHandler(self.process_branch, embedding_service, self.learn_state)
+        self.network_handler = NetworkBranchHandler(self.network_branch, embedding_service, self.learn_state)
+        self.file_handler = FileBranchHandler(self.file_branch, embedding_service, self.learn_state)
+        for handler in (self.process_handler, self.network_handler, self.file_handler):
+            handler.container_id = container_id
         
         # 初始化事件解析器
         self.event_parser = EventParser()
+        # checkpoint使用的快照日志，首次写检查点时创建
+        self._snapshot_log = None
+    
+    def _set_root(self, root, tree=None):
+        """替换整棵树，并把三个分支处理器重新指向新树的分支节点"""
+        self.tree = tree
+        self.root = root
+        self.process_branch = self.root.add_child("process_branch", "branch")
+        self.network_branch = self.root.add_child("network_branch", "branch")
+        self.file_branch = self.root.add_child("file_branch", "branch")
+        self.process_handler.root = self.process_branch
+        self.network_handler.root = self.network_branch
+        self.file_handler.root = self.file_branch
+        for handler in (self.process_handler, self.network_handler, self.file_handler):
+            handler.detection_index = None
+    
+    def node_count(self) -> int:
+        """树中的节点数"""
+        if self.tree is not None:
+            return self.tree.node_count()
+        count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
+    
+    def estimated_bytes(self) -> int:
+        """按节点数估算模型占用的内存"""
+        return self.node_count() * NODE_BYTES_ESTIMATE[self.storage]
+    
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """随快照保存的非树状态：学习状态与事件计数窗口"""
+        return {
+            "container_id": self.container_id,
+            "learning": self.learn_state.learning,
+            "converged_at": self.learn_state.converged_at,
+            "counter": self.eventCounter.state(),
+        }
+    
+    def _columnar(self) -> ColumnarTree:
+        return self.tree if self.tree is not None else ColumnarTree.from_tree_node(self.root)
+    
+    @classmethod
+    def _restore(cls, tree: ColumnarTree, state: Dict[str, Any], embedding_service=None,
+                 storage: str = None) -> "HBTBuilder":
+        builder = cls(state["container_id"], embedding_service, storage)
+        if builder.storage == "columnar":
+            builder._set_root(tree.root, tree)
+        else:
+            builder._set_root(tree.to_tree_node())
+        builder.learn_state.learning = state["learning"]
+        builder.learn_state.converged_at = state.get("converged_at")
+        builder.eventCounter = EventCounter.from_state(state["counter"])
+        return builder
+    
+    def save(self, path: str):
+        """
+        把模型（树、学习状态、事件计数窗口）写入一个全量二进制快照，格式见snapshot.py
+        
+        Args:
+            path: 快照文件路径
+        """
+        with open(path, "wb") as f:
+            f.write(snapshot.encode_full(self._columnar(), self._snapshot_state()))
+    
+    @classmethod
+    def load(cls, path: str, embedding_service=None, storage: str = None) -> "HBTBuilder":
+        """
+        从save写出的快照恢复模型
+        
+        Args:
+            path: 快照文件路径
+            embedding_service: 可选的EmbeddingService
+            storage: 恢复后使用的存储引擎，默认同HBTBuilder
+            
+        Returns:
+            HBTBuilder: 恢复的构建器
+        """
+        with open(path, "rb") as f:
+            arrays, state = snapshot.merge([snapshot.decode(f.read())])
+        return cls._restore(ColumnarTree.from_arrays(arrays), state, embedding_service, storage)
+    
+    def merge(self, *others: "HBTBuilder", semantic: bool = False):
+        """
+        把其他构建器的树合并进来（事件数相加、子节点取并集并对账节点名），见merge.py
+        
+        合并满足结合律与交换律，各节点/副本的部分模型可以按任意顺序合并。
+        合并后只要有一份仍在学习，模型就保持学习期。
+        
+        Args:
+            others: 其他HBTBuilder
+            semantic: 是否按n-gram/向量相似度对账节点名，默认只按归一化名称
+        """
+        root = merge_trees([self.root, *(other.root for other in others)], semantic=semantic)
+        if self.storage == "columnar":
+            tree = ColumnarTree.from_tree_node(root)
+            self._set_root(tree.root, tree)
+        else:
+            self._set_root(root)
+        self.learn_state.learning = merge_learning(
+            [self.learn_state.learning, *(other.learn_state.learning for other in others)])
+        if not self.learn_state.learning:
+            self.learn_state.converged_at = max(
+                builder.learn_state.converged_at or 0 for builder in (self, *others)) or None
+    
+    def semantic_keys(self) -> List[str]:
+        """树中参与语义匹配的节点名（根与三个分支节点以外的所有节点）"""
+        branches = (self.process_branch, self.network_branch, self.file_branch)
+        keys = {}
+        stack = list(branches)
+        while stack:
+            node = stack.pop()
+            for name, child in node.children.items():
+                keys[name] = None
+                stack.append(child)
+        return list(keys)
+    
+    def prewarm_semantic(self):
+        """
+        后台把已有节点名送去向量化，写入嵌入缓存，
+        恢复的模型遇到新token时不必再逐个等待已知key的向量
+        """
+        keys = self.semantic_keys()
+        if not keys:
+            return
+        embedding_service = self.process_handler.embedding_service
+        if embedding_service is not None:
+            embedding_service.submit_many(keys)
+        else:
+            from .embedding import prewarm
+            prewarm(keys)
+    
+    def checkpoint(self, directory: str) -> str:
+        """
+        向快照目录写入检查点：columnar存储只写上次检查点之后变化的节点，
+        tree存储每次转换节点ID都会变化，只能写全量快照。
+        HBTModelManager在设置了快照目录且未指定存储引擎时默认使用columnar
+        
+        Args:
+            directory: 快照目录
+            
+        Returns:
+            str: 写入的快照文件路径
+        """
+        if self._snapshot_log is None or self._snapshot_log.directory != directory:
+            self._snapshot_log = snapshot.SnapshotLog(directory)
+        return self._snapshot_log.checkpoint(self._columnar(), self._snapshot_state(), full=self.tree is None)
+    
+    @classmethod
+    def load_checkpoint(cls, directory: str, embedding_service=None, storage: str = None):
+        """
+        从快照目录恢复模型（最后一个全量快照叠加其后的增量）
+        
+        Args:
+            directory: checkpoint写入的目录
+            embedding_service: 可选的EmbeddingService
+            storage: 恢复后使用的存储引擎
+            
+        Returns:
+            HBTBuilder: 恢复的构建器，目录中没有快照时返回None
+        """
+        restored = snapshot.load_directory(directory)
+        if restored is None:
+            return None
+        return cls._restore(*restored, embedding_service, storage)
     
     def add_event(self, event: Dict[str, Any]):
         """
@@ -54,6 +246,14 @@ class HBTBuilder:
             self.file_handler.handle_event(output_fields,self.eventCounter)
         # 忽略未知类型的事件
     
+    def reconcile(self):
+        """
+        对账所有分支中向量已就绪的暂存token，适合在事件空闲时调用
+        """
+        self.process_handler.reconcile()
+        self.network_handler.reconcile()
+        self.file_handler.reconcile()
+    
     def add_events(self, events: List[Dict[str, Any]]):
         """
         批量添加事件到HBT模型
@@ -64,15 +264,62 @@ class HBTBuilder:
         for event in events:
             self.add_event(event)
     
-    def build_from_file(self, file_path: str):
+    def _read_records(self, file_path: str, start_offset: int):
+        """逐条读取事件记录，文件不存在或解析出错时与parse_event_file一样打印提示并结束"""
+        try:
+            yield from self.event_parser.iter_event_records(file_path, start_offset)
+        except FileNotFoundError:
+            print(f"Warning: File {file_path} not found.")
+        except Exception as e:
+            print(f"Error parsing event file {file_path}: {str(e)}")
+    
+    def build_from_file(self, file_path: str, chunk_size: int = 10000, start_offset: int = 0,
+                        progress_interval: float = 5.0) -> Dict[str, Any]:
         """
-        从文件构建HBT模型
+        从文件构建HBT模型，流式读取并按块调用add_events，内存占用与文件大小无关
+        
+        文件不存在或读取出错时不抛出异常：打印提示，出错前读出的事件照常建模，
+        返回的offset指向最后一个成功处理的事件之后，可用于续读
         
         Args:
-            file_path: 事件文件路径
+            file_path: 事件文件路径，支持JSONL及其gzip/zstd压缩文件
+            chunk_size: 每次交给add_events的事件数
+            start_offset: 起始字节偏移量，传入上次返回的offset即可断点续读
+            progress_interval: 进度输出间隔（秒），小于等于0时不输出
+            
+        Returns:
+            dict: 处理的事件数、耗时、每秒事件数以及可用于续读的offset
         """
-        events = self.event_parser.parse_event_file(file_path)
-        self.add_events(events)
+        started = time.perf_counter()
+        last_report = started
+        total = 0
+        offset = start_offset
+        chunk = []
+        for offset, event in self._read_records(file_path, start_offset):
+            chunk.append(event)
+            if len(chunk) >= chunk_size:
+                self.add_events(chunk)
+                total += len(chunk)
+                chunk = []
+                now = time.perf_counter()
+                if progress_interval > 0 and now - last_report >= progress_interval:
+                    last_report = now
+                    print(f"{file_path}: {total} events, offset {offset}, "
+                          f"{total / (now - started):.0f} events/s")
+        if chunk:
+            self.add_events(chunk)
+            total += len(chunk)
+        elapsed = time.perf_counter() - started
+        summary = {
+            "events": total,
+            "seconds": elapsed,
+            "events_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "offset": offset,
+        }
+        if progress_interval > 0:
+            print(f"{file_path}: loaded {total} events in {elapsed:.1f}s "
+                  f"({summary['events_per_second']:.0f} events/s)")
+        return summary
     
     def get_model(self) -> Dict[str, Any]:
         """
@@ -93,7 +340,7 @@ class HBTBuilder:
         Returns:
             dict: 统计信息
         """
-        return {
+        statistics = {
             "container_id": self.container_id,
             "total_events": (
                 self.process_branch.events_count +
@@ -103,4 +350,18 @@ class HBTBuilder:
             "process_events": self.process_branch.events_count,
             "network_events": self.network_branch.events_count,
             "file_events": self.file_branch.events_count
-        }
\ No newline at end of file
+        }
+        if self.tree is not None:
+            # 列式存储可以直接向量化统计节点数与各分支子树的事件总数
+            statistics["node_count"] = self.tree.node_count()
+            statistics["subtree_events"] = self.tree.subtree_events()
+        return statistics
+    
+    def to_arrays(self) -> Dict[str, Any]:
+        """
+        以列式数组导出模型，tree存储会先转换为列式
+        
+        Returns:
+            dict: 各列的numpy数组与字符串表
+        """
+        return self._columnar().to_arrays()
\ No newline at end of file
@@ -0,0 +1,592 @@
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .tree_node import TreeNode
+
+# 表示无父节点/无子节点/无兄弟节点
+_NONE = -1
+# 被remove_child摘下、尚未重新挂载的节点的父节点标记
+_DETACHED = -2
+
+
+class _StringTable:
+    """字符串表：字符串 <-> 整数ID"""
+
+    __slots__ = ("strings", "ids")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class _ChildIndex:
+    """(父节点, 名称ID) -> 子节点 的开放寻址哈希表
+
+    键与值保存在两个定长数组中（线性探测，删除使用墓碑标记），
+    每个节点只占十几个字节，而dict的一项连同两个int对象要上百字节。
+    """
+
+    _EMPTY = -1
+    _TOMBSTONE = -2
+    # 64位斐波那契哈希乘数，把父节点与名称ID的组合打散到低位
+    _MULTIPLIER = 0x9E3779B97F4A7C15
+
+    __slots__ = ("keys", "values", "mask", "used", "filled")
+
+    def __init__(self, capacity: int = 64):
+        self.keys = array("q", [self._EMPTY]) * capacity
+        self.values = array("i", [_NONE]) * capacity
+        self.mask = capacity - 1
+        self.used = 0
+        self.filled = 0
+
+    def _slot(self, key: int) -> int:
+        return ((key * self._MULTIPLIER) >> 24) & self.mask
+
+    def get(self, key: int) -> int:
+        keys = self.keys
+        slot = self._slot(key)
+        while True:
+            current = keys[slot]
+            if current == key:
+                return self.values[slot]
+            if current == self._EMPTY:
+                return _NONE
+            slot = (slot + 1) & self.mask
+
+    def set(self, key: int, value: int):
+        if (self.filled + 1) * 2 > len(self.keys):
+            self._resize(len(self.keys) * 2 if self.used * 2 >= self.filled else len(self.keys))
+        keys = self.keys
+        slot = self._slot(key)
+        free = _NONE
+        while True:
+            current = keys[slot]
+            if current == key:
+                self.values[slot] = value
+                return
+            if current == self._EMPTY:
+                break
+            if current == self._TOMBSTONE and free == _NONE:
+                free = slot
+            slot = (slot + 1) & self.mask
+        if free == _NONE:
+            free = slot
+            self.filled += 1
+        keys[free] = key
+        self.values[free] = value
+        self.used += 1
+
+    def delete(self, key: int):
+        keys = self.keys
+        slot = self._slot(key)
+        while True:
+            current = keys[slot]
+            if current == key:
+                keys[slot] = self._TOMBSTONE
+                self.values[slot] = _NONE
+                self.used -= 1
+                return
+            if current == self._EMPTY:
+                raise KeyError(key)
+            slot = (slot + 1) & self.mask
+
+    @classmethod
+    def bulk_load(cls, keys: np.ndarray, values: np.ndarray) -> "_ChildIndex":
+        """
+        一次性构建索引：按轮次向量化地线性探测，每轮每个空槽只放入一个键，
+        其余键前进一格。槽位排列可能与逐个set不同，但每个键的探测链上都没有空槽，
+        get/set/delete的结果与逐个set构建的索引相同
+
+        Args:
+            keys: 互不相同的非负键
+            values: 对应的值
+
+        Returns:
+            _ChildIndex: 装载率不超过一半的索引
+        """
+        capacity = 64
+        while capacity < len(keys) * 2:
+            capacity *= 2
+        index = cls(capacity)
+        table_keys = np.frombuffer(index.keys, dtype=np.int64)
+        table_values = np.frombuffer(index.values, dtype=np.int32)
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int32)
+        slots = ((keys.astype(np.uint64) * np.uint64(cls._MULTIPLIER)) >> np.uint64(24)).astype(np.int64) & index.mask
+        pending = np.arange(len(keys))
+        while len(pending):
+            targets = slots[pending]
+            free = table_keys[targets] == cls._EMPTY
+            _, first = np.unique(targets, return_index=True)
+            winners = np.zeros(len(pending), dtype=bool)
+            winners[first] = True
+            winners &= free
+            placed = pending[winners]
+            table_keys[slots[placed]] = keys[placed]
+            table_values[slots[placed]] = values[placed]
+            pending = pending[~winners]
+            slots[pending] = (slots[pending] + 1) & index.mask
+        index.used = index.filled = len(keys)
+        return index
+
+    def _resize(self, capacity: int):
+        old_keys, old_values = self.keys, self.values
+        self.keys = array("q", [self._EMPTY]) * capacity
+        self.values = array("i", [_NONE]) * capacity
+        self.mask = capacity - 1
+        self.used = 0
+        self.filled = 0
+        for key, value in zip(old_keys, old_values):
+            if key >= 0:
+                self.set(key, value)
+
+    def __len__(self):
+        return self.used
+
+    def nbytes(self) -> int:
+        return self.keys.itemsize * len(self.keys) + self.values.itemsize * len(self.values)
+
+
+class ColumnarTree:
+    """列式存储的HBT树
+
+    节点保存在一组平行数组中（父节点下标、类型码、名称ID、事件数、最后更新时间），
+    名称与类型通过字符串表编码为整数，(父节点, 名称ID) -> 子节点 使用一个整数键的哈希索引，
+    子节点之间用 first_child / next_sibling 数组串成链表以便遍历。
+    统计、序列化和遍历可以直接基于数组做向量化计算。
+    """
+
+    def __init__(self):
+        self.parent = array("i")
+        self.type_code = array("B")
+        self.name_id = array("i")
+        self.events = array("q")
+        self.last_seen = array("q")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.child_count = array("i")
+        self.names = _StringTable()
+        self.types = _StringTable()
+        # (parent << 32) | name_id -> 子节点下标
+        self.child_index = _ChildIndex()
+        # 稀疏存储：只有被做过语义匹配/写过元数据的节点才有
+        self.semantic_indexes: Dict[int, Any] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.root = self.node(self._new_node(_NONE, "root", "root"))
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def from_tree_node(cls, root) -> "ColumnarTree":
+        """
+        由TreeNode树转换为列式存储
+
+        Args:
+            root: TreeNode根节点
+
+        Returns:
+            ColumnarTree: 结构与计数相同的列式树
+        """
+        tree = cls()
+        stack = [(root, 0)]
+        while stack:
+            node, node_id = stack.pop()
+            tree.events[node_id] = node.events_count
+            tree.last_seen[node_id] = node.last_updated_ns
+            if node._metadata:
+                tree.metadata[node_id] = dict(node._metadata)
+            for child in node.children.values():
+                stack.append((child, tree._new_node(node_id, child.name, child.node_type)))
+        return tree
+
+    def _new_node(self, parent: int, name: str, node_type: str) -> int:
+        node_id = len(self.parent)
+        name_id = self.names.intern(name)
+        self.parent.append(parent)
+        self.type_code.append(self.types.intern(node_type))
+        self.name_id.append(name_id)
+        self.events.append(0)
+        self.last_seen.append(time.time_ns())
+        self.first_child.append(_NONE)
+        self.next_sibling.append(_NONE)
+        self.child_count.append(0)
+        if parent >= 0:
+            self._link(parent, node_id)
+        return node_id
+
+    def _link(self, parent: int, node_id: int):
+        self.parent[node_id] = parent
+        self.next_sibling[node_id] = self.first_child[parent]
+        self.first_child[parent] = node_id
+        self.child_count[parent] += 1
+        self.child_index.set((parent << 32) | self.name_id[node_id], node_id)
+
+    def _unlink(self, node_id: int):
+        parent = self.parent[node_id]
+        self.child_index.delete((parent << 32) | self.name_id[node_id])
+        previous, current = _NONE, self.first_child[parent]
+        while current != node_id:
+            previous, current = current, self.next_sibling[current]
+        if previous == _NONE:
+            self.first_child[parent] = self.next_sibling[node_id]
+        else:
+            self.next_sibling[previous] = self.next_sibling[node_id]
+        self.next_sibling[node_id] = _NONE
+        self.child_count[parent] -= 1
+        self.parent[node_id] = _DETACHED
+
+    def child(self, parent: int, name: str) -> int:
+        """返回parent下名为name的子节点下标，不存在返回-1"""
+        name_id = self.names.ids.get(name)
+        if name_id is None:
+            return _NONE
+        return self.child_index.get((parent << 32) | name_id)
+
+    def child_ids(self, parent: int) -> Iterator[int]:
+        current = self.first_child[parent]
+        while current != _NONE:
+            yield current
+            current = self.next_sibling[current]
+
+    def node(self, node_id: int) -> "ColumnarNode":
+        return ColumnarNode(self, node_id)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """以numpy数组（零拷贝视图）返回各列"""
+        return {
+            "parent": np.frombuffer(self.parent, dtype=np.int32),
+            "type_code": np.frombuffer(self.type_code, dtype=np.uint8),
+            "name_id": np.frombuffer(self.name_id, dtype=np.int32),
+            "events": np.frombuffer(self.events, dtype=np.int64),
+            "last_seen": np.frombuffer(self.last_seen, dtype=np.int64),
+        }
+
+    def node_count(self) -> int:
+        """挂在树上的节点数（不含被合并后摘下的节点）"""
+        return int(np.count_nonzero(np.frombuffer(self.parent, dtype=np.int32) != _DETACHED))
+
+    def to_arrays(self) -> Dict[str, Any]:
+        """
+        导出全部列与字符串表，便于快照或批量分析
+
+        Returns:
+            dict: 各列的numpy数组拷贝，以及names/types字符串表
+        """
+        arrays: Dict[str, Any] = {name: column.copy() for name, column in self.columns().items()}
+        arrays["names"] = list(self.names.strings)
+        arrays["types"] = list(self.types.strings)
+        arrays["metadata"] = {node_id: dict(values) for node_id, values in self.metadata.items() if values}
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Any]) -> "ColumnarTree":
+        """
+        由to_arrays导出的数据重建列式树
+
+        Args:
+            arrays: to_arrays的返回值
+
+        Returns:
+            ColumnarTree: 重建的树，子节点链表与哈希索引重新生成
+        """
+        tree = cls()
+        count = len(arrays["parent"])
+        tree.names = _StringTable()
+        for name in arrays["names"]:
+            tree.names.intern(name)
+        tree.types = _StringTable()
+        for node_type in arrays["types"]:
+            tree.types.intern(node_type)
+        for column, typecode, dtype in (
+            ("parent", "i", np.int32), ("type_code", "B", np.uint8), ("name_id", "i", np.int32),
+            ("events", "q", np.int64), ("last_seen", "q", np.int64),
+        ):
+            values = array(typecode)
+            values.frombytes(np.ascontiguousarray(arrays[column], dtype=dtype).tobytes())
+            setattr(tree, column, values)
+        # 与按ID顺序逐个_link的结果相同：子节点链表头插，first_child为该父节点下ID最大的子节点
+        parent = np.frombuffer(tree.parent, dtype=np.int32)
+        attached = np.flatnonzero(parent >= 0).astype(np.int32)
+        attached = attached[np.argsort(parent[attached], kind="stable")]
+        parents = parent[attached]
+        same = np.zeros(len(attached), dtype=bool)
+        same[1:] = parents[1:] == parents[:-1]
+        next_sibling = np.full(count, _NONE, dtype=np.int32)
+        next_sibling[attached[same]] = attached[np.flatnonzero(same) - 1]
+        first_child = np.full(count, _NONE, dtype=np.int32)
+        first_child[parents] = attached
+        child_count = np.bincount(parents, minlength=count).astype(np.int32)
+        for column, values in (("first_child", first_child), ("next_sibling", next_sibling),
+                               ("child_count", child_count)):
+            setattr(tree, column, array("i", values.tobytes()))
+        name_id = np.frombuffer(tree.name_id, dtype=np.int32)
+        keys = (parents.astype(np.int64) << 32) | name_id[attached]
+        tree.child_index = _ChildIndex.bulk_load(keys, attached)
+        tree.metadata = {int(node_id): dict(values) for node_id, values in arrays.get("metadata", {}).items()}
+        tree.root = tree.node(0)
+        return tree
+
+    def to_tree_node(self) -> TreeNode:
+        """
+        转换为TreeNode树（不含被合并后摘下的节点）
+
+        Returns:
+            TreeNode: 根节点
+        """
+        names = self.names.strings
+        types = self.types.strings
+        nodes = []
+        for node_id in range(len(self)):
+            node = TreeNode(names[self.name_id[node_id]], types[self.type_code[node_id]])
+            node.events_count = self.events[node_id]
+            node.last_updated_ns = self.last_seen[node_id]
+            if node_id in self.metadata:
+                node.metadata = dict(self.metadata[node_id])
+            nodes.append(node)
+        # 子节点可能先于父节点创建（合并时被移到新节点下），先建全部节点再按链表挂载
+        for node_id in range(len(self)):
+            children = list(self.child_ids(node_id))
+            children.reverse()
+            for child in children:
+                nodes[node_id].attach_child(nodes[child])
+        return nodes[0]
+
+    def top_level_ancestors(self) -> np.ndarray:
+        """向量化计算每个节点所属的根下一级节点（即所属分支），根节点与游离节点为-1"""
+        parent = np.frombuffer(self.parent, dtype=np.int32)
+        top = np.arange(len(parent), dtype=np.int32)
+        attached = parent >= 0
+        # 指针跳跃：反复把节点替换为其父节点，直到父节点是根
+        while True:
+            parents = np.where(top >= 0, parent[np.maximum(top, 0)], _NONE)
+            move = (parents > 0) & attached
+            if not move.any():
+                break
+            top = np.where(move, parents, top)
+        top[~attached] = _NONE
+        top[0] = _NONE
+        return top
+
+    def subtree_events(self) -> Dict[str, int]:
+        """各分支子树中的事件总数"""
+        top = self.top_level_ancestors()
+        events = np.frombuffer(self.events, dtype=np.int64)
+        valid = top >= 0
+        totals = np.bincount(top[valid], weights=events[valid], minlength=len(top))
+        return {self.names.strings[self.name_id[node_id]]: int(totals[node_id]) for node_id in self.child_ids(0)}
+
+    def iter_paths(self, node_id: int = 0, prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], int]]:
+        """深度优先遍历叶子节点，返回(从根下一级开始的名称路径, 事件数)"""
+        for child in self.child_ids(node_id):
+            path = prefix + (self.names.strings[self.name_id[child]],)
+            if self.first_child[child] == _NONE:
+                yield path, self.events[child]
+            else:
+                yield from self.iter_paths(child, path)
+
+    def to_dict(self, node_id: int = 0) -> Dict[str, Any]:
+        """与TreeNode.to_dict相同格式的字典"""
+        names = self.names.strings
+        types = self.types.strings
+
+        def build(current: int) -> Dict[str, Any]:
+            # 链表是头插法，逆序后与插入顺序一致
+            children = list(self.child_ids(current))
+            children.reverse()
+            return {
+                "name": names[self.name_id[current]],
+                "type": types[self.type_code[current]],
+                "events_count": self.events[current],
+                "metadata": self.metadata.get(current, {}),
+                "children": {names[self.name_id[child]]: build(child) for child in children},
+            }
+
+        return build(node_id)
+
+    def memory_bytes(self) -> int:
+        """数组列与索引占用的近似字节数（不含字符串表中字符串本身）"""
+        columns = sum(column.itemsize * len(column) for column in (
+            self.parent, self.type_code, self.name_id, self.events, self.last_seen,
+            self.first_child, self.next_sibling, self.child_count,
+        ))
+        return columns + self.child_index.nbytes()
+
+
+class _ChildrenView(Mapping):
+    """某个节点子节点的只读映射视图：名称 -> ColumnarNode"""
+
+    __slots__ = ("_tree", "_id")
+
+    def __init__(self, tree: ColumnarTree, node_id: int):
+        self._tree = tree
+        self._id = node_id
+
+    def __getitem__(self, name: str) -> "ColumnarNode":
+        child = self._tree.child(self._id, name)
+        if child == _NONE:
+            raise KeyError(name)
+        return ColumnarNode(self._tree, child)
+
+    def __contains__(self, name) -> bool:
+        return self._tree.child(self._id, name) != _NONE
+
+    def __iter__(self):
+        names = self._tree.names.strings
+        name_id = self._tree.name_id
+        children = list(self._tree.child_ids(self._id))
+        children.reverse()
+        return (names[name_id[child]] for child in children)
+
+    def __len__(self) -> int:
+        return self._tree.child_count[self._id]
+
+
+class ColumnarNode:
+    """ColumnarTree中单个节点的轻量视图，接口与TreeNode一致，供分支处理器直接使用"""
+
+    __slots__ = ("_tree", "_id")
+
+    def __init__(self, tree: ColumnarTree, node_id: int):
+        self._tree = tree
+        self._id = node_id
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ColumnarNode) and other._tree is self._tree and other._id == self._id
+
+    def __hash__(self) -> int:
+        return hash((id(self._tree), self._id))
+
+    @property
+    def name(self) -> str:
+        return self._tree.names.strings[self._tree.name_id[self._id]]
+
+    @property
+    def node_type(self) -> str:
+        return self._tree.types.strings[self._tree.type_code[self._id]]
+
+    @property
+    def events_count(self) -> int:
+        return self._tree.events[self._id]
+
+    @events_count.setter
+    def events_count(self, value: int):
+        self._tree.events[self._id] = value
+        self._tree.last_seen[self._id] = time.time_ns()
+
+    @property
+    def last_updated_ns(self) -> int:
+        return self._tree.last_seen[self._id]
+
+    @property
+    def last_updated(self) -> datetime:
+        return datetime.fromtimestamp(self.last_updated_ns / 1e9)
+
+    @property
+    def children(self) -> Mapping[str, "ColumnarNode"]:
+        return _ChildrenView(self._tree, self._id)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._tree.metadata.setdefault(self._id, {})
+
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]):
+        if value:
+            self._tree.metadata[self._id] = value
+        else:
+            self._tree.metadata.pop(self._id, None)
+        self._tree.last_seen[self._id] = time.time_ns()
+
+    def add_child(self, child_name: str, child_type: str) -> "ColumnarNode":
+        """
+        添加子节点
+
+        Args:
+            child_name: 子节点名称
+            child_type: 子节点类型
+
+        Returns:
+            ColumnarNode: 创建或已存在的子节点
+        """
+        tree = self._tree
+        child = tree.child(self._id, child_name)
+        if child == _NONE:
+            child = tree._new_node(self._id, child_name, child_type)
+            index = tree.semantic_indexes.get(self._id)
+            if index is not None:
+                index.add(child_name)
+        return ColumnarNode(tree, child)
+
+    def get_child(self, child_name: str) -> Optional["ColumnarNode"]:
+        child = self._tree.child(self._id, child_name)
+        return None if child == _NONE else ColumnarNode(self._tree, child)
+
+    def remove_child(self, child_name: str) -> Optional["ColumnarNode"]:
+        tree = self._tree
+        child = tree.child(self._id, child_name)
+        if child == _NONE:
+            return None
+        tree._unlink(child)
+        # 父节点变化也是更新，增量快照据此带上该节点
+        tree.last_seen[child] = time.time_ns()
+        index = tree.semantic_indexes.get(self._id)
+        if index is not None:
+            index.remove(child_name)
+        return ColumnarNode(tree, child)
+
+    def attach_child(self, child: "ColumnarNode") -> "ColumnarNode":
+        existing = self.get_child(child.name)
+        if existing is not None:
+            existing.absorb(child)
+            return existing
+        tree = self._tree
+        tree._link(self._id, child._id)
+        tree.last_seen[child._id] = time.time_ns()
+        index = tree.semantic_indexes.get(self._id)
+        if index is not None:
+            index.add(child.name)
+        return child
+
+    def absorb(self, other: "ColumnarNode"):
+        tree = self._tree
+        tree.events[self._id] += tree.events[other._id]
+        for child_id in list(tree.child_ids(other._id)):
+            tree._unlink(child_id)
+            self.attach_child(ColumnarNode(tree, child_id))
+        tree.last_seen[self._id] = time.time_ns()
+
+    def find_semantic_child(self, query: str, service=None):
+        if not self._tree.child_count[self._id]:
+            return None
+        index = self._tree.semantic_indexes.get(self._id)
+        if index is None:
+            from .embedding import SemanticIndex
+            index = self._tree.semantic_indexes[self._id] = SemanticIndex(self.children.keys())
+        return index.match(query, service=service)
+
+    def increment_events_count(self, count: int = 1):
+        self._tree.events[self._id] += count
+        self._tree.last_seen[self._id] = time.time_ns()
+
+    def update_metadata(self, key: str, value: Any):
+        self.metadata[key] = value
+        self._tree.last_seen[self._id] = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._tree.to_dict(self._id)
@@ -0,0 +1,666 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .alerts import ALERTS
+from .hbt import HBTModel
+from .hbt_builder import STORAGE_ENV
+from . import snapshot
+from .baseline import BASELINE_DIR_ENV, BaselineStore, image_repository
+
+# 分片进程数，0表示在当前进程内处理所有容器
+WORKERS_ENV = "HANABI_WORKERS"
+# 事件中没有容器信息时（宿主机进程）使用的模型key
+HOST_KEY = "host"
+# 常驻内存的模型数上限，超出后把最久未活动的模型写入磁盘，0表示不限制
+MAX_RESIDENT_ENV = "HANABI_MAX_RESIDENT_MODELS"
+# 常驻模型的估算内存上限（字节），0表示不限制
+MAX_RESIDENT_BYTES_ENV = "HANABI_MAX_RESIDENT_BYTES"
+# 模型超过该秒数没有事件即写入磁盘，0表示不按时间换出
+IDLE_TTL_ENV = "HANABI_MODEL_IDLE_TTL"
+# 换出模型的快照目录，未设置时使用临时目录
+SPILL_DIR_ENV = "HANABI_SPILL_DIR"
+# 换出快照的保留时间（秒），超过后删除快照，该容器再有事件时按新容器处理；0表示永久保留
+SPILL_MAX_AGE_ENV = "HANABI_SPILL_MAX_AGE"
+# 周期性检查点目录（每个容器一个子目录），进程重启后从中恢复模型；未设置时不写检查点
+SNAPSHOT_DIR_ENV = "HANABI_SNAPSHOT_DIR"
+# 两次检查点的间隔（秒）
+SNAPSHOT_INTERVAL_ENV = "HANABI_SNAPSHOT_INTERVAL"
+
+
+# 注册表计数，顺序即分片共享数组中每个分片槽位的顺序
+REGISTRY_COUNTS = ("resident", "spilled", "evictions", "reloads", "expired")
+
+
+def container_key(event: Dict[str, Any]) -> str:
+    """
+    事件所属容器的模型key，优先使用container.id，其次container.name
+
+    Args:
+        event: Falco事件，可以带output_fields，也可以本身就是输出字段
+
+    Returns:
+        str: 模型key
+    """
+    fields = event.get("output_fields", event)
+    for field in ("container.id", "container.name"):
+        value = fields.get(field)
+        if value and value != "host":
+            return str(value)
+    return HOST_KEY
+
+
+def saved_model_keys(snapshot_dir: Optional[str]) -> List[str]:
+    """
+    检查点目录中已保存模型的容器key
+
+    Args:
+        snapshot_dir: HBTModelManager的检查点目录
+
+    Returns:
+        list: 容器key
+    """
+    if not snapshot_dir or not os.path.isdir(snapshot_dir):
+        return []
+    keys = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        state = snapshot.directory_state(os.path.join(snapshot_dir, name))
+        if state and "container_id" in state:
+            keys.append(state["container_id"])
+    return keys
+
+
+class HBTModelManager:
+    """
+    在当前进程内为每个容器维护一个独立的HBTModel。
+    模型按最近活动时间组成LRU，超过数量/内存上限或空闲超时的模型写入磁盘快照并释放，
+    该容器的事件再次出现时自动从快照恢复
+    """
+
+    def __init__(self, embedding_service=None, storage: str = None, max_resident: int = None,
+                 max_resident_bytes: int = None, idle_ttl: float = None, spill_dir: str = None,
+                 maintain_interval: float = 1.0, snapshot_dir: str = None, snapshot_interval: float = None,
+                 baseline_dir: str = None, spill_max_age: float = None):
+        """
+        初始化模型管理器
+
+        Args:
+            embedding_service: 所有模型共用的EmbeddingService
+            storage: HBT存储引擎，见HBTBuilder
+            max_resident: 常驻模型数上限，默认读取HANABI_MAX_RESIDENT_MODELS
+            max_resident_bytes: 常驻模型估算内存上限，默认读取HANABI_MAX_RESIDENT_BYTES
+            idle_ttl: 空闲换出时间（秒），默认读取HANABI_MODEL_IDLE_TTL
+            spill_dir: 快照目录，默认读取HANABI_SPILL_DIR
+            maintain_interval: 两次检查换出的最小间隔（秒）
+            snapshot_dir: 检查点目录，默认读取HANABI_SNAPSHOT_DIR
+            snapshot_interval: 检查点间隔（秒），默认读取HANABI_SNAPSHOT_INTERVAL，未设置为60
+            baseline_dir: 按镜像共享的基线目录，默认读取HANABI_BASELINE_DIR；
+                已收敛的模型按检查点间隔发布到基线，同镜像的新容器从基线继承
+            spill_max_age: 换出快照的保留时间（秒），默认读取HANABI_SPILL_MAX_AGE，未设置为1天
+        """
+        self.embedding_service = embedding_service
+        self.storage = storage
+        if max_resident is None:
+            max_resident = int(os.environ.get(MAX_RESIDENT_ENV, "0"))
+        if max_resident_bytes is None:
+            max_resident_bytes = int(os.environ.get(MAX_RESIDENT_BYTES_ENV, "0"))
+        if idle_ttl is None:
+            idle_ttl = float(os.environ.get(IDLE_TTL_ENV, "0"))
+        if spill_max_age is None:
+            spill_max_age = float(os.environ.get(SPILL_MAX_AGE_ENV, "86400"))
+        self.max_resident = max_resident
+        self.max_resident_bytes = max_resident_bytes
+        self.idle_ttl = idle_ttl
+        self.spill_max_age = spill_max_age
+        self.maintain_interval = maintain_interval
+        self.spill_dir = spill_dir or os.environ.get(SPILL_DIR_ENV)
+        self._owns_spill_dir = False
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        elif max_resident or max_resident_bytes or idle_ttl:
+            self.spill_dir = tempfile.mkdtemp(prefix="hanabi-spill-")
+            self._owns_spill_dir = True
+        # 最久未活动的模型在前
+        self.models: "OrderedDict[str, HBTModel]" = OrderedDict()
+        self.last_seen: Dict[str, float] = {}
+        self.spilled: Dict[str, str] = {}
+        # 换出时间，按换出先后排列
+        self.spilled_at: Dict[str, float] = {}
+        self.evictions = 0
+        self.reloads = 0
+        self.expired = 0
+        self._last_maintain = time.monotonic()
+        self.snapshot_dir = snapshot_dir or os.environ.get(SNAPSHOT_DIR_ENV)
+        if self.snapshot_dir and self.storage is None and STORAGE_ENV not in os.environ:
+            # 增量检查点需要稳定的节点ID，只有columnar存储支持；tree存储每次都写全量
+            self.storage = "columnar"
+        if snapshot_interval is None:
+            snapshot_interval = float(os.environ.get(SNAPSHOT_INTERVAL_ENV, "60"))
+        self.snapshot_interval = snapshot_interval
+        self._last_checkpoint = time.monotonic()
+        baseline_dir = baseline_dir or os.environ.get(BASELINE_DIR_ENV)
+        self.baselines = BaselineStore(baseline_dir) if baseline_dir else None
+        # 容器key -> 镜像仓库
+        self.images: Dict[str, str] = {}
+
+    def _spill_path(self, key: str) -> str:
+        digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.hbts")
+
+    def _snapshot_path(self, key: str) -> str:
+        digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+        return os.path.join(self.snapshot_dir, digest)
+
+    def _load(self, key: str) -> HBTModel:
+        # 换出前的节点名仍在本进程的嵌入缓存中，不必预热
+        return HBTModel(key, self.embedding_service, self.storage, snapshot=self.spilled[key], prewarm=False)
+
+    def _create(self, key: str) -> HBTModel:
+        """新建模型；有该容器的检查点时从检查点热启动，否则尝试从所属镜像的基线继承"""
+        snapshot = self._snapshot_path(key) if self.snapshot_dir else None
+        image = self.images.get(key)
+        if self.baselines is not None and image and not (snapshot and os.path.isdir(snapshot)):
+            builder = self.baselines.inherit(image, key, self.embedding_service, self.storage)
+            if builder is not None:
+                builder.prewarm_semantic()
+                return HBTModel.from_builder(builder)
+        return HBTModel(key, self.embedding_service, self.storage, snapshot=snapshot)
+
+    def warm_start(self, keys: Iterable[str] = None) -> int:
+        """
+        启动时从检查点恢复模型，而不是等各容器的第一个事件到达时再加载
+
+        Args:
+            keys: 要恢复的容器key，默认为检查点目录中的全部
+
+        Returns:
+            int: 恢复的模型数
+        """
+        count = 0
+        for key in saved_model_keys(self.snapshot_dir) if keys is None else keys:
+            if key not in self.models:
+                self.get_or_create(key)
+                count += 1
+        self.maintain(force=True)
+        return count
+
+    def get_or_create(self, key: str) -> HBTModel:
+        model = self.models.get(key)
+        if model is None:
+            if key in self.spilled:
+                model = self._load(key)
+                os.unlink(self.spilled.pop(key))
+                del self.spilled_at[key]
+                self.reloads += 1
+            else:
+                model = self._create(key)
+            self.models[key] = model
+        else:
+            self.models.move_to_end(key)
+        self.last_seen[key] = time.monotonic()
+        return model
+
+    def spill(self, key: str):
+        """
+        把模型写入磁盘快照并从内存中释放
+
+        Args:
+            key: 容器key
+        """
+        model = self.models.pop(key)
+        # 先把暂存token对账进树，快照中不保存待向量化的状态
+        model.reconcile()
+        path = self._spill_path(key)
+        model.hbt_builder.save(path)
+        if self.snapshot_dir:
+            model.hbt_builder.checkpoint(self._snapshot_path(key))
+        self._publish(key, model)
+        self.spilled[key] = path
+        self.spilled_at[key] = time.monotonic()
+        self.last_seen.pop(key, None)
+        self.evictions += 1
+
+    def expire_spilled(self, now: float = None) -> int:
+        """
+        删除换出超过spill_max_age的快照；检查点和已发布的基线不受影响
+
+        Args:
+            now: 当前time.monotonic()，默认取当前时间
+
+        Returns:
+            int: 删除的快照数
+        """
+        if not self.spill_max_age:
+            return 0
+        now = time.monotonic() if now is None else now
+        expired = []
+        for key, spilled_at in self.spilled_at.items():
+            if now - spilled_at <= self.spill_max_age:
+                break
+            expired.append(key)
+        for key in expired:
+            path = self.spilled.pop(key)
+            del self.spilled_at[key]
+            self.images.pop(key, None)
+            if os.path.exists(path):
+                os.unlink(path)
+        self.expired += len(expired)
+        return len(expired)
+
+    def resident_bytes(self) -> int:
+        return sum(model.hbt_builder.estimated_bytes() for model in self.models.values())
+
+    def checkpoint(self):
+        """为所有常驻模型写检查点（已换出的模型在换出时已写过）"""
+        for key, model in self.models.items():
+            model.hbt_builder.checkpoint(self._snapshot_path(key))
+        self._last_checkpoint = time.monotonic()
+
+    def _publish(self, key: str, model: HBTModel):
+        image = self.images.get(key)
+        if self.baselines is not None and image and not model.learning:
+            self.baselines.publish(image, key, model.hbt_builder)
+
+    def publish_baselines(self):
+        """把已收敛的常驻模型发布到所属镜像的基线（覆盖该容器之前发布的版本）"""
+        for key, model in self.models.items():
+            self._publish(key, model)
+
+    def maintain(self, force: bool = False):
+        """按空闲时间、常驻数量和内存上限换出模型、删除过期快照并按间隔写检查点，间隔maintain_interval执行一次"""
+        now = time.monotonic()
+        if not force and now - self._last_maintain < self.maintain_interval:
+            return
+        self._last_maintain = now
+        if (self.snapshot_dir or self.baselines) and (force or now - self._last_checkpoint >= self.snapshot_interval):
+            if self.snapshot_dir:
+                self.checkpoint()
+            self.publish_baselines()
+            self._last_checkpoint = now
+        if not self.spill_dir:
+            return
+        self.expire_spilled(now)
+        if self.idle_ttl:
+            for key in [key for key in self.models if now - self.last_seen[key] > self.idle_ttl]:
+                self.spill(key)
+        if self.max_resident:
+            while len(self.models) > self.max_resident:
+                self.spill(next(iter(self.models)))
+        if self.max_resident_bytes:
+            sizes = {key: model.hbt_builder.estimated_bytes() for key, model in self.models.items()}
+            total = sum(sizes.values())
+            # 至少保留最近活动的一个模型
+            while total > self.max_resident_bytes and len(self.models) > 1:
+                key = next(iter(self.models))
+                total -= sizes[key]
+                self.spill(key)
+
+    def add_event(self, event: Dict[str, Any]):
+        """
+        把事件路由到所属容器的模型
+
+        Args:
+            event: Falco事件
+        """
+        key = container_key(event)
+        if key not in self.images:
+            image = image_repository(event)
+            if image:
+                self.images[key] = image
+        self.get_or_create(key).add_event(event)
+
+    def add_events(self, events: Iterable[Dict[str, Any]]):
+        for event in events:
+            self.add_event(event)
+        self.maintain()
+
+    def reconcile(self):
+        for model in self.models.values():
+            model.reconcile()
+        self.maintain()
+
+    def _all_models(self):
+        """遍历所有模型，已换出的模型临时加载，不改变其换出状态"""
+        yield from self.models.items()
+        for key in list(self.spilled):
+            yield key, self._load(key)
+
+    def get_models(self, include_spilled: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        获取模型字典
+
+        Args:
+            include_spilled: 是否包括已换出到磁盘的模型；为True时逐个临时加载，
+                但返回的字典同时保存全部模型，换出很多时应只取常驻模型
+
+        Returns:
+            dict: 容器key -> 模型字典
+        """
+        models = self._all_models() if include_spilled else self.models.items()
+        return {key: model.get_model() for key, model in models}
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        return {key: model.hbt_builder.get_statistics() for key, model in self._all_models()}
+
+    def registry_counts(self) -> Dict[str, int]:
+        """常驻/已换出模型数与换出/加载/过期次数，不遍历模型，可以在抓取线程中调用"""
+        return {
+            "resident": len(self.models),
+            "spilled": len(self.spilled),
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "expired": self.expired,
+        }
+
+    def get_registry_stats(self) -> Dict[str, int]:
+        """
+        模型注册表统计
+
+        Returns:
+            dict: resident（常驻模型数）、spilled（已换出模型数）、evictions、reloads、
+                expired（过期删除的快照数）、resident_bytes（估算）
+        """
+        stats = self.registry_counts()
+        stats["resident_bytes"] = self.resident_bytes()
+        return stats
+
+    def close(self):
+        if self.snapshot_dir:
+            self.checkpoint()
+        self.publish_baselines()
+        if self.baselines is not None:
+            self.baselines.prune()
+        for path in self.spilled.values():
+            if os.path.exists(path):
+                os.unlink(path)
+        self.spilled.clear()
+        self.spilled_at.clear()
+        if self._owns_spill_dir:
+            os.rmdir(self.spill_dir)
+            self._owns_spill_dir = False
+
+
+class ConsistentHashRing:
+    """一致性哈希环：容器key -> 分片编号，增减分片时只有少量容器迁移"""
+
+    def __init__(self, shards: int, replicas: int = 64):
+        """
+        初始化哈希环
+
+        Args:
+            shards: 分片数
+            replicas: 每个分片在环上的虚拟节点数
+        """
+        points = []
+        for shard in range(shards):
+            for replica in range(replicas):
+                points.append((self._hash(f"{shard}:{replica}"), shard))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+def _worker_main(shard: int, inbox, outbox, alerts, counts, storage: Optional[str],
+                 embedding_server: Optional[str]):
+    """分片进程：在本进程内用HBTModelManager处理分配到的容器，每条消息处理后把注册表计数写入counts中本分片的槽位"""
+    from .embedding import configure_backend
+    from .embedding_service import EmbeddingService
+
+    # 告警不经过回复队列，由专用队列立即送回主进程
+    ALERTS.add_listener(alerts.put)
+
+    if embedding_server:
+        # 多个分片共用一个嵌入服务进程中的模型与缓存
+        configure_backend("remote", server_address=embedding_server)
+    service = EmbeddingService().start()
+    manager = HBTModelManager(service, storage)
+    slot = shard * len(REGISTRY_COUNTS)
+    try:
+        while True:
+            counts[slot:slot + len(REGISTRY_COUNTS)] = list(manager.registry_counts().values())
+            message = inbox.get()
+            kind = message[0]
+            if kind == "events":
+                manager.add_events(message[1])
+            elif kind == "reconcile":
+                manager.reconcile()
+            elif kind == "warm":
+                manager.warm_start(message[1])
+            elif kind == "call":
+                _, request_id, method, args = message
+                outbox.put((request_id, shard, getattr(manager, method)(*args)))
+            elif kind == "stop":
+                break
+    finally:
+        manager.close()
+        service.stop()
+
+
+class ShardedModelManager:
+    """
+    按一致性哈希把容器分配到多个进程，每个进程维护所属容器的HBTModel，
+    使数百个容器的建模可以随CPU核数扩展，而不是都串行经过一个Python循环
+    """
+
+    def __init__(self, workers: int = None, storage: str = None, embedding_server: str = None):
+        """
+        初始化并启动分片进程
+
+        Args:
+            workers: 分片进程数，默认为CPU核数
+            storage: HBT存储引擎，见HBTBuilder
+            embedding_server: 嵌入服务socket地址；未设置且分片数大于1时自动启动一个嵌入服务进程，
+                各分片共用其中的模型与缓存，不再各自加载模型
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._embedding_server = None
+        self._embedding_dir = None
+        if embedding_server is None and self.workers > 1:
+            embedding_server = self._start_embedding_server()
+        self.ring = ConsistentHashRing(self.workers)
+        self._shard_cache: Dict[str, int] = {}
+        self._outbox = multiprocessing.Queue()
+        self._alerts = multiprocessing.Queue()
+        self._inboxes = []
+        self._processes = []
+        self._request_id = 0
+        # 各分片的注册表计数，抓取时直接读取，不经过消息队列
+        self._counts = multiprocessing.Array("q", self.workers * len(REGISTRY_COUNTS), lock=False)
+        for shard in range(self.workers):
+            inbox = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(shard, inbox, self._outbox, self._alerts, self._counts, storage, embedding_server),
+                name=f"hbt-shard-{shard}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        self._alert_thread = threading.Thread(target=self._forward_alerts, name="hbt-alerts", daemon=True)
+        self._alert_thread.start()
+
+    def _start_embedding_server(self) -> Optional[str]:
+        """启动本管理器专用的嵌入服务进程，失败（例如未安装模型依赖）时各分片退回进程内模型"""
+        from .embedding_server import start_server_process
+
+        self._embedding_dir = tempfile.mkdtemp(prefix="hanabi-embedding-")
+        address = os.path.join(self._embedding_dir, "embedding.sock")
+        try:
+            self._embedding_server = start_server_process(address)
+        except Exception as exc:
+            print(f"Warning: embedding server did not start, each shard loads its own model: {exc}")
+            os.rmdir(self._embedding_dir)
+            self._embedding_dir = None
+            return None
+        return address
+
+    def _forward_alerts(self):
+        """把各分片的告警发布到本进程的告警通道"""
+        while True:
+            alert = self._alerts.get()
+            if alert is None:
+                return
+            ALERTS.publish(alert)
+
+    def shard_for(self, key: str) -> int:
+        shard = self._shard_cache.get(key)
+        if shard is None:
+            shard = self._shard_cache[key] = self.ring.shard_for(key)
+        return shard
+
+    def add_events(self, events: Iterable[Dict[str, Any]]):
+        """
+        按容器所属分片分组后批量发送，每个分片每批只序列化一次
+
+        Args:
+            events: Falco事件列表
+        """
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for event in events:
+            buckets.setdefault(self.shard_for(container_key(event)), []).append(event)
+        for shard, bucket in buckets.items():
+            self._inboxes[shard].put(("events", bucket))
+
+    def add_event(self, event: Dict[str, Any]):
+        self.add_events([event])
+
+    def reconcile(self):
+        for inbox in self._inboxes:
+            inbox.put(("reconcile",))
+
+    def warm_start(self, keys: Iterable[str] = None) -> int:
+        """按分片把检查点目录中的模型分发给各进程恢复，返回分发的模型数"""
+        if keys is None:
+            keys = saved_model_keys(os.environ.get(SNAPSHOT_DIR_ENV))
+        buckets: Dict[int, List[str]] = {}
+        for key in keys:
+            buckets.setdefault(self.shard_for(key), []).append(key)
+        for shard, bucket in buckets.items():
+            self._inboxes[shard].put(("warm", bucket))
+        return sum(len(bucket) for bucket in buckets.values())
+
+    def _collect(self, method: str, *args, timeout: float = 60.0) -> List[Any]:
+        """在所有分片上调用管理器方法，返回各分片的结果"""
+        self._request_id += 1
+        request_id = self._request_id
+        for inbox in self._inboxes:
+            inbox.put(("call", request_id, method, args))
+        results: List[Any] = [None] * self.workers
+        pending = set(range(self.workers))
+        while pending:
+            try:
+                reply_id, shard, result = self._outbox.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"HBT shards {sorted(pending)} did not answer {method!r}")
+            if reply_id == request_id:
+                results[shard] = result
+                pending.discard(shard)
+        return results
+
+    def _call_all(self, method: str, *args) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        for result in self._collect(method, *args):
+            merged.update(result)
+        return merged
+
+    def get_models(self, include_spilled: bool = True) -> Dict[str, Dict[str, Any]]:
+        """各分片中的模型，容器key -> 模型字典，include_spilled见HBTModelManager.get_models"""
+        return self._call_all("get_models", include_spilled)
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        return self._call_all("get_statistics")
+
+    def registry_counts(self) -> Dict[str, int]:
+        """各分片最近一次处理消息后的注册表计数之和"""
+        values = self._counts[:]
+        width = len(REGISTRY_COUNTS)
+        return {name: sum(values[index::width]) for index, name in enumerate(REGISTRY_COUNTS)}
+
+    def get_registry_stats(self) -> Dict[str, int]:
+        """各分片模型注册表统计之和"""
+        totals: Dict[str, int] = {}
+        for stats in self._collect("get_registry_stats"):
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def close(self, timeout: float = 5.0):
+        for inbox in self._inboxes:
+            inbox.put(("stop",))
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._alerts.put(None)
+        self._alert_thread.join(timeout)
+        if self._embedding_server is not None:
+            # SIGTERM使服务进程释放共享内存并删除socket
+            self._embedding_server.terminate()
+            self._embedding_server.join(timeout)
+            self._embedding_server = None
+        if self._embedding_dir is not None:
+            shutil.rmtree(self._embedding_dir, ignore_errors=True)
+            self._embedding_dir = None
+
+
+class ModelRegistryMetrics:
+    """
+    prometheus_client的自定义collector：常驻/已换出模型数与换出/加载/过期次数，
+    抓取时读取manager.registry_counts()，HBTModelManager与ShardedModelManager均可
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def collect(self):
+        counts = self.manager.registry_counts()
+        models = GaugeMetricFamily('hanabi_models', 'HBT models by residency.', labels=['state'])
+        models.add_metric(['resident'], counts["resident"])
+        models.add_metric(['spilled'], counts["spilled"])
+        yield models
+        yield CounterMetricFamily('hanabi_model_evictions', 'HBT models spilled to disk.', value=counts["evictions"])
+        yield CounterMetricFamily('hanabi_model_reloads', 'Spilled HBT models loaded back.', value=counts["reloads"])
+        yield CounterMetricFamily('hanabi_model_spill_expired', 'Spilled HBT snapshots deleted after HANABI_SPILL_MAX_AGE.',
+                                  value=counts["expired"])
+
+
+def create_model_manager(embedding_service=None, storage: str = None, workers: int = None,
+                         embedding_server: str = None):
+    """
+    按配置创建模型管理器
+
+    Args:
+        embedding_service: 进程内模式下所有模型共用的EmbeddingService
+        storage: HBT存储引擎
+        workers: 分片进程数，默认读取HANABI_WORKERS，为0时在当前进程内处理
+        embedding_server: 分片模式下各进程共用的嵌入服务地址，默认读取HANABI_EMBEDDING_SERVER；
+            都未设置且workers大于1时由ShardedModelManager自动启动
+
+    Returns:
+        HBTModelManager或ShardedModelManager
+    """
+    if workers is None:
+        workers = int(os.environ.get(WORKERS_ENV, "0"))
+    if workers <= 0:
+        return HBTModelManager(embedding_service, storage)
+    from .embedding import SERVER_ENV
+    return ShardedModelManager(workers, storage, embedding_server or os.environ.get(SERVER_ENV))
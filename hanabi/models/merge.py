@@ -0,0 +1,155 @@
+# HBT树的合并
+#
+# 同一镜像的容器运行在多个节点上，各自学习到的行为树可以合并为一个共享的基线。
+# 合并对节点名做语义对账：同一层中互相匹配的名称（归一化后相同，或开启semantic时
+# n-gram/向量相似）归为一组，以字典序最小的名称为准，其余名称记入metadata["aliases"]。
+# 分组取匹配关系的连通分量，且别名随节点保留，因此合并满足结合律与交换律，
+# 部分结果可以按任意顺序再合并。
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .embedding import DEFAULT_THRESHOLD, encode_texts, minhash_signature, normalize_token, _matcher_settings
+from .tree_node import TreeNode
+
+ALIASES_KEY = "aliases"
+
+
+class _UnionFind:
+    def __init__(self, items: Iterable[str]):
+        self.parent = {item: item for item in items}
+
+    def find(self, item: str) -> str:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: str, b: str):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # 以较小的名称为根，结果与合并顺序无关
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def semantic_pairs(names: List[str], threshold: float = DEFAULT_THRESHOLD) -> Iterable[tuple]:
+    """
+    成对判断名称是否语义匹配：n-gram相似度足够高直接匹配，足够低直接排除，
+    介于两者之间时比较向量余弦相似度。判断只依赖两个名称本身，与其他名称无关
+
+    Args:
+        names: 同一层的名称
+        threshold: 向量相似度阈值
+
+    Returns:
+        匹配的(名称, 名称)对
+    """
+    if len(names) < 2:
+        return []
+    signatures = np.stack([minhash_signature(normalize_token(name)) for name in names])
+    pairs = []
+    undecided = []
+    for i in range(len(names)):
+        similarity = (signatures[i + 1:] == signatures[i]).mean(axis=1)
+        for offset, value in enumerate(similarity.tolist()):
+            j = i + 1 + offset
+            if value >= _matcher_settings["ngram_accept"]:
+                pairs.append((names[i], names[j]))
+            elif value >= _matcher_settings["ngram_reject"]:
+                undecided.append((i, j))
+    if undecided:
+        embeddings = encode_texts([name.strip() for name in names])
+        for i, j in undecided:
+            if float(embeddings[i] @ embeddings[j]) >= threshold:
+                pairs.append((names[i], names[j]))
+    return pairs
+
+
+def _node_names(node) -> List[str]:
+    metadata = node.metadata if node.metadata else {}
+    return [node.name, *metadata.get(ALIASES_KEY, ())]
+
+
+def _merge_metadata(nodes: List[Any]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for node in nodes:
+        for key, value in (node.metadata or {}).items():
+            if key == ALIASES_KEY:
+                continue
+            # 冲突时取repr较大的值，保证结果与顺序无关
+            if key not in merged or repr(value) > repr(merged[key]):
+                merged[key] = value
+    return merged
+
+
+def _merge_level(nodes: List[Any], semantic: bool, threshold: float) -> TreeNode:
+    names = {name for node in nodes for name in _node_names(node)}
+    canonical = min(names)
+    merged = TreeNode(canonical, min(node.node_type for node in nodes))
+    merged.events_count = sum(node.events_count for node in nodes)
+    merged.last_updated_ns = max(node.last_updated_ns for node in nodes)
+    metadata = _merge_metadata(nodes)
+    aliases = sorted(names - {canonical})
+    if aliases:
+        metadata[ALIASES_KEY] = aliases
+    merged.metadata = metadata
+    for group in _group_children([child for node in nodes for child in node.children.values()], semantic, threshold):
+        merged.attach_child(_merge_level(group, semantic, threshold))
+    return merged
+
+
+def _group_children(children: List[Any], semantic: bool, threshold: float) -> List[List[Any]]:
+    """把同一层的子节点按名称匹配关系的连通分量分组"""
+    if not children:
+        return []
+    names = sorted({name for child in children for name in _node_names(child)})
+    groups = _UnionFind(names)
+    for child in children:
+        own = _node_names(child)
+        for alias in own[1:]:
+            groups.union(own[0], alias)
+    by_normalized: Dict[str, str] = {}
+    for name in names:
+        normalized = normalize_token(name)
+        if normalized in by_normalized:
+            groups.union(by_normalized[normalized], name)
+        else:
+            by_normalized[normalized] = name
+    if semantic:
+        for a, b in semantic_pairs(names, threshold):
+            groups.union(a, b)
+    grouped: Dict[str, List[Any]] = {}
+    for child in children:
+        grouped.setdefault(groups.find(child.name), []).append(child)
+    return [grouped[root] for root in sorted(grouped)]
+
+
+def merge_trees(roots: Iterable[Any], semantic: bool = False, threshold: float = DEFAULT_THRESHOLD) -> TreeNode:
+    """
+    合并多棵HBT树，返回新树，不修改输入
+
+    同名（含别名）或语义匹配的子节点合并为一个节点：事件数相加，子节点递归合并，
+    最后更新时间取最大值。
+
+    Args:
+        roots: 根节点，TreeNode或ColumnarNode均可
+        semantic: 除归一化名称外，是否还按n-gram/向量相似度对账节点名
+        threshold: 向量相似度阈值
+
+    Returns:
+        TreeNode: 合并后的根节点
+    """
+    roots = list(roots)
+    if not roots:
+        raise ValueError("merge_trees needs at least one tree")
+    return _merge_level(roots, semantic, threshold)
+
+
+def merge_learning(states: Iterable[Optional[bool]]) -> bool:
+    """合并后的模型只要有一份仍在学习就保持学习期，全部收敛后才进入检测期"""
+    return any(states)
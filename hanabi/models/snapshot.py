@@ -0,0 +1,381 @@
+# HBT二进制快照格式
+#
+# 一个快照文件由定长文件头和（zlib压缩的）正文组成：
+#
+#   文件头  magic "HBTS" | 版本 u16 | 类型 u8 (0=全量, 1=增量) | 压缩标志 u8 |
+#           since_ns i64 | 节点总数 u32 | 行数 u32 | 名称起始ID u32 | 类型起始ID u32
+#   正文    名称字符串表 | 类型字符串表 | 行节点ID i32[行数]（仅增量） |
+#           parent i32 | type_code u8 | name_id i32 | events i64 | last_seen i64（各[行数]） |
+#           元数据JSON | 状态JSON
+#
+# 字符串表为 u32个数 + u32长度[个数] + UTF-8字节。全量快照包含全部节点与字符串；
+# 增量快照只包含上次检查点之后 last_seen 有变化或新建的节点，以及新加入的字符串，
+# 按顺序叠加到全量快照上即可得到最新的树。
+#
+# last_seen与since_ns是墙上时间（time.time_ns()），跨进程、跨节点可比较。
+
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .hbt_columnar import ColumnarTree
+
+MAGIC = b"HBTS"
+VERSION = 1
+# 增量按last_seen >= since_ns - CLOCK_SLACK_NS选择节点，容忍墙上时间的小幅回拨
+CLOCK_SLACK_NS = 1_000_000_000
+FULL = 0
+DELTA = 1
+
+_HEADER = struct.Struct("<4sHBBqIIII")
+_U32 = struct.Struct("<I")
+# 列名、numpy类型
+_COLUMNS = (
+    ("parent", np.int32),
+    ("type_code", np.uint8),
+    ("name_id", np.int32),
+    ("events", np.int64),
+    ("last_seen", np.int64),
+)
+_FULL_SUFFIX = ".full.hbts"
+_DELTA_SUFFIX = ".delta.hbts"
+
+
+def _pack_strings(strings: List[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in strings]
+    lengths = np.array([len(value) for value in encoded], dtype=np.uint32)
+    return _U32.pack(len(encoded)) + lengths.tobytes() + b"".join(encoded)
+
+
+def _pack_json(value: Any) -> bytes:
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return _U32.pack(len(data)) + data
+
+
+class _Reader:
+    """按顺序读取正文各段"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.offset = 0
+
+    def u32(self) -> int:
+        (value,) = _U32.unpack_from(self.body, self.offset)
+        self.offset += _U32.size
+        return value
+
+    def array(self, dtype, count: int) -> np.ndarray:
+        values = np.frombuffer(self.body, dtype=dtype, count=count, offset=self.offset)
+        self.offset += values.nbytes
+        return values
+
+    def strings(self) -> List[str]:
+        lengths = self.array(np.uint32, self.u32())
+        strings = []
+        for length in lengths.tolist():
+            strings.append(self.body[self.offset:self.offset + length].decode("utf-8"))
+            self.offset += length
+        return strings
+
+    def json(self) -> Any:
+        length = self.u32()
+        value = json.loads(self.body[self.offset:self.offset + length].decode("utf-8"))
+        self.offset += length
+        return value
+
+
+def _encode(kind: int, tree: ColumnarTree, rows: Optional[np.ndarray], since_ns: int, names_start: int,
+            types_start: int, state: Optional[Dict[str, Any]], compress: bool) -> bytes:
+    columns = tree.columns()
+    if rows is None:
+        row_columns = columns
+        metadata = {str(node_id): values for node_id, values in tree.metadata.items() if values}
+        row_count = len(tree)
+        ids = b""
+    else:
+        row_columns = {name: column[rows] for name, column in columns.items()}
+        # 增量中的行没有元数据时，合并时清除该节点原有的元数据
+        metadata = {str(node_id): tree.metadata[node_id] for node_id in rows.tolist()
+                    if tree.metadata.get(node_id)}
+        row_count = len(rows)
+        ids = rows.astype(np.int32).tobytes()
+    parts = [
+        _pack_strings(tree.names.strings[names_start:]),
+        _pack_strings(tree.types.strings[types_start:]),
+        ids,
+    ]
+    for name, dtype in _COLUMNS:
+        parts.append(np.ascontiguousarray(row_columns[name], dtype=dtype).tobytes())
+    parts.append(_pack_json(metadata))
+    parts.append(_pack_json(state or {}))
+    body = b"".join(parts)
+    if compress:
+        body = zlib.compress(body, 1)
+    header = _HEADER.pack(MAGIC, VERSION, kind, int(compress), since_ns, len(tree), row_count, names_start, types_start)
+    return header + body
+
+
+def encode_full(tree: ColumnarTree, state: Dict[str, Any] = None, compress: bool = True) -> bytes:
+    """
+    编码全量快照
+
+    Args:
+        tree: 列式树
+        state: 随快照保存的附加状态（可JSON序列化）
+        compress: 是否zlib压缩正文
+
+    Returns:
+        bytes: 快照数据
+    """
+    return _encode(FULL, tree, None, 0, 0, 0, state, compress)
+
+
+def encode_delta(tree: ColumnarTree, since_ns: int, base_nodes: int, base_names: int, base_types: int,
+                 state: Dict[str, Any] = None, compress: bool = True) -> bytes:
+    """
+    编码增量快照：只包含since_ns之后更新过的节点与base_nodes之后新建的节点
+
+    Args:
+        tree: 列式树
+        since_ns: 上次检查点的墙上时间（纳秒）
+        base_nodes: 上次检查点时的节点数
+        base_names: 上次检查点时名称表的长度
+        base_types: 上次检查点时类型表的长度
+        state: 随快照保存的附加状态
+        compress: 是否zlib压缩正文
+
+    Returns:
+        bytes: 快照数据
+    """
+    last_seen = tree.columns()["last_seen"]
+    changed = last_seen >= since_ns - CLOCK_SLACK_NS
+    changed[base_nodes:] = True
+    rows = np.flatnonzero(changed)
+    return _encode(DELTA, tree, rows, since_ns, base_names, base_types, state, compress)
+
+
+def decode(data: bytes) -> Dict[str, Any]:
+    """
+    解码一个快照
+
+    Args:
+        data: encode_full/encode_delta的输出
+
+    Returns:
+        dict: kind、since_ns、node_count、names/types（新增部分）及起始ID、ids（增量行的节点ID）、
+              各列数组、metadata、state
+    """
+    magic, version, kind, compressed, since_ns, node_count, row_count, names_start, types_start = \
+        _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not an HBT snapshot")
+    if version != VERSION:
+        raise ValueError(f"unsupported HBT snapshot version {version}")
+    body = data[_HEADER.size:]
+    if compressed:
+        body = zlib.decompress(body)
+    reader = _Reader(body)
+    snapshot = {
+        "kind": kind,
+        "since_ns": since_ns,
+        "node_count": node_count,
+        "names_start": names_start,
+        "names": reader.strings(),
+        "types_start": types_start,
+        "types": reader.strings(),
+        "ids": reader.array(np.int32, row_count) if kind == DELTA else None,
+    }
+    snapshot["columns"] = {name: reader.array(dtype, row_count) for name, dtype in _COLUMNS}
+    snapshot["metadata"] = reader.json()
+    snapshot["state"] = reader.json()
+    return snapshot
+
+
+def merge(snapshots: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    把一个全量快照和其后的增量快照按顺序合并
+
+    Args:
+        snapshots: decode的结果列表，第一个必须是全量快照
+
+    Returns:
+        tuple: (ColumnarTree.from_arrays可用的数组字典, 最后一个快照的状态)
+    """
+    if not snapshots or snapshots[0]["kind"] != FULL:
+        raise ValueError("a snapshot chain must start with a full snapshot")
+    base = snapshots[0]
+    arrays: Dict[str, Any] = {name: column.copy() for name, column in base["columns"].items()}
+    names, types = list(base["names"]), list(base["types"])
+    metadata = dict(base["metadata"])
+    for delta in snapshots[1:]:
+        if delta["kind"] != DELTA:
+            raise ValueError("expected a delta snapshot")
+        if delta["names_start"] != len(names) or delta["types_start"] != len(types):
+            raise ValueError("delta snapshot does not follow the previous snapshot")
+        names.extend(delta["names"])
+        types.extend(delta["types"])
+        ids = delta["ids"]
+        for name, column in delta["columns"].items():
+            current = arrays[name]
+            if len(current) < delta["node_count"]:
+                grown = np.zeros(delta["node_count"], dtype=current.dtype)
+                grown[:len(current)] = current
+                arrays[name] = current = grown
+            current[ids] = column
+        if metadata:
+            rows = set(str(node_id) for node_id in ids.tolist())
+            for node_id in [node_id for node_id in metadata if node_id in rows]:
+                del metadata[node_id]
+        metadata.update(delta["metadata"])
+    arrays["names"] = names
+    arrays["types"] = types
+    arrays["metadata"] = metadata
+    return arrays, snapshots[-1]["state"]
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _chain(directory: str) -> List[str]:
+    """目录中从最后一个全量快照开始的快照文件"""
+    files = sorted(name for name in os.listdir(directory) if name.endswith((_FULL_SUFFIX, _DELTA_SUFFIX)))
+    start = None
+    for index, name in enumerate(files):
+        if name.endswith(_FULL_SUFFIX):
+            start = index
+    if start is None:
+        return []
+    return [os.path.join(directory, name) for name in files[start:]]
+
+
+def load_directory(directory: str) -> Optional[Tuple[ColumnarTree, Dict[str, Any]]]:
+    """
+    从快照目录恢复树
+
+    Args:
+        directory: SnapshotLog写入的目录
+
+    Returns:
+        tuple: (ColumnarTree, 状态)，目录中没有快照时返回None
+    """
+    chain = _chain(directory) if os.path.isdir(directory) else []
+    if not chain:
+        return None
+    snapshots = []
+    for path in chain:
+        with open(path, "rb") as f:
+            snapshots.append(decode(f.read()))
+    arrays, state = merge(snapshots)
+    return ColumnarTree.from_arrays(arrays), state
+
+
+def directory_state(directory: str) -> Optional[Dict[str, Any]]:
+    """
+    只解码目录中最后一个快照，返回其附加状态
+
+    Args:
+        directory: 快照目录
+
+    Returns:
+        dict: 最新的状态，目录中没有快照时返回None
+    """
+    chain = _chain(directory) if os.path.isdir(directory) else []
+    if not chain:
+        return None
+    with open(chain[-1], "rb") as f:
+        return decode(f.read())["state"]
+
+
+def compact(directory: str) -> Optional[str]:
+    """
+    把目录中的全量快照与其后的增量合并为一个新的全量快照，并删除旧文件
+
+    Args:
+        directory: 快照目录
+
+    Returns:
+        str: 新全量快照的路径，没有可合并的快照时返回None
+    """
+    chain = _chain(directory)
+    if len(chain) < 2:
+        return chain[0] if chain else None
+    tree, state = load_directory(directory)
+    # 沿用最后一个文件的序号，之后的增量仍然接在它后面
+    path = chain[-1][:-len(_DELTA_SUFFIX)] + _FULL_SUFFIX
+    _write_atomic(path, encode_full(tree, state))
+    for old in chain:
+        os.unlink(old)
+    return path
+
+
+class SnapshotLog:
+    """
+    为一棵列式树周期性写入快照：第一次为全量，之后为增量，
+    累计compact_every个增量后改写一次全量并删除旧文件
+    """
+
+    def __init__(self, directory: str, compact_every: int = 16):
+        """
+        初始化快照日志
+
+        Args:
+            directory: 快照目录
+            compact_every: 两次全量快照之间的增量个数
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        os.makedirs(directory, exist_ok=True)
+        chain = _chain(directory)
+        self.sequence = int(os.path.basename(chain[-1]).split(".")[0]) if chain else 0
+        # 目录中已有快照时，新进程的第一次检查点写全量，不依赖上一进程的增量基准
+        self.deltas = None
+        self.since_ns = 0
+        self.base_nodes = self.base_names = self.base_types = 0
+        self.bytes_written = 0
+
+    def checkpoint(self, tree: ColumnarTree, state: Dict[str, Any] = None, full: bool = False) -> str:
+        """
+        写入一个快照
+
+        Args:
+            tree: 列式树
+            state: 随快照保存的附加状态
+            full: 强制写全量快照
+
+        Returns:
+            str: 快照文件路径
+        """
+        now = time.time_ns()
+        self.sequence += 1
+        # 墙上时间回拨超过容差时，增量可能漏掉节点，改写全量
+        full = (full or self.deltas is None or self.deltas >= self.compact_every
+                or now < self.since_ns - CLOCK_SLACK_NS)
+        if full:
+            data = encode_full(tree, state)
+            path = os.path.join(self.directory, f"{self.sequence:08d}{_FULL_SUFFIX}")
+        else:
+            data = encode_delta(tree, self.since_ns, self.base_nodes, self.base_names, self.base_types, state)
+            path = os.path.join(self.directory, f"{self.sequence:08d}{_DELTA_SUFFIX}")
+        _write_atomic(path, data)
+        self.bytes_written += len(data)
+        if full:
+            for name in os.listdir(self.directory):
+                if name < os.path.basename(path) and name.endswith((_FULL_SUFFIX, _DELTA_SUFFIX)):
+                    os.unlink(os.path.join(self.directory, name))
+            self.deltas = 0
+        else:
+            self.deltas += 1
+        self.since_ns = now
+        self.base_nodes = len(tree)
+        self.base_names = len(tree.names)
+        self.base_types = len(tree.types)
+        return path
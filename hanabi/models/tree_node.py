@@ -1,9 +1,22 @@
-from typing import Dict, Any, Optional
+import sys
+import time
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
 from datetime import datetime
 
+# 叶子节点共享的只读空子节点表，避免为每个叶子分配dict
+_NO_CHILDREN: Mapping[str, 'TreeNode'] = MappingProxyType({})
+
 
 class TreeNode:
-    """树节点类，用于表示HBT模型中的节点"""
+    """树节点类，用于表示HBT模型中的节点
+    
+    使用__slots__去掉每个实例的__dict__；name/node_type做字符串驻留，
+    children和metadata在首次写入时才分配，时间戳为墙上时间（time.time_ns()）的整数纳秒，
+    只有读取last_updated时才换算成datetime
+    """
+    
+    __slots__ = ("name", "node_type", "_children", "events_count", "_metadata", "last_updated_ns", "_semantic_index")
     
     def __init__(self, name: str, node_type: str):
         """
@@ -13,12 +26,39 @@ class TreeNode:
             name: 节点名称
             node_type: 节点类型 ('process', 'network', 'file')
         """
-        self.name = name
-        self.node_type = node_type
-        self.children: Dict[str, TreeNode] = {}
+        self.name = sys.intern(name)
+        self.node_type = sys.intern(node_type)
+        self._children: Optional[Dict[str, 'TreeNode']] = None
         self.events_count = 0
-        self.metadata: Dict[str, Any] = {}
-        self.last_updated = datetime.now()
+        self._metadata: Optional[Dict[str, Any]] = None
+        self.last_updated_ns = time.time_ns()
+        self._semantic_index = None
+    
+    @property
+    def children(self) -> Mapping[str, 'TreeNode']:
+        """
+        子节点表，调用方只能读取，修改须通过add_child/attach_child/remove_child（否则语义索引不会同步）
+
+        返回的是内部dict本身而不是MappingProxyType：检测和学习的热路径每个事件都要访问多次，
+        不为每次访问创建视图对象
+        """
+        return self._children if self._children is not None else _NO_CHILDREN
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """元数据字典，首次访问时分配"""
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+    
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]):
+        self._metadata = value or None
+    
+    @property
+    def last_updated(self) -> datetime:
+        """最后更新时间；last_updated_ns为墙上时间，随快照保存，跨进程、跨节点可比较"""
+        return datetime.fromtimestamp(self.last_updated_ns / 1e9)
     
     def add_child(self, child_name: str, child_type: str) -> 'TreeNode':
         """
@@ -31,9 +71,14 @@ class TreeNode:
         Returns:
             TreeNode: 创建或已存在的子节点
         """
-        if child_name not in self.children:
-            self.children[child_name] = TreeNode(child_name, child_type)
-        return self.children[child_name]
+        if self._children is None:
+            self._children = {}
+        child = self._children.get(child_name)
+        if child is None:
+            child = self._children[child_name] = TreeNode(child_name, child_type)
+            if self._semantic_index is not None:
+                self._semantic_index.add(child_name)
+        return child
     
     def get_child(self, child_name: str) -> Optional['TreeNode']:
         """
@@ -47,6 +92,76 @@ class TreeNode:
         """
         return self.children.get(child_name)
     
+    def remove_child(self, child_name: str) -> Optional['TreeNode']:
+        """
+        移除子节点
+        
+        Args:
+            child_name: 子节点名称
+            
+        Returns:
+            TreeNode: 被移除的子节点，如果不存在返回None
+        """
+        if self._children is None:
+            return None
+        child = self._children.pop(child_name, None)
+        if child is not None and self._semantic_index is not None:
+            self._semantic_index.remove(child_name)
+        return child
+    
+    def attach_child(self, child: 'TreeNode') -> 'TreeNode':
+        """
+        挂载一个已有节点作为子节点，同名子节点存在时合并进去
+        
+        Args:
+            child: 待挂载的节点
+            
+        Returns:
+            TreeNode: 挂载或合并后的子节点
+        """
+        existing = self.children.get(child.name)
+        if existing is not None:
+            existing.absorb(child)
+            return existing
+        if self._children is None:
+            self._children = {}
+        self._children[child.name] = child
+        if self._semantic_index is not None:
+            self._semantic_index.add(child.name)
+        return child
+    
+    def absorb(self, other: 'TreeNode'):
+        """
+        将other的事件计数与子树合并到当前节点
+        
+        Args:
+            other: 被合并的节点
+        """
+        self.events_count += other.events_count
+        for child in list(other.children.values()):
+            self.attach_child(child)
+        self.last_updated_ns = max(self.last_updated_ns, other.last_updated_ns)
+    
+    def find_semantic_child(self, query: str, service=None):
+        """
+        在子节点中查找与query语义匹配的名称
+        
+        子节点的向量索引在首次查询时建立，之后由add_child增量维护
+        
+        Args:
+            query: 待匹配的名称
+            service: 可选的EmbeddingService，向量未就绪时返回PendingMatch而不阻塞
+            
+        Returns:
+            str: 匹配到的子节点名称，没有匹配返回None，延迟时返回PendingMatch
+        """
+        if not self.children:
+            return None
+        if self._semantic_index is None:
+            from .embedding import SemanticIndex
+            self._semantic_index = SemanticIndex(self.children.keys())
+        return self._semantic_index.match(query, service=service)
+    
     def increment_events_count(self, count: int = 1):
         """
         增加事件计数
@@ -55,7 +170,7 @@ class TreeNode:
             count: 增加的数量，默认为1
         """
         self.events_count += count
-        self.last_updated = datetime.now()
+        self.last_updated_ns = time.time_ns()
     
     def update_metadata(self, key: str, value: Any):
         """
@@ -66,7 +181,7 @@ class TreeNode:
             value: 元数据值
         """
         self.metadata[key] = value
-        self.last_updated = datetime.now()
+        self.last_updated_ns = time.time_ns()
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -79,6 +194,6 @@ class TreeNode:
             "name": self.name,
             "type": self.node_type,
             "events_count": self.events_count,
-            "metadata": self.metadata,
+            "metadata": self._metadata if self._metadata is not None else {},
             "children": {name: child.to_dict() for name, child in self.children.items()}
         }
\ No newline at end of file
@@ -1,82 +1,407 @@
-import docker
+import hashlib
+import os
 import sys
 import json
-from datetime import datetime
-from queue import Queue
-from threading import Thread, Event
+import time
+from datetime import datetime, timezone
+from collections import OrderedDict, deque
+from threading import Condition, Lock, Thread, Event
 
 
-class DockerLogQueue:
+class LineFramer:
     """
-    A queue class that streams Docker container logs as JSON objects.
-    Uses a background thread to continuously read logs and put them into a queue.
+    Split a byte stream into complete lines.
+    Keeps the unfinished tail in a bytearray and finds the last newline of
+    each chunk once, so a chunk with N lines costs O(chunk) instead of O(N * buffer).
     """
     
-    def __init__(self, container_name="falco", max_queue_size=10000):
+    def __init__(self):
+        self._buffer = bytearray()
+    
+    def feed(self, chunk):
         """
-        Initialize the Docker log queue.
+        Add a chunk of bytes and return the complete, non-blank lines it finishes.
         
         Args:
-            container_name: Name or ID of the Docker container
-            max_queue_size: Maximum number of items in the queue (default: 10000)
+            chunk: Bytes read from the stream
+            
+        Returns:
+            List of lines (bytes) without the trailing newline
         """
-        self.container_name = container_name
-        self.queue = Queue(maxsize=max_queue_size)
-        self.stop_event = Event()
-        self.thread = None
-        self.client = None
-        self.container = None
-        self.line_count = 0
-        self.error_count = 0
+        buffer = self._buffer
+        buffer += chunk
+        end = buffer.rfind(b'\n')
+        if end < 0:
+            return []
+        with memoryview(buffer) as view:
+            block = view[:end].tobytes()
+        del buffer[:end + 1]
+        return [line for line in block.split(b'\n') if line.strip()]
+    
+    def pending(self):
+        """Number of buffered bytes that do not form a complete line yet."""
+        return len(self._buffer)
+
+
+_DECODER = json.JSONDecoder()
+
+
+def decode_lines(lines):
+    """
+    Decode a batch of JSON lines, one document per line.
+    Each line must hold exactly one document: a malformed line is reported as
+    an error and never fused with its neighbours into a different event.
+    Uses the decoder's raw_decode on the str directly, which skips the
+    per-call encoding detection of json.loads(bytes).
+    
+    Args:
+        lines: List of lines (bytes), one JSON document per line
         
-    def start(self):
-        """Start streaming logs in a background thread."""
+    Returns:
+        Tuple (events, errors) where errors is a list of (index, exception)
+    """
+    decode = _DECODER.raw_decode
+    events = []
+    errors = []
+    for index, line in enumerate(lines):
         try:
-            self.client = docker.from_env()
-            self.container = self.client.containers.get(self.container_name)
-            print(f"✅ Connected to container '{self.container_name}' (ID: {self.container.short_id})", file=sys.stderr)
-        except docker.errors.DockerException as e:
-            raise Exception(f"Failed to connect to Docker daemon: {e}")
-        except docker.errors.NotFound:
-            raise Exception(f"Container '{self.container_name}' not found")
+            text = line.decode('utf-8').strip()
+            event, end = decode(text)
+            if end != len(text):
+                raise json.JSONDecodeError("Extra data", text, end)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            errors.append((index, e))
+            continue
+        events.append(event)
+    return events, errors
+
+
+# Falco priorities from most to least severe
+PRIORITY_NAMES = ["Emergency", "Alert", "Critical", "Error", "Warning", "Notice", "Informational", "Debug"]
+PRIORITY_LEVELS = {name.lower(): level for level, name in enumerate(PRIORITY_NAMES)}
+PRIORITY_LEVELS["info"] = PRIORITY_LEVELS["informational"]
+DEFAULT_PRIORITY = PRIORITY_LEVELS["informational"]
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "sample", "priority")
+
+
+def event_priority(event, rule_priorities=None):
+    """
+    Priority level of an event, 0 (Emergency) to 7 (Debug).
+    A rule listed in rule_priorities overrides the event's own priority field;
+    events without a known priority count as Informational.
+    
+    Args:
+        event: Falco event (dict)
+        rule_priorities: Optional mapping of rule name to priority name
         
-        # Start background thread
-        self.thread = Thread(target=self._stream_logs, daemon=True)
-        self.thread.start()
-        print(f"✅ Log streaming started", file=sys.stderr)
+    Returns:
+        Priority level (int)
+    """
+    if not isinstance(event, dict):
+        return DEFAULT_PRIORITY
+    if rule_priorities:
+        override = rule_priorities.get(event.get("rule"))
+        if override is not None:
+            return PRIORITY_LEVELS.get(override.lower(), DEFAULT_PRIORITY)
+    priority = event.get("priority")
+    if isinstance(priority, str):
+        return PRIORITY_LEVELS.get(priority.lower(), DEFAULT_PRIORITY)
+    return DEFAULT_PRIORITY
+
+
+class BatchQueue:
+    """
+    A bounded FIFO of events that producers fill with whole lists and consumers
+    drain in batches, so the per-event cost is a deque append/pop instead of a
+    lock round trip.
+    
+    What happens when the queue is full depends on the overflow policy:
+      block        producers wait for space (default)
+      drop_oldest  the oldest queued events are evicted
+      drop_newest  incoming events are rejected
+      sample       1 in sample_every incoming events is kept, evicting the oldest
+      priority     an incoming event evicts the oldest queued event of a lower
+                   priority, otherwise it is rejected
+    Every dropped event is counted by reason (rejected / evicted) and priority.
+    """
+    
+    def __init__(self, maxsize=10000, policy="block", sample_every=10, rule_priorities=None):
+        """
+        Initialize the batch queue.
         
-    def _stream_logs(self):
-        """Internal method to stream logs (runs in background thread)."""
-        # Use since='now' or since=datetime.now() to only get new logs from this point forward
-        log_stream = self.container.logs(stream=True, follow=True, stdout=True, stderr=False, since=datetime.now())
-        buffer = ""
+        Args:
+            maxsize: Maximum number of queued events (0 = unbounded)
+            policy: Overflow policy, one of OVERFLOW_POLICIES
+            sample_every: Keep 1 in N incoming events when full (sample policy)
+            rule_priorities: Optional mapping of rule name to priority name used for drop decisions
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}; expected one of {', '.join(OVERFLOW_POLICIES)}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sample_every = max(1, sample_every)
+        self.rule_priorities = rule_priorities
+        self._items = deque()
+        # priority policy: one deque of (sequence, event) per level, merged by sequence on get
+        self._levels = [deque() for _ in PRIORITY_NAMES] if policy == "priority" else None
+        self._size = 0
+        self._sequence = 0
+        self._overflow_seen = 0
+        self._cond = Condition()
+        self.high_watermark = 0
+        self.blocked_seconds = 0.0
+        # (reason, priority level) -> number of dropped events
+        self.dropped = {}
+    
+    def _full(self):
+        return 0 < self.maxsize <= self._size
+    
+    def _drop(self, reason, event):
+        key = (reason, event_priority(event, self.rule_priorities))
+        self.dropped[key] = self.dropped.get(key, 0) + 1
+    
+    def _evict_oldest(self):
+        self._drop("evicted", self._items.popleft())
+        self._size -= 1
+    
+    def _append(self, items):
+        self._items.extend(items)
+        self._size += len(items)
+    
+    def _put_priority(self, items):
+        levels = self._levels
+        for item in items:
+            level = event_priority(item, self.rule_priorities)
+            if self._full():
+                lowest = next((l for l in range(len(levels) - 1, level, -1) if levels[l]), None)
+                if lowest is None:
+                    self._drop("rejected", item)
+                    continue
+                self._drop("evicted", levels[lowest].popleft()[1])
+                self._size -= 1
+            self._sequence += 1
+            levels[level].append((self._sequence, item))
+            self._size += 1
+    
+    def _put_overflowing(self, items):
+        space = len(items) if self.maxsize <= 0 else max(self.maxsize - self._size, 0)
+        if self.policy == "drop_oldest":
+            self._append(items)
+            while self._size > self.maxsize > 0:
+                self._evict_oldest()
+            return
+        self._append(items[:space])
+        for item in items[space:]:
+            self._overflow_seen += 1
+            if self.policy == "sample" and self._overflow_seen % self.sample_every == 0:
+                self._evict_oldest()
+                self._append([item])
+            else:
+                self._drop("rejected", item)
+    
+    def put(self, item, timeout=None):
+        """Put a single event; with the block policy this waits while the queue is full."""
+        return self.put_many([item], timeout=timeout)
+    
+    def put_many(self, items, timeout=None):
+        """
+        Put a list of events.
+        With the block policy the call waits while the queue is full and the
+        whole list is queued at once, so the queue can briefly hold up to
+        maxsize + len(items) - 1 events. The other policies never block.
+        
+        Args:
+            items: List of events
+            timeout: Maximum time to wait for space (None = wait indefinitely)
+            
+        Returns:
+            True if the events were handled, False on timeout (block policy only)
+        """
+        if not items:
+            return True
+        with self._cond:
+            if self.policy == "block":
+                if self._full():
+                    started = time.monotonic()
+                    ready = self._cond.wait_for(lambda: not self._full(), timeout)
+                    self.blocked_seconds += time.monotonic() - started
+                    if not ready:
+                        return False
+                self._append(items)
+            elif self._levels is not None:
+                self._put_priority(items)
+            else:
+                self._put_overflowing(items)
+            self.high_watermark = max(self.high_watermark, self._size)
+            self._cond.notify_all()
+        return True
+    
+    def get(self, timeout=None):
+        """
+        Get the next event.
+        
+        Args:
+            timeout: Maximum time to wait in seconds (None = wait indefinitely)
+            
+        Returns:
+            The event, or None if timeout occurs
+        """
+        batch = self.get_batch(1, timeout)
+        return batch[0] if batch else None
+    
+    def get_nowait(self):
+        """Get the next event without blocking, or None if the queue is empty."""
+        return self.get(timeout=0)
+    
+    def _pop_priority(self, count):
+        # Merge the per-level deques back into arrival order
+        levels = [level for level in self._levels if level]
+        batch = []
+        for _ in range(count):
+            oldest = min(levels, key=lambda level: level[0][0])
+            batch.append(oldest.popleft()[1])
+            if not oldest:
+                levels.remove(oldest)
+        return batch
+    
+    def get_batch(self, max_items=512, timeout=None):
+        """
+        Take up to max_items events, waiting only until the first one is available.
+        
+        Args:
+            max_items: Maximum number of events to return
+            timeout: Maximum time to wait in seconds (None = wait indefinitely)
+            
+        Returns:
+            List of events, empty if timeout occurs
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size, timeout):
+                return []
+            count = min(max_items, self._size)
+            if self._levels is not None:
+                batch = self._pop_priority(count)
+            else:
+                items = self._items
+                batch = [items.popleft() for _ in range(count)]
+            self._size -= count
+            self._cond.notify_all()
+        return batch
+    
+    def qsize(self):
+        """Get current number of queued events."""
+        return self._size
+    
+    def empty(self):
+        """Check if the queue is empty."""
+        return not self._size
+    
+    def stats(self):
+        """
+        Get overflow statistics.
+        
+        Returns:
+            Dict with the policy, size, capacity, high watermark, time producers
+            spent blocked and dropped events by reason and priority name
+        """
+        with self._cond:
+            dropped = dict(self.dropped)
+            return {
+                "policy": self.policy,
+                "size": self._size,
+                "capacity": self.maxsize,
+                "high_watermark": self.high_watermark,
+                "blocked_seconds": self.blocked_seconds,
+                "dropped_total": sum(dropped.values()),
+                "dropped": {(reason, PRIORITY_NAMES[level]): count for (reason, level), count in dropped.items()},
+            }
+
+
+class EventSource:
+    """
+    Base class for Falco event sources.
+    A source reads raw bytes in a background thread, frames them into lines,
+    decodes them in batches and puts the events into a BatchQueue that
+    consumers drain with get() / get_batch().
+    Subclasses implement _connect() (called from start()) and _run().
+    """
+    
+    name = "events"
+    
+    def __init__(self, max_queue_size=10000, **queue_options):
+        """
+        Initialize the event source.
         
+        Args:
+            max_queue_size: Maximum number of events in the queue (default: 10000)
+            queue_options: Overflow options passed to BatchQueue (policy, sample_every, rule_priorities)
+        """
+        self.queue = BatchQueue(maxsize=max_queue_size, **queue_options)
+        self.stop_event = Event()
+        self.thread = None
+        self.line_count = 0
+        self.error_count = 0
+        self._count_lock = Lock()
+    
+    def _connect(self):
+        """Open the underlying stream; raise an Exception with a readable message on failure."""
+    
+    def _run(self):
+        """Read the stream until stop_event is set (runs in background thread)."""
+        raise NotImplementedError("This method should be implemented by subclasses")
+    
+    def _guarded_run(self):
         try:
-            for chunk in log_stream:
-                if self.stop_event.is_set():
-                    break
-                
-                try:
-                    buffer += chunk.decode('utf-8')
-                except (KeyboardInterrupt, SystemExit):
-                    break
-                
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    
-                    if line.strip():
-                        self.line_count += 1
-                        
-                        try:
-                            json_obj = json.loads(line)
-                            # Put JSON object into queue (blocks if queue is full)
-                            self.queue.put(json_obj)
-                        except json.JSONDecodeError as e:
-                            self.error_count += 1
-                            print(f"Invalid JSON on line {self.line_count}: {e}", file=sys.stderr)
+            self._run()
         except Exception as e:
             if not self.stop_event.is_set():
-                print(f"❌ Error in log streaming: {e}", file=sys.stderr)
+                print(f"❌ Error in {self.name} streaming: {e}", file=sys.stderr)
+    
+    def start(self):
+        """Connect and start reading events in a background thread."""
+        self._connect()
+        self.thread = Thread(target=self._guarded_run, name=f"{self.name}-source", daemon=True)
+        self.thread.start()
+        print(f"✅ {self.name.capitalize()} streaming started", file=sys.stderr)
+        return self
+    
+    def _ingest(self, framer, chunk):
+        """
+        Frame a chunk of bytes, decode the complete lines and queue the events.
+        
+        Args:
+            framer: LineFramer of the connection the chunk came from
+            chunk: Bytes read from the stream
+            
+        Returns:
+            False if the source was stopped while waiting for queue space
+        """
+        lines = framer.feed(chunk)
+        if not lines:
+            return True
+        return self._ingest_lines(lines)
+    
+    def _ingest_lines(self, lines):
+        with self._count_lock:
+            first_line = self.line_count + 1
+            self.line_count += len(lines)
+        events, errors = decode_lines(lines)
+        for index, e in errors:
+            with self._count_lock:
+                self.error_count += 1
+            print(f"Invalid JSON on line {first_line + index}: {e}", file=sys.stderr)
+        events = self._filter_events(events)
+        
+        # Put the whole batch into the queue (blocks while the queue is full)
+        while not self.queue.put_many(events, timeout=0.5):
+            if self.stop_event.is_set():
+                return False
+        return True
+    
+    def _filter_events(self, events):
+        """Hook for subclasses to drop or annotate decoded events before they are queued."""
+        return events
     
     def get(self, timeout=None):
         """
@@ -88,10 +413,20 @@ class DockerLogQueue:
         Returns:
             JSON object (dict) or None if timeout occurs
         """
-        try:
-            return self.queue.get(timeout=timeout)
-        except:
-            return None
+        return self.queue.get(timeout=timeout)
+    
+    def get_batch(self, max_items=512, timeout=None):
+        """
+        Get up to max_items JSON objects, waiting only for the first one.
+        
+        Args:
+            max_items: Maximum number of objects to return
+            timeout: Maximum time to wait in seconds (None = wait indefinitely)
+            
+        Returns:
+            List of JSON objects (dicts), empty if timeout occurs
+        """
+        return self.queue.get_batch(max_items, timeout)
     
     def get_nowait(self):
         """
@@ -100,10 +435,7 @@ class DockerLogQueue:
         Returns:
             JSON object (dict) or None if queue is empty
         """
-        try:
-            return self.queue.get_nowait()
-        except:
-            return None
+        return self.queue.get_nowait()
     
     def size(self):
         """Get current queue size."""
@@ -114,20 +446,254 @@ class DockerLogQueue:
         return self.queue.empty()
     
     def get_stats(self):
-        """Get statistics about the log stream."""
+        """Get statistics about the event stream."""
+        queue_stats = self.queue.stats()
         return {
             "lines_processed": self.line_count,
             "json_errors": self.error_count,
-            "queue_size": self.queue.qsize()
+            "queue_size": queue_stats["size"],
+            "queue_high_watermark": queue_stats["high_watermark"],
+            "dropped_events": queue_stats["dropped_total"]
         }
     
+    def _close(self):
+        """Release the underlying stream so a blocked reader returns."""
+    
     def stop(self):
-        """Stop streaming logs and clean up."""
-        print(f"\n🛑 Stopping log stream...", file=sys.stderr)
+        """Stop streaming events and clean up."""
+        print(f"\n🛑 Stopping {self.name} stream...", file=sys.stderr)
         self.stop_event.set()
+        self._close()
         
         if self.thread:
             self.thread.join(timeout=2)
         
         stats = self.get_stats()
         print(f"📊 Stats: {stats['lines_processed']} lines, {stats['json_errors']} errors", file=sys.stderr)
+
+
+def event_time_ns(event):
+    """
+    Event time of a Falco event in nanoseconds since the epoch.
+    Uses output_fields["evt.time"] when present, otherwise the ISO 8601 "time" field.
+    
+    Returns:
+        Time in nanoseconds (int), or None if the event carries no usable time
+    """
+    fields = event.get("output_fields") or {}
+    value = fields.get("evt.time")
+    if isinstance(value, int):
+        return value
+    stamp = event.get("time")
+    if not isinstance(stamp, str) or "T" not in stamp:
+        return None
+    # Falco writes nanosecond precision, which datetime cannot parse directly
+    stamp = stamp.rstrip("Z")
+    seconds, _, fraction = stamp.partition(".")
+    try:
+        whole = datetime.fromisoformat(seconds).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    digits = "".join(ch for ch in fraction if ch.isdigit())[:9]
+    return int(whole.timestamp()) * 1_000_000_000 + int(digits.ljust(9, "0") or 0)
+
+
+def _event_key(event):
+    fields = event.get("output_fields") or {}
+    number = fields.get("evt.num")
+    if number is not None:
+        return number
+    text = f"{event.get('rule')}\0{event.get('output')}"
+    # Stable across processes, unlike hash(), so persisted keys stay valid
+    return hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=8).hexdigest()
+
+
+# Keys of recently queued events kept for deduplicating a replay after reconnect
+SEEN_KEYS_MAX = 65536
+# How many of those keys the cursor file keeps for a replay after restart
+CURSOR_KEYS_MAX = 4096
+
+
+class DockerLogQueue(EventSource):
+    """
+    A queue class that streams Docker container logs as JSON objects.
+    Uses a background thread to continuously read logs and put them into a queue.
+    
+    The stream reconnects with exponential backoff when the container restarts
+    or the daemon drops the connection. The time of the last queued event is
+    kept as a cursor (optionally persisted to cursor_path) and used as `since`
+    on reconnect, so the gap is replayed from Docker's log instead of lost.
+    Only the replayed backlog (events older than the reconnect) is deduplicated,
+    by evt.num (or rule/output) against the keys of recently queued events;
+    live events are never dropped, since Falco's evt.time is not monotonic
+    across CPUs and event sources.
+    """
+    
+    name = "log"
+    
+    def __init__(self, container_name="falco", max_queue_size=10000, cursor_path=None,
+                 reconnect_initial=0.5, reconnect_max=30.0, checkpoint_interval=1.0, **queue_options):
+        """
+        Initialize the Docker log queue.
+        
+        Args:
+            container_name: Name or ID of the Docker container
+            max_queue_size: Maximum number of items in the queue (default: 10000)
+            cursor_path: File to persist the stream cursor in; a restart resumes from it
+            reconnect_initial: First reconnect delay in seconds, doubled after each failure
+            reconnect_max: Maximum reconnect delay in seconds
+            checkpoint_interval: Minimum seconds between cursor file writes
+            queue_options: Overflow options passed to BatchQueue
+        """
+        super().__init__(max_queue_size, **queue_options)
+        self.container_name = container_name
+        self.client = None
+        self.container = None
+        self.cursor_path = cursor_path
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.checkpoint_interval = checkpoint_interval
+        # Cursor: newest queued event time
+        self.cursor_ns = None
+        # Keys of the most recently queued events, oldest first
+        self._seen_keys = OrderedDict()
+        self._last_checkpoint = 0.0
+        self._log_stream = None
+        self.reconnects = 0
+        self.duplicates_dropped = 0
+        self.replayed_events = 0
+        self.last_gap_seconds = 0.0
+        self._replay_until_ns = None
+        self._load_cursor()
+        
+    def _load_cursor(self):
+        if not self.cursor_path or not os.path.exists(self.cursor_path):
+            return
+        try:
+            with open(self.cursor_path) as f:
+                cursor = json.load(f)
+            self.cursor_ns = int(cursor["time_ns"])
+            self._seen_keys = OrderedDict.fromkeys(cursor.get("keys", []))
+            print(f"✅ Resuming log stream from cursor {self.cursor_ns}", file=sys.stderr)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable cursor file {self.cursor_path}: {e}", file=sys.stderr)
+    
+    def save_cursor(self):
+        """Write the cursor file atomically (no-op without cursor_path or before the first event)."""
+        if not self.cursor_path or self.cursor_ns is None:
+            return
+        with self._count_lock:
+            keys = list(self._seen_keys)[-CURSOR_KEYS_MAX:]
+            cursor = {"time_ns": self.cursor_ns, "keys": keys}
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cursor, f)
+        os.replace(tmp_path, self.cursor_path)
+        self._last_checkpoint = time.monotonic()
+        
+    def _connect(self):
+        # The Docker SDK is only needed by this source
+        import docker
+        try:
+            self.client = docker.from_env()
+            self.container = self.client.containers.get(self.container_name)
+            print(f"✅ Connected to container '{self.container_name}' (ID: {self.container.short_id})", file=sys.stderr)
+        except docker.errors.NotFound:
+            raise Exception(f"Container '{self.container_name}' not found")
+        except docker.errors.DockerException as e:
+            raise Exception(f"Failed to connect to Docker daemon: {e}")
+    
+    def _since(self):
+        if self.cursor_ns is None:
+            # Use since=datetime.now() to only get new logs from this point forward
+            return datetime.now()
+        # Docker filters by its own log timestamp, which is at or after the event time
+        return self.cursor_ns / 1e9
+    
+    def _filter_events(self, events):
+        kept = []
+        replayed = 0
+        seen = self._seen_keys
+        with self._count_lock:
+            for event in events:
+                stamp = event_time_ns(event) if isinstance(event, dict) else None
+                if stamp is None:
+                    kept.append(event)
+                    continue
+                key = _event_key(event)
+                if self._replay_until_ns is not None and stamp < self._replay_until_ns:
+                    # Backlog replayed from the cursor: drop what was already queued
+                    if key in seen:
+                        self.duplicates_dropped += 1
+                        continue
+                    replayed += 1
+                if self.cursor_ns is None or stamp > self.cursor_ns:
+                    self.cursor_ns = stamp
+                seen[key] = None
+                if len(seen) > SEEN_KEYS_MAX:
+                    seen.popitem(last=False)
+                kept.append(event)
+            self.replayed_events += replayed
+        if self.cursor_path and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_cursor()
+        return kept
+        
+    def _run(self):
+        """Stream container logs, reconnecting with backoff (runs in background thread)."""
+        delay = self.reconnect_initial
+        disconnected_at = None
+        while not self.stop_event.is_set():
+            try:
+                if self.container is None:
+                    self.container = self.client.containers.get(self.container_name)
+                self._log_stream = self.container.logs(
+                    stream=True, follow=True, stdout=True, stderr=False, since=self._since()
+                )
+                # Events older than the connection are backlog replayed from the cursor
+                self._replay_until_ns = time.time_ns() if self.cursor_ns is not None else None
+                if disconnected_at is not None:
+                    self.reconnects += 1
+                    self.last_gap_seconds = time.monotonic() - disconnected_at
+                    disconnected_at = None
+                    print(f"🔄 Reconnected to '{self.container_name}' after {self.last_gap_seconds:.1f}s, "
+                          f"replaying from cursor", file=sys.stderr)
+                framer = LineFramer()
+                for chunk in self._log_stream:
+                    if self.stop_event.is_set():
+                        return
+                    delay = self.reconnect_initial
+                    if not self._ingest(framer, chunk):
+                        return
+                # The stream ends when the container stops
+                error = "log stream ended"
+            except Exception as e:
+                if self.stop_event.is_set():
+                    return
+                error = e
+                # The container may have been recreated under the same name
+                self.container = None
+            if disconnected_at is None:
+                disconnected_at = time.monotonic()
+            print(f"⚠️ Docker log stream lost ({error}); retrying in {delay:.1f}s", file=sys.stderr)
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, self.reconnect_max)
+    
+    def _close(self):
+        if self._log_stream is not None:
+            try:
+                self._log_stream.close()
+            except Exception:
+                pass
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.save_cursor()
+    
+    def get_stats(self):
+        stats = super().get_stats()
+        stats.update({
+            "reconnects": self.reconnects,
+            "last_gap_seconds": self.last_gap_seconds,
+            "duplicates_dropped": self.duplicates_dropped,
+            "replayed_events": self.replayed_events,
+        })
+        return stats
@@ -0,0 +1,310 @@
+import os
+import socket
+import stat
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from .queue import PRIORITY_LEVELS, DockerLogQueue, EventSource, LineFramer
+
+# Which source main.py and the exporter read from: docker, file, socket or http
+SOURCE_ENV = "HANABI_EVENT_SOURCE"
+FILE_ENV = "HANABI_EVENT_FILE"
+SOCKET_ENV = "HANABI_EVENT_SOCKET"
+HTTP_ENV = "HANABI_EVENT_HTTP"
+# Cursor file of the docker source; with it a restart replays the events missed while down
+CURSOR_ENV = "HANABI_LOG_CURSOR"
+# Overflow policy of the event queue, see BatchQueue
+POLICY_ENV = "HANABI_QUEUE_POLICY"
+SAMPLE_EVERY_ENV = "HANABI_QUEUE_SAMPLE_EVERY"
+RULE_PRIORITIES_ENV = "HANABI_QUEUE_RULE_PRIORITIES"
+
+DEFAULT_FILE = "/var/log/falco/events.json"
+DEFAULT_SOCKET = "/run/falco/events.sock"
+DEFAULT_HTTP = "127.0.0.1:2801"
+
+_READ_SIZE = 1 << 16
+
+
+class FileTailSource(EventSource):
+    """
+    Tail the JSON file written by Falco's file_output.
+    Follows the file across logrotate (new inode) and truncation.
+    """
+
+    name = "file"
+
+    def __init__(self, path=DEFAULT_FILE, from_start=False, poll_interval=0.05, max_queue_size=10000, **queue_options):
+        """
+        Initialize the file tail source.
+
+        Args:
+            path: Path of the file Falco appends events to
+            from_start: Read the existing content first instead of only new lines
+            poll_interval: Sleep between reads when no new data is available (seconds)
+            max_queue_size: Maximum number of events in the queue
+            queue_options: Overflow options passed to BatchQueue
+        """
+        super().__init__(max_queue_size, **queue_options)
+        self.path = path
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.rotations = 0
+        self._file = None
+
+    def _open(self, seek_end):
+        self._file = open(self.path, "rb", buffering=0)
+        if seek_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def _connect(self):
+        if os.path.exists(self.path):
+            self._open(seek_end=not self.from_start)
+            print(f"✅ Tailing '{self.path}'", file=sys.stderr)
+        else:
+            print(f"⏳ Waiting for '{self.path}' to be created", file=sys.stderr)
+
+    def _rotated(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(self._file.fileno())
+        return current.st_ino != opened.st_ino or current.st_size < self._file.tell()
+
+    def _run(self):
+        framer = LineFramer()
+        while not self.stop_event.is_set():
+            if self._file is None:
+                if not os.path.exists(self.path):
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                self._open(seek_end=False)
+            chunk = self._file.read(_READ_SIZE)
+            if chunk:
+                if not self._ingest(framer, chunk):
+                    break
+                continue
+            if self._rotated():
+                # The old file is fully read; continue from the start of the new one
+                self.rotations += 1
+                self._file.close()
+                self._open(seek_end=False)
+                framer = LineFramer()
+                continue
+            self.stop_event.wait(self.poll_interval)
+
+    def _close(self):
+        if self.thread:
+            self.thread.join(timeout=2)
+        if self._file is not None:
+            self._file.close()
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["rotations"] = self.rotations
+        return stats
+
+
+class UnixSocketSource(EventSource):
+    """
+    Read newline-delimited events from a Unix domain socket or a named pipe.
+    If path is a FIFO it is read directly; otherwise a stream socket is
+    created at path and every connected writer (e.g. Falco's program_output
+    piping into `socat - UNIX-CONNECT:path`) is read concurrently.
+    """
+
+    name = "socket"
+
+    def __init__(self, path=DEFAULT_SOCKET, max_queue_size=10000, **queue_options):
+        """
+        Initialize the Unix socket source.
+
+        Args:
+            path: Path of the socket to create, or of an existing FIFO
+            max_queue_size: Maximum number of events in the queue
+            queue_options: Overflow options passed to BatchQueue
+        """
+        super().__init__(max_queue_size, **queue_options)
+        self.path = path
+        self.connections = 0
+        self._server = None
+
+    def _connect(self):
+        if os.path.exists(self.path) and stat.S_ISFIFO(os.stat(self.path).st_mode):
+            print(f"✅ Reading named pipe '{self.path}'", file=sys.stderr)
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen(16)
+        print(f"✅ Listening on '{self.path}'", file=sys.stderr)
+
+    def _run(self):
+        if self._server is None:
+            self._read_fifo()
+            return
+        while not self.stop_event.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            self.connections += 1
+            Thread(target=self._read_connection, args=(conn,), daemon=True).start()
+
+    def _read_fifo(self):
+        while not self.stop_event.is_set():
+            # open() blocks until a writer appears; reopen after each writer closes
+            with open(self.path, "rb", buffering=0) as fifo:
+                framer = LineFramer()
+                while True:
+                    chunk = fifo.read(_READ_SIZE)
+                    if not chunk or not self._ingest(framer, chunk):
+                        break
+            self.connections += 1
+
+    def _read_connection(self, conn):
+        framer = LineFramer()
+        with conn:
+            while not self.stop_event.is_set():
+                chunk = conn.recv(_READ_SIZE)
+                if not chunk or not self._ingest(framer, chunk):
+                    break
+
+    def _close(self):
+        if self._server is not None:
+            # close() alone does not wake a thread blocked in accept() on Linux
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        else:
+            # Unblock open() in the reader thread with a dummy writer
+            try:
+                os.close(os.open(self.path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["connections"] = self.connections
+        return stats
+
+
+class HttpWebhookSource(EventSource):
+    """
+    Receive events from Falco's http_output.
+    Each POST body holds one JSON event, or several newline-delimited ones.
+    """
+
+    name = "http"
+
+    def __init__(self, address=DEFAULT_HTTP, max_queue_size=10000, **queue_options):
+        """
+        Initialize the HTTP webhook source.
+
+        Args:
+            address: host:port to listen on (Falco http_output.url should point here)
+            max_queue_size: Maximum number of events in the queue
+            queue_options: Overflow options passed to BatchQueue
+        """
+        super().__init__(max_queue_size, **queue_options)
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.requests = 0
+        self._server = None
+
+    def _connect(self):
+        source = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                source.requests += 1
+                lines = [line for line in body.split(b"\n") if line.strip()]
+                accepted = not lines or source._ingest_lines(lines)
+                self.send_response(200 if accepted else 503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        host, port = self._server.server_address[:2]
+        print(f"✅ Listening for Falco http_output on http://{host}:{port}/", file=sys.stderr)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _run(self):
+        self._server.serve_forever(poll_interval=0.2)
+
+    def _close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["requests"] = self.requests
+        return stats
+
+
+def queue_options_from_env():
+    """
+    Overflow options for the event queue from the environment.
+
+    HANABI_QUEUE_POLICY: block, drop_oldest, drop_newest, sample or priority (default: block)
+    HANABI_QUEUE_SAMPLE_EVERY: keep 1 in N events when full with the sample policy (default: 10)
+    HANABI_QUEUE_RULE_PRIORITIES: rule=priority pairs separated by commas, overriding
+        the priority used for drop decisions, e.g. "Read sensitive file=critical,file=debug"
+
+    Returns:
+        Dict of keyword arguments for BatchQueue
+    """
+    rule_priorities = {}
+    for pair in os.environ.get(RULE_PRIORITIES_ENV, "").split(","):
+        rule, _, priority = pair.rpartition("=")
+        if rule.strip() and priority.strip().lower() in PRIORITY_LEVELS:
+            rule_priorities[rule.strip()] = priority.strip()
+    return {
+        "policy": os.environ.get(POLICY_ENV, "block").lower(),
+        "sample_every": int(os.environ.get(SAMPLE_EVERY_ENV, "10")),
+        "rule_priorities": rule_priorities or None,
+    }
+
+
+def create_event_source(kind=None, container_name="falco", max_queue_size=10000, **queue_options):
+    """
+    Create the event source selected by configuration.
+
+    Args:
+        kind: docker, file, socket or http (default: HANABI_EVENT_SOURCE, else docker)
+        container_name: Falco container for the docker source
+        max_queue_size: Maximum number of events in the queue
+        queue_options: Overflow options for BatchQueue; defaults come from queue_options_from_env()
+
+    Returns:
+        An EventSource that has not been started yet
+    """
+    kind = (kind or os.environ.get(SOURCE_ENV, "docker")).lower()
+    options = {**queue_options_from_env(), **queue_options, "max_queue_size": max_queue_size}
+    if kind == "docker":
+        return DockerLogQueue(container_name=container_name, cursor_path=os.environ.get(CURSOR_ENV), **options)
+    if kind == "file":
+        return FileTailSource(os.environ.get(FILE_ENV, DEFAULT_FILE), **options)
+    if kind == "socket":
+        return UnixSocketSource(os.environ.get(SOCKET_ENV, DEFAULT_SOCKET), **options)
+    if kind == "http":
+        return HttpWebhookSource(os.environ.get(HTTP_ENV, DEFAULT_HTTP), **options)
+    raise ValueError(f"Unknown event source {kind!r}; expected docker, file, socket or http")
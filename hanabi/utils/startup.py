@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _process_age_seconds():
+    """进程已运行的秒数（仅Linux，读取失败返回None）"""
+    try:
+        with open("/proc/self/stat") as f:
+            # comm字段可能含空格，从最后一个')'之后开始按空格切分，starttime为第22个字段
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """记录启动各阶段耗时，用于输出启动时间分解报告"""
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        # 创建时进程已运行的时间，约等于解释器启动与前序import的耗时
+        self.process_age = _process_age_seconds()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """
+        记录一个阶段
+
+        Args:
+            name: 阶段名称
+            seconds: 耗时（秒）
+        """
+        with self._lock:
+            self.phases.append((name, seconds, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name):
+        """统计with块的耗时并记录为一个阶段"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self):
+        """
+        生成启动时间分解报告
+
+        Returns:
+            str: 每个阶段一行的文本报告
+        """
+        lines = ["Startup time breakdown:"]
+        if self.process_age is not None:
+            lines.append(f"  {'interpreter + early imports':<40}{self.process_age * 1000:>10.1f} ms")
+        with self._lock:
+            phases = list(self.phases)
+        for name, seconds, thread in phases:
+            suffix = "" if thread == "MainThread" else f"  [{thread}]"
+            lines.append(f"  {name:<40}{seconds * 1000:>10.1f} ms{suffix}")
+        lines.append(f"  {'since timer creation':<40}{(time.perf_counter() - self.created) * 1000:>10.1f} ms")
+        return "\n".join(lines)
+
+
+# 进程级计时器，hanabi中各模块共用
+STARTUP = StartupTimer()
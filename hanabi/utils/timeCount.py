@@ -1,25 +1,114 @@
 import time
-from collections import deque
+
+
+class RateWindow:
+    """
+    滑动窗口事件计数：按秒分桶的环形数组，每个key占用固定内存。
+    记录事件只做一次取余和加法，不为单个事件分配对象，适合每秒10万级事件
+    """
+
+    def __init__(self, window_seconds=10):
+        self.window_seconds = window_seconds
+        self.buckets = [0] * window_seconds
+        # 最近一次写入或推进到的秒
+        self.head = int(time.time())
+        self.total = 0
+
+    def _advance(self, second):
+        """把窗口推进到second，清空其间过期的桶"""
+        gap = second - self.head
+        if gap <= 0:
+            return
+        buckets = self.buckets
+        size = self.window_seconds
+        if gap >= size:
+            for i in range(size):
+                buckets[i] = 0
+            self.total = 0
+        else:
+            for s in range(self.head + 1, second + 1):
+                i = s % size
+                self.total -= buckets[i]
+                buckets[i] = 0
+        self.head = second
+
+    def add(self, n=1, now=None):
+        """
+        记录n个事件
+
+        Args:
+            n: 事件数
+            now: 事件时间（秒），默认为当前时间；早于窗口的事件被忽略
+        """
+        second = int(time.time() if now is None else now)
+        if second > self.head:
+            self._advance(second)
+        elif second <= self.head - self.window_seconds:
+            return
+        self.buckets[second % self.window_seconds] += n
+        self.total += n
+
+    def count(self, now=None):
+        """窗口（最近window_seconds秒，含当前秒）内的事件数"""
+        self._advance(int(time.time() if now is None else now))
+        return self.total
+
+    def rate(self, now=None):
+        """窗口内的平均速率（事件/秒）"""
+        return self.count(now) / self.window_seconds
+
+    def state(self):
+        """可JSON序列化的窗口状态"""
+        return {"window_seconds": self.window_seconds, "head": self.head, "buckets": list(self.buckets)}
+
+    @classmethod
+    def from_state(cls, state):
+        window = cls(state["window_seconds"])
+        window.head = state["head"]
+        window.buckets = list(state["buckets"])
+        window.total = sum(window.buckets)
+        return window
+
+
+class RateWindows:
+    """按key（如容器名）维护的一组RateWindow"""
+
+    def __init__(self, window_seconds=10):
+        self.window_seconds = window_seconds
+        self.windows = {}
+
+    def add(self, key, n=1, now=None):
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = RateWindow(self.window_seconds)
+        window.add(n, now)
+
+    def rates(self, now=None):
+        """
+        Returns:
+            dict: key -> 窗口内的平均速率（事件/秒）
+        """
+        if now is None:
+            now = time.time()
+        return {key: window.rate(now) for key, window in self.windows.items()}
+
+    def discard(self, key):
+        self.windows.pop(key, None)
+
 
 class EventCounter:
-    def __init__(self, warmup_seconds=45):
-        self.count = 0
-        self.timestamps = deque()
+    def __init__(self, warmup_seconds=45, window_seconds=60):
         self.warmup_seconds = warmup_seconds  # 预热时间（秒）
         self.start_time = int(time.time() * 1000)  # 初始化时间戳（毫秒）
+        # 最近window_seconds秒内的事件数
+        self.window = RateWindow(window_seconds)
 
-    def on_event(self):
-        now = int(time.time() * 1000)  # 当前时间戳（毫秒）
-        self.timestamps.append(now)
-        self.count += 1
-
-        self.clean_expired_events()
+    @property
+    def count(self):
+        return self.window.count()
 
-    def clean_expired_events(self):
-        now = int(time.time() * 1000)
-        while self.timestamps and now - self.timestamps[0] > 1000 * 60:
-            self.timestamps.popleft()
-            self.count -= 1
+    def on_event(self):
+        self.window.add()
 
     def is_warmup_period(self):
         """判断是否还在预热期"""
@@ -27,5 +116,30 @@ class EventCounter:
         elapsed_seconds = (now - self.start_time) / 1000
         return elapsed_seconds < self.warmup_seconds
 
+    def window_covered(self):
+        """计数开始后是否已经过了一个完整窗口"""
+        now = int(time.time() * 1000)
+        return now - self.start_time >= self.window.window_seconds * 1000
+
     def get_rate(self):
-        return self.count  # 当前10秒内的事件数
+        return self.count  # 当前窗口（60秒）内的事件数
+
+    def state(self):
+        """随模型快照保存的计数状态"""
+        return {
+            "start_time": self.start_time,
+            "warmup_seconds": self.warmup_seconds,
+            "window": self.window.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        counter = cls(state["warmup_seconds"])
+        counter.start_time = state["start_time"]
+        if "window" in state:
+            counter.window = RateWindow.from_state(state["window"])
+        else:
+            # 旧快照保存的是每个事件的毫秒时间戳
+            for timestamp in state.get("timestamps", ()):
+                counter.window.add(1, timestamp / 1000)
+        return counter
@@ -1,10 +1,17 @@
-from hanabi.utils.queue import DockerLogQueue
-from hanabi.models.hbt import HBTModel
-from hanabi.models.event_parser import EventParser
-from hanabi.models.tree_node import TreeNode
+from hanabi.utils.startup import STARTUP
+
+with STARTUP.phase("import hanabi"):
+    from hanabi.utils.sources import create_event_source
+    from hanabi.models.manager import ModelRegistryMetrics, create_model_manager
+    from hanabi.models.tree_node import TreeNode
+    from hanabi.models.embedding import prewarm
+    from hanabi.models.embedding_service import EmbeddingService
+    from hanabi.models.alerts import ALERTS, ALERT_HTTP_ENV, DEFAULT_ALERT_HTTP, AlertServer
 from rich.tree import Tree
 from rich import print as rprint
 import json
+import os
+import threading
 
 def print_tree(node: TreeNode, tree: Tree = None, level: int = 0) -> Tree:
     """将TreeNode转换为Rich树形结构进行可视化输出"""
@@ -32,68 +39,96 @@ def print_tree(node: TreeNode, tree: Tree = None, level: int = 0) -> Tree:
     
     return tree
 
+def print_model(model_dict):
+    """以JSON和树形结构打印一个HBT模型"""
+    print(f"Final HBT model of {model_dict['container_id']} (JSON format):")
+    print(json.dumps(model_dict, ensure_ascii=False, default=str))
+    
+    # 以树形结构打印模型
+    print(f"\nFinal HBT model of {model_dict['container_id']} (Tree format):")
+    hbt_structure = model_dict["hbt_structure"]
+    # 重建根节点
+    root_node = TreeNode(hbt_structure["name"], hbt_structure["type"])
+    root_node.events_count = hbt_structure["events_count"]
+    root_node.metadata = hbt_structure["metadata"]
+    # 递归重建子节点
+    def rebuild_tree(node_dict, parent_node):
+        for child_name, child_dict in node_dict["children"].items():
+            child_node = parent_node.add_child(child_name, child_dict["type"])
+            child_node.events_count = child_dict["events_count"]
+            child_node.metadata = child_dict["metadata"]
+            rebuild_tree(child_dict, child_node)
+    rebuild_tree(hbt_structure, root_node)
+    # 打印树形结构
+    tree = print_tree(root_node)
+    rprint(tree)
+
+
+def print_alerts(stream):
+    """在独立线程中打印告警，事件处理线程不再做json.dumps"""
+    for alert in stream:
+        print(f"Warning(T): [{alert.priority}] {alert.rule} {alert.container_name} "
+              + json.dumps(alert.fields, ensure_ascii=False) + "\n")
+
+
 def main():
-    log_queue = DockerLogQueue(container_name="falco")
-    log_queue.start()
+    # 语义模型在首次语义匹配时才加载；HANABI_PREWARM=1 时在后台线程提前加载
+    if os.environ.get("HANABI_PREWARM", "0") == "1":
+        prewarm(background=True)
+
+    # 事件源由HANABI_EVENT_SOURCE选择：docker / file / socket / http
+    with STARTUP.phase("connect event source"):
+        log_queue = create_event_source(container_name="falco")
+        log_queue.start()
 
-    print("before HBTModel")
-    # 创建HBT模型实例
-    hbt_model = HBTModel("falco_container")
-    print("after HBTModel")
-    print("before EventParser")
-    # 初始化事件解析器
-    event_parser = EventParser()
-    print("after EventParser")
+    # 后台批量推理语义向量，避免单次推理阻塞日志消费
+    embedding_service = EmbeddingService().start()
+
+    with STARTUP.phase("create HBT model manager"):
+        # 每个容器一个HBT模型；HANABI_WORKERS>0 时按一致性哈希分到多个进程
+        model_manager = create_model_manager(embedding_service)
+    with STARTUP.phase("warm start HBT models"):
+        # 设置了HANABI_SNAPSHOT_DIR时从检查点恢复各容器模型，已收敛的直接进入检测期
+        restored = model_manager.warm_start()
+        if restored:
+            print(f"♻️  Restored {restored} HBT models from snapshots")
+    with STARTUP.phase("start alert server"):
+        # 告警以SSE推送（/alerts/stream），security_alerts_total与模型注册表等指标在同一端口的/metrics
+        alert_server = AlertServer(os.environ.get(ALERT_HTTP_ENV, DEFAULT_ALERT_HTTP)).start()
+        # 常驻/已换出模型数（hanabi_models{state}）与换出/加载次数
+        alert_server.registry.register(ModelRegistryMetrics(model_manager))
+        alert_stream = ALERTS.subscribe()
+        threading.Thread(target=print_alerts, args=(alert_stream,), name="alert-printer", daemon=True).start()
+    print(STARTUP.report())
     
     try:
         cnt = 0
         while True:
-            json_obj = log_queue.get(timeout=1)
-            if json_obj:
-                cnt += 1
+            # 按批取出事件，减少逐条出队的锁开销
+            batch = log_queue.get_batch(512, timeout=1)
+            if batch:
+                cnt += len(batch)
                 print("log:", cnt)
-                # 解析事件并添加到HBT模型
-                output_fields = event_parser.extract_output_fields(json_obj)
-                category = event_parser.categorize_event(json_obj)
-                
-                if category == "process":
-                    print("process log")
-                    hbt_model.add_process_event(output_fields)
-                elif category == "network":
-                    print("network log")
-                    hbt_model.add_network_event(output_fields)
-                elif category == "file":
-                    print("file log")
-                    hbt_model.add_file_event(output_fields)
+                # 按事件所属容器路由到对应的HBT模型
+                model_manager.add_events(batch)
+            else:
+                # 空闲时对账暂存的未知token
+                model_manager.reconcile()
 
                     
     except KeyboardInterrupt:
         print("\n⏹️  Stopped by user")
-        # 打印最终模型结构
-        print("Final HBT model (JSON format):")
-        print(json.dumps(hbt_model.get_model(), ensure_ascii=False, default=str))
-        
-        # 以树形结构打印模型
-        print("\nFinal HBT model (Tree format):")
-        model_dict = hbt_model.get_model()
-        hbt_structure = model_dict["hbt_structure"]
-        # 重建根节点
-        root_node = TreeNode(hbt_structure["name"], hbt_structure["type"])
-        root_node.events_count = hbt_structure["events_count"]
-        root_node.metadata = hbt_structure["metadata"]
-        # 递归重建子节点
-        def rebuild_tree(node_dict, parent_node):
-            for child_name, child_dict in node_dict["children"].items():
-                child_node = parent_node.add_child(child_name, child_dict["type"])
-                child_node.events_count = child_dict["events_count"]
-                child_node.metadata = child_dict["metadata"]
-                rebuild_tree(child_dict, child_node)
-        rebuild_tree(hbt_structure, root_node)
-        # 打印树形结构
-        tree = print_tree(root_node)
-        rprint(tree)
+        # 打印常驻容器的最终模型结构；已换出的模型不为打印重新加载回内存
+        for model_dict in model_manager.get_models(include_spilled=False).values():
+            print_model(model_dict)
+        # 常驻/已换出到磁盘的模型数
+        print(f"📦 Model registry: {model_manager.get_registry_stats()}")
     finally:
         log_queue.stop()
+        model_manager.close()
+        alert_stream.close()
+        alert_server.stop()
+        embedding_service.stop()
 
 
 def get_model_statistics(hbt_model):
@@ -0,0 +1,143 @@
+"""Events/s of the exporter's batch aggregation against the per-event Counter path.
+
+Usage:
+    python prometheus/bench_exporter.py --events 200000 --containers 50
+    python prometheus/bench_exporter.py --workers 1,2,4,8
+
+``per-event`` replays the previous ``process_event``: eight-label
+``Counter.labels(...).inc()``, a ``Gauge.set`` of the parsed event time and an
+f-string ``logging.info`` (to a null handler) for every event. ``batch`` is
+``EventAggregator.add_events`` over batches of 512, as ``consume_events`` does;
+``limited`` adds the default per-label ``CardinalityLimiter``. Raise
+``--containers`` past the container_name limit to see folding into ``__other__``.
+All report the time of one ``generate_latest`` scrape at the end.
+
+``--workers`` measures ``ShardedAggregator`` instead: events/s from the first
+``add_events`` until every event has been merged back into the scraping
+process, for each worker count. Worker processes only help with spare cores;
+``os.cpu_count()`` is printed alongside.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, generate_latest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from exporter import (
+    DEFAULT_LABEL_LIMITS, EVENT_LABELS, CardinalityLimiter, EventAggregator, ShardedAggregator,
+    _get_rule_category, _parse_event_timestamp,
+)
+
+
+def falco_events(count, containers):
+    events = []
+    for i in range(count):
+        events.append({
+            "rule": ("process", "network", "file")[i % 3],
+            "priority": ("Notice", "Warning")[i % 2],
+            "output_fields": {
+                "evt.type": ("execve", "connect", "openat")[i % 3],
+                "evt.time.iso8601": "2025-01-01T00:00:00Z",
+                "container.name": f"app-{i % containers}",
+                "container.image.repository": f"registry/app-{i % containers}",
+                "proc.name": ("bash", "curl", "cat", "python")[i % 4],
+                "k8s.ns.name": "default",
+                "k8s.pod.name": f"app-{i % containers}-7d9f",
+            },
+        })
+    return events
+
+
+def per_event(events):
+    registry = CollectorRegistry()
+    syscall_events = Counter('syscall_events_total', 'Total.', EVENT_LABELS, registry=registry)
+    last_event = Gauge('syscall_last_event_timestamp_seconds', 'Last.', ['container_name'], registry=registry)
+    log = logging.getLogger("bench.per_event")
+    started = time.perf_counter()
+    for event_data in events:
+        output_fields = event_data.get('output_fields', {})
+        rule = event_data.get('rule', 'unknown')
+        container_name = output_fields.get('container.name', 'unknown')
+        syscall_events.labels(
+            rule=rule,
+            priority=event_data.get('priority', 'unknown'),
+            container_name=container_name,
+            image_repository=output_fields.get('container.image.repository', 'unknown'),
+            process_name=output_fields.get('proc.name', 'unknown'),
+            k8s_namespace=output_fields.get('k8s.ns.name') or 'none',
+            k8s_pod=output_fields.get('k8s.pod.name') or 'none',
+            rule_category=_get_rule_category(rule, output_fields.get('evt.type', 'unknown')),
+        ).inc()
+        last_event.labels(container_name=container_name).set(_parse_event_timestamp(output_fields))
+        log.info(f"Processed event from container: {container_name}, rule: {rule}")
+    return time.perf_counter() - started, registry
+
+
+def batched(events, batch_size=512, limiter=None):
+    registry = CollectorRegistry()
+    aggregator = EventAggregator(limiter)
+    registry.register(aggregator)
+    started = time.perf_counter()
+    for start in range(0, len(events), batch_size):
+        aggregator.add_events(events[start:start + batch_size])
+    return time.perf_counter() - started, registry
+
+
+def limited(events):
+    limits = dict(pair.split('=') for pair in DEFAULT_LABEL_LIMITS.split(','))
+    return batched(events, limiter=CardinalityLimiter({label: int(limit) for label, limit in limits.items()}))
+
+
+def sharded(events, workers, batch_size=512):
+    aggregator = EventAggregator(CardinalityLimiter.from_env())
+    shards = ShardedAggregator(workers, aggregator, flush_interval=0.05)
+    # 先发送一批让 worker 完成启动
+    shards.add_events(events[:batch_size])
+    while aggregator.events < batch_size:
+        time.sleep(0.01)
+    started = time.perf_counter()
+    for start in range(0, len(events), batch_size):
+        shards.add_events(events[start:start + batch_size])
+    while aggregator.events < batch_size + len(events):
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    shards.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--containers", type=int, default=50)
+    parser.add_argument("--workers", help="comma-separated worker counts, e.g. 1,2,4")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    events = falco_events(args.events, args.containers)
+    if args.workers:
+        print(f"cpu_count={os.cpu_count()}")
+        print(f"{'workers':<12}{'events/s':>12}")
+        elapsed, _ = limited(events)
+        print(f"{'in-process':<12}{len(events) / elapsed:>12.0f}")
+        for workers in (int(value) for value in args.workers.split(',')):
+            print(f"{workers:<12}{len(events) / sharded(events, workers):>12.0f}")
+        return
+    print(f"{'path':<12}{'events/s':>12}{'scrape ms':>12}")
+    for label, run in (("per-event", per_event), ("batch", batched), ("limited", limited)):
+        elapsed, registry = run(events)
+        started = time.perf_counter()
+        generate_latest(registry)
+        scrape = time.perf_counter() - started
+        print(f"{label:<12}{len(events) / elapsed:>12.0f}{scrape * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
-from prometheus_client import start_http_server, Counter, Gauge
+from prometheus_client import start_http_server, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import heapq
 import logging
 import sys
 import os
+import time
+import multiprocessing
+import queue
+import zlib
 from datetime import datetime
+from threading import Lock, Thread
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from hanabi.utils.queue import DockerLogQueue
+from hanabi.utils.sources import create_event_source
+from hanabi.utils.timeCount import RateWindows
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,19 +26,394 @@ EVENT_LABELS = [
     'image_repository', 'process_name', 'k8s_namespace', 'k8s_pod',
     'rule_category'
 ]
-SYSCALL_EVENTS = Counter('syscall_events_total', 'Total number of syscall events observed.', EVENT_LABELS)
+# syscall_event_rate_10s 的滑动窗口长度（秒）
+EVENT_RATE_WINDOW = 10
 
-LAST_EVENT_TIMESTAMP = Gauge(
-    'syscall_last_event_timestamp_seconds',
-    'Timestamp (seconds) of the last processed syscall event.',
-    ['container_name']
-)
+class EventQueueCollector:
+    """在每次抓取时导出事件队列的溢出策略状态（丢弃数、阻塞时间、队列水位）以及事件源的重连统计"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        stats = self.source.queue.stats()
+        policy = stats['policy']
+
+        size = GaugeMetricFamily('hanabi_event_queue_size', 'Events currently waiting in the event queue.', labels=['policy'])
+        size.add_metric([policy], stats['size'])
+        yield size
+
+        capacity = GaugeMetricFamily('hanabi_event_queue_capacity', 'Maximum number of events in the event queue.', labels=['policy'])
+        capacity.add_metric([policy], stats['capacity'])
+        yield capacity
+
+        high_watermark = GaugeMetricFamily(
+            'hanabi_event_queue_high_watermark', 'Largest event queue size observed since start.', labels=['policy'])
+        high_watermark.add_metric([policy], stats['high_watermark'])
+        yield high_watermark
+
+        blocked = CounterMetricFamily(
+            'hanabi_event_queue_blocked_seconds', 'Time the event reader spent waiting for queue space.', labels=['policy'])
+        blocked.add_metric([policy], stats['blocked_seconds'])
+        yield blocked
+
+        dropped = CounterMetricFamily(
+            'hanabi_event_queue_dropped', 'Events dropped by the queue overflow policy.',
+            labels=['policy', 'reason', 'priority'])
+        for (reason, priority), count in stats['dropped'].items():
+            dropped.add_metric([policy, reason, priority], count)
+        yield dropped
+
+        # 只有支持重连的事件源（docker）才有以下统计
+        source_stats = self.source.get_stats()
+        source = self.source.name
+        for key, help_text in (
+            ('reconnects', 'Reconnects of the event source after the stream was lost.'),
+            ('duplicates_dropped', 'Replayed events dropped because they were already queued.'),
+            ('replayed_events', 'Events recovered from the gap by replaying from the cursor.'),
+        ):
+            if key in source_stats:
+                counter = CounterMetricFamily(f'hanabi_event_source_{key}', help_text, labels=['source'])
+                counter.add_metric([source], source_stats[key])
+                yield counter
+        if 'last_gap_seconds' in source_stats:
+            gap = GaugeMetricFamily(
+                'hanabi_event_source_last_gap_seconds', 'Duration of the last event stream outage.', labels=['source'])
+            gap.add_metric([source], source_stats['last_gap_seconds'])
+            yield gap
+
+
+# 受限标签及每个标签保留的取值数，例如 "process_name=200,k8s_pod=1000"
+LABEL_LIMITS_ENV = 'HANABI_LABEL_LIMITS'
+DEFAULT_LABEL_LIMITS = 'process_name=200,k8s_pod=1000,container_name=500'
+# 序列超过该秒数没有新事件即从导出中移除，0 表示不过期
+SERIES_TTL_ENV = 'HANABI_SERIES_TTL'
+# 超出限制的取值合并到该标签值
+OTHER_VALUE = '__other__'
+# 多进程模式下按容器分区，这些标签的取值只出现在一个分区中
+PARTITIONED_LABELS = ('container_name', 'k8s_pod')
+
+
+class SpaceSaving:
+    """
+    Space-Saving 算法：用 capacity 个计数器近似统计数据流中最频繁的取值。
+    新值在计数器已满时顶替计数最小的值，并把该最小值记为自己的误差上界
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # 取值 -> [估计计数, 误差]
+        self.counters = {}
+        # (计数, 取值) 的最小堆，计数变化后旧条目惰性作废
+        self._heap = []
+
+    def _min(self):
+        heap = self._heap
+        while True:
+            count, value = heap[0]
+            counter = self.counters.get(value)
+            if counter is not None and counter[0] == count:
+                return count, value
+            heapq.heappop(heap)
+
+    def add(self, value, weight=1):
+        counter = self.counters.get(value)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[value] = [0, 0]
+            else:
+                floor, evicted = self._min()
+                del self.counters[evicted]
+                counter = self.counters[value] = [floor, floor]
+        counter[0] += weight
+        heapq.heappush(self._heap, (counter[0], value))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def floor(self):
+        """计数器已满时返回最小计数，未满时返回0"""
+        if len(self.counters) < self.capacity:
+            return 0
+        return self._min()[0]
+
+    def is_heavy(self, value, floor=None):
+        """
+        取值是否属于高频集合：计数器未满时全部保留；
+        已满时要求其保证计数（估计计数减误差）不低于当前最小计数
+
+        Args:
+            value: 标签取值
+            floor: 预先取得的 floor()，批量判断时避免重复查询
+        """
+        counter = self.counters.get(value)
+        if counter is None:
+            return False
+        if floor is None:
+            floor = self.floor()
+        return counter[0] - counter[1] >= floor
+
+
+class CardinalityLimiter:
+    """按标签用 Space-Saving 保留高频取值，其余取值合并为 __other__"""
+
+    def __init__(self, limits):
+        """
+        Args:
+            limits: 标签名 -> 保留的取值数
+        """
+        self.limits = dict(limits)
+        self.sketches = {label: SpaceSaving(capacity) for label, capacity in self.limits.items()}
+
+    @classmethod
+    def from_env(cls, partitions=1, labels=None):
+        """
+        Args:
+            partitions: 按容器分区的 worker 数；container_name 与 k8s_pod 的取值各分区互不相交，
+                限额按分区均分，使合并后的总序列数仍受原限额约束
+            labels: 只限制这些标签，默认为配置中的全部标签
+        """
+        limits = {}
+        for pair in os.environ.get(LABEL_LIMITS_ENV, DEFAULT_LABEL_LIMITS).split(','):
+            label, _, capacity = pair.partition('=')
+            label = label.strip()
+            if not label or not capacity.strip() or (labels is not None and label not in labels):
+                continue
+            capacity = int(capacity)
+            if label in PARTITIONED_LABELS:
+                capacity = max(1, -(-capacity // partitions))
+            limits[label] = capacity
+        return cls(limits)
+
+    def observe(self, label, weights):
+        """
+        用一批事件中该标签各取值的事件数更新草图
+
+        Args:
+            label: 标签名
+            weights: 取值 -> 事件数
+
+        Returns:
+            dict: 取值 -> 导出时使用的取值（原值或 __other__）
+        """
+        sketch = self.sketches[label]
+        for value, weight in weights.items():
+            sketch.add(value, weight)
+        floor = sketch.floor()
+        return {value: value if sketch.is_heavy(value, floor) else OTHER_VALUE for value in weights}
+
+
+class EventAggregator:
+    """
+    批量聚合事件：热路径只把事件累加进普通 dict（标签元组 -> 计数），
+    syscall_events_total 与 syscall_last_event_timestamp_seconds 在抓取时由 collect() 生成，
+    不再为每个事件做 labels() 查找和加锁
+    """
+
+    def __init__(self, limiter=None, series_ttl=0.0):
+        """
+        Args:
+            limiter: 可选的 CardinalityLimiter，限制标签取值数
+            series_ttl: 序列空闲超过该秒数后移除，0 表示不过期
+        """
+        # 标签元组（顺序同 EVENT_LABELS） -> 累计事件数
+        self.counts = {}
+        # container_name -> 最新事件时间戳（秒）
+        self.last_timestamps = {}
+        self.events = 0
+        self.limiter = limiter
+        self.series_ttl = series_ttl
+        # 标签元组 / container_name -> 最近一次更新的单调时间，用于过期
+        self._touched = {}
+        self._container_touched = {}
+        self._last_expire = time.monotonic()
+        self.expired_series = 0
+        # 标签名 -> 被合并到 __other__ 的事件数
+        self.folded = {label: 0 for label in limiter.limits} if limiter is not None else {}
+        # container_name -> 最近 EVENT_RATE_WINDOW 秒的按秒分桶计数
+        self.rates = RateWindows(EVENT_RATE_WINDOW)
+        # 消费线程每批合并一次，抓取线程读取时持有
+        self._lock = Lock()
+
+    def add_events(self, events):
+        """把一批事件折叠进计数，每批只加锁一次"""
+        batch, timestamps = self.fold(events)
+        self.merge(batch, timestamps)
+
+    def fold(self, events):
+        """
+        把一批事件折叠为计数，不修改已导出的状态
+
+        Returns:
+            tuple: (标签元组 -> 事件数, container_name -> 最新事件时间戳)
+        """
+        batch = {}
+        last_fields = {}
+        for event_data in events:
+            try:
+                output_fields = event_data.get('output_fields', {})
+                rule = event_data.get('rule', 'unknown')
+                container_name = output_fields.get('container.name', 'unknown')
+                key = (
+                    rule,
+                    event_data.get('priority', 'unknown'),
+                    container_name,
+                    output_fields.get('container.image.repository', 'unknown'),
+                    output_fields.get('proc.name', 'unknown'),
+                    output_fields.get('k8s.ns.name') or 'none',
+                    output_fields.get('k8s.pod.name') or 'none',
+                    _get_rule_category(rule, output_fields.get('evt.type', 'unknown')),
+                )
+            except Exception as e:
+                logging.error(f"Error processing event: {e}\nData: {event_data}")
+                continue
+            batch[key] = batch.get(key, 0) + 1
+            last_fields[container_name] = output_fields
+        if self.limiter is not None:
+            batch = self._limit(batch)
+            last_fields = self._limit_containers(last_fields)
+        # 每个容器只解析本批最后一个事件的时间
+        return batch, {name: _parse_event_timestamp(fields) for name, fields in last_fields.items()}
+
+    def merge(self, batch, timestamps, folded=None, limit_labels=()):
+        """
+        合并折叠后的计数，可以来自本进程的 fold()，也可以来自 worker 进程
+
+        Args:
+            batch: 标签元组 -> 事件数
+            timestamps: container_name -> 最新事件时间戳
+            folded: 可选，标签名 -> worker 中被合并到 __other__ 的事件数
+            limit_labels: 合并前在本进程再做基数限制的标签，
+                用于取值跨 worker 出现、无法在各分区内单独限制的标签
+        """
+        if limit_labels and self.limiter is not None:
+            batch = self._limit(batch, limit_labels)
+        per_container = {}
+        for key, count in batch.items():
+            per_container[key[2]] = per_container.get(key[2], 0) + count
+        now = time.monotonic()
+        wall = time.time()
+        with self._lock:
+            counts = self.counts
+            touched = self._touched
+            for key, count in batch.items():
+                counts[key] = counts.get(key, 0) + count
+                touched[key] = now
+            for name, count in per_container.items():
+                self.rates.add(name, count, wall)
+            self.last_timestamps.update(timestamps)
+            for name in timestamps:
+                self._container_touched[name] = now
+            self.events += sum(batch.values())
+            for label, count in (folded or {}).items():
+                self.folded[label] = self.folded.get(label, 0) + count
+            if self.series_ttl and now - self._last_expire >= min(self.series_ttl, 60.0):
+                self._expire(now)
+
+    def _limit(self, batch, labels=None):
+        """
+        把受限标签中的低频取值替换为 __other__，合并后的计数相加
+
+        Args:
+            batch: 标签元组 -> 事件数
+            labels: 要限制的标签，默认为 limiter 中的全部标签
+        """
+        for label in (self.limiter.limits if labels is None else labels):
+            if label not in self.limiter.limits:
+                continue
+            position = EVENT_LABELS.index(label)
+            weights = {}
+            for key, count in batch.items():
+                weights[key[position]] = weights.get(key[position], 0) + count
+            # 已经合并的 __other__ 不再参与草图统计
+            weights.pop(OTHER_VALUE, None)
+            mapping = self.limiter.observe(label, weights)
+            mapping[OTHER_VALUE] = OTHER_VALUE
+            folded = sum(weights[value] for value, mapped in mapping.items() if mapped != value)
+            if not folded:
+                continue
+            self.folded[label] += folded
+            limited = {}
+            for key, count in batch.items():
+                value = mapping[key[position]]
+                if value != key[position]:
+                    key = key[:position] + (value,) + key[position + 1:]
+                limited[key] = limited.get(key, 0) + count
+            batch = limited
+        return batch
+
+    def _limit_containers(self, last_fields):
+        # 最新时间戳按容器导出，低频容器同样合并到 __other__
+        sketch = self.limiter.sketches.get('container_name')
+        if sketch is None:
+            return last_fields
+        floor = sketch.floor()
+        return {name if sketch.is_heavy(name, floor) else OTHER_VALUE: fields for name, fields in last_fields.items()}
+
+    def _expire(self, now):
+        """移除空闲超过 series_ttl 的序列（调用方持有锁）"""
+        self._last_expire = now
+        deadline = now - self.series_ttl
+        for key in [key for key, seen in self._touched.items() if seen < deadline]:
+            del self._touched[key]
+            del self.counts[key]
+            self.expired_series += 1
+        for name in [name for name, seen in self._container_touched.items() if seen < deadline]:
+            del self._container_touched[name]
+            del self.last_timestamps[name]
+            self.rates.discard(name)
+
+    def collect(self):
+        with self._lock:
+            counts = list(self.counts.items())
+            timestamps = list(self.last_timestamps.items())
+            rates = self.rates.rates()
+
+        events = CounterMetricFamily('syscall_events', 'Total number of syscall events observed.', labels=EVENT_LABELS)
+        for key, count in counts:
+            events.add_metric(key, count)
+        yield events
+
+        last_event = GaugeMetricFamily(
+            'syscall_last_event_timestamp_seconds',
+            'Timestamp (seconds) of the last processed syscall event.',
+            labels=['container_name'])
+        for container_name, ts_sec in timestamps:
+            last_event.add_metric([container_name], ts_sec)
+        yield last_event
+
+        rate = GaugeMetricFamily(
+            'syscall_event_rate_10s',
+            f'Event rate (events/s) in the last {EVENT_RATE_WINDOW} seconds window.',
+            labels=['container_name'])
+        for container_name, value in rates.items():
+            rate.add_metric([container_name], value)
+        yield rate
+
+        series = GaugeMetricFamily(
+            'hanabi_exporter_series', 'Series currently exported per metric.', labels=['metric'])
+        series.add_metric(['syscall_events_total'], len(counts))
+        series.add_metric(['syscall_last_event_timestamp_seconds'], len(timestamps))
+        yield series
+
+        expired = CounterMetricFamily(
+            'hanabi_exporter_expired_series', 'Series removed after being idle for the series TTL.')
+        expired.add_metric([], self.expired_series)
+        yield expired
+
+        if self.folded:
+            folded = CounterMetricFamily(
+                'hanabi_exporter_folded_events',
+                f'Events whose label value was folded into {OTHER_VALUE} by the cardinality limiter.',
+                labels=['label'])
+            for label, count in list(self.folded.items()):
+                folded.add_metric([label], count)
+            yield folded
+
+
+AGGREGATOR = EventAggregator(CardinalityLimiter.from_env(), float(os.environ.get(SERIES_TTL_ENV, '3600')))
+REGISTRY.register(AGGREGATOR)
 
-EVENT_RATE_10S = Gauge(
-    'syscall_event_rate_10s',
-    'Event rate in last 10 seconds window.',
-    ['container_name']
-)
 
 def _get_rule_category(rule: str, evt_type: str) -> str:
     r = (rule or '').lower()
@@ -68,61 +451,174 @@ def _parse_event_timestamp(output_fields):
     return int(datetime.utcnow().timestamp())
 
 
+def process_events(events):
+    """把一批事件计入 AGGREGATOR"""
+    AGGREGATOR.add_events(events)
+
+
 def process_event(event_data):
-    try:
-        output_fields = event_data.get('output_fields', {})
-        
-        # 提取标签值，为缺失的值提供默认 'unknown'
-        rule = event_data.get('rule', 'unknown')
-        priority = event_data.get('priority', 'unknown')
-        container_name = output_fields.get('container.name', 'unknown')
-        image_repository = output_fields.get('container.image.repository', 'unknown')
-        process_name = output_fields.get('proc.name', 'unknown')
-        evt_type = output_fields.get('evt.type', 'unknown')
-        
-        k8s_namespace = output_fields.get('k8s.ns.name') or 'none'
-        k8s_pod = output_fields.get('k8s.pod.name') or 'none'
+    process_events([event_data])
 
-        SYSCALL_EVENTS.labels(
-            rule=rule,
-            priority=priority,
-            container_name=container_name,
-            image_repository=image_repository,
-            process_name=process_name,
-            k8s_namespace=k8s_namespace,
-            k8s_pod=k8s_pod,
-            rule_category=_get_rule_category(rule, evt_type)
-        ).inc()
 
-        ts_sec = _parse_event_timestamp(output_fields)
-        LAST_EVENT_TIMESTAMP.labels(container_name=container_name).set(ts_sec)
+# 聚合事件的 worker 进程数，0 表示在消费线程内聚合
+WORKERS_ENV = 'HANABI_EXPORTER_WORKERS'
+# worker 向 HTTP 进程发送增量的间隔（秒）
+FLUSH_INTERVAL_ENV = 'HANABI_EXPORTER_FLUSH_INTERVAL'
 
-        logging.info(f"Processed event from container: {container_name}, rule: {rule}")
 
-    except Exception as e:
-        logging.error(f"Error processing event: {e}\nData: {event_data}")
+def _worker_main(partitions, inbox, outbox, flush_interval):
+    """
+    worker 进程：折叠分到本分区的事件，每 flush_interval 秒把累积的增量发给 HTTP 进程。
+    worker 只限制按容器分区的标签，其余标签（如 process_name）的取值跨分区出现，
+    由 HTTP 进程在合并时用一个全局草图限制
+    """
+    aggregator = EventAggregator(CardinalityLimiter.from_env(partitions, labels=PARTITIONED_LABELS))
+    pending = {}
+    timestamps = {}
+    shipped_folded = dict(aggregator.folded)
+    deadline = time.monotonic() + flush_interval
+
+    def flush():
+        nonlocal pending, timestamps, shipped_folded
+        folded = {label: count - shipped_folded.get(label, 0) for label, count in aggregator.folded.items()}
+        if pending or timestamps or any(folded.values()):
+            outbox.put((pending, timestamps, folded))
+        pending, timestamps, shipped_folded = {}, {}, dict(aggregator.folded)
+
+    while True:
+        try:
+            events = inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            events = ()
+        if events is None:
+            flush()
+            outbox.put(None)
+            return
+        if events:
+            batch, batch_timestamps = aggregator.fold(events)
+            for key, count in batch.items():
+                pending[key] = pending.get(key, 0) + count
+            timestamps.update(batch_timestamps)
+        if time.monotonic() >= deadline:
+            flush()
+            deadline = time.monotonic() + flush_interval
+
+
+class ShardedAggregator:
+    """
+    多进程聚合：事件按 container_name 分到 N 个 worker 进程折叠，
+    worker 定期把聚合后的增量发回本进程合并进 aggregator，/metrics 仍由本进程的一个端点导出
+    """
+
+    def __init__(self, workers, aggregator=None, flush_interval=0.25):
+        """
+        Args:
+            workers: worker 进程数
+            aggregator: 合并增量的 EventAggregator，默认为 AGGREGATOR
+            flush_interval: worker 发送增量的间隔（秒）
+        """
+        self.workers = workers
+        self.aggregator = aggregator if aggregator is not None else AGGREGATOR
+        # 在 HTTP 进程集中限制的标签
+        limiter = self.aggregator.limiter
+        self._central_labels = tuple(
+            label for label in (limiter.limits if limiter is not None else ()) if label not in PARTITIONED_LABELS)
+        self._partition_cache = {}
+        self._outbox = multiprocessing.Queue()
+        self._inboxes = []
+        self._processes = []
+        for partition in range(workers):
+            inbox = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(workers, inbox, self._outbox, flush_interval),
+                name=f"exporter-worker-{partition}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        self._merger = Thread(target=self._merge_loop, name="exporter-merge", daemon=True)
+        self._merger.start()
+
+    def partition_for(self, container_name):
+        partition = self._partition_cache.get(container_name)
+        if partition is None:
+            partition = zlib.crc32(container_name.encode()) % self.workers
+            self._partition_cache[container_name] = partition
+        return partition
+
+    def add_events(self, events):
+        """按 container_name 分组后发送，每个 worker 每批只序列化一次"""
+        buckets = {}
+        for event_data in events:
+            fields = event_data.get('output_fields') or {}
+            partition = self.partition_for(str(fields.get('container.name', 'unknown')))
+            bucket = buckets.get(partition)
+            if bucket is None:
+                bucket = buckets[partition] = []
+            bucket.append(event_data)
+        for partition, bucket in buckets.items():
+            self._inboxes[partition].put(bucket)
+
+    def _merge_loop(self):
+        running = self.workers
+        while running:
+            delta = self._outbox.get()
+            if delta is None:
+                running -= 1
+                continue
+            self.aggregator.merge(*delta, limit_labels=self._central_labels)
+
+    def close(self, timeout=5.0):
+        """发送剩余增量后停止 worker"""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        self._merger.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
 
+def consume_events(container_name="falco", workers=0):
+    """
+    从事件源持续消费事件，事件源由 HANABI_EVENT_SOURCE 选择（默认 docker）
 
-def consume_events(container_name="falco"):
-    """从 DockerLogQueue 持续消费事件"""
+    Args:
+        container_name: Falco 容器名
+        workers: 大于 0 时事件分给该数量的 worker 进程聚合
+    """
     log_queue = None
+    shards = None
     try:
+        if workers > 0:
+            shards = ShardedAggregator(workers, flush_interval=float(os.environ.get(FLUSH_INTERVAL_ENV, '0.25')))
+            logging.info(f"Aggregating events in {workers} worker processes")
         logging.info(f"Starting to consume events from container: {container_name}")
-        log_queue = DockerLogQueue(container_name=container_name, max_queue_size=10000)
+        log_queue = create_event_source(container_name=container_name, max_queue_size=10000)
+        collector = EventQueueCollector(log_queue)
+        REGISTRY.register(collector)
         log_queue.start()
         
         while True:
-            json_obj = log_queue.get(timeout=1)
-            if json_obj:
-                process_event(json_obj)
-                pass
+            # 按批取出事件
+            batch = log_queue.get_batch(512, timeout=1)
+            if batch:
+                if shards is not None:
+                    shards.add_events(batch)
+                else:
+                    process_events(batch)
                 
     except KeyboardInterrupt:
         logging.info("Stopping event consumer...")
     except Exception as e:
         logging.error(f"Error in event consumer: {e}")
     finally:
+        if shards is not None:
+            shards.close()
         if log_queue:
+            REGISTRY.unregister(collector)
             log_queue.stop()
             stats = log_queue.get_stats()
             logging.info(f"Final stats: {stats}")
@@ -139,7 +635,7 @@ if __name__ == '__main__':
     logging.info(f"✅ Prometheus metrics server started on port {metrics_port}")
     
     try:
-        consume_events(container_name=container_name)
+        consume_events(container_name=container_name, workers=int(os.getenv(WORKERS_ENV, '0')))
     except KeyboardInterrupt:
         logging.info("\n🛑 Exporter stopped by user")
     except Exception as e:
@@ -0,0 +1,161 @@
+import os
+import random
+import time
+import unittest
+from collections import Counter
+
+from exporter import (EVENT_LABELS, LABEL_LIMITS_ENV, OTHER_VALUE, CardinalityLimiter, EventAggregator,
+                      ShardedAggregator, SpaceSaving)
+
+
+def event(proc, container="web"):
+    return {
+        "rule": "process",
+        "priority": "Notice",
+        "output_fields": {
+            "evt.type": "execve",
+            "evt.time.iso8601": "2025-01-01T00:00:00Z",
+            "container.name": container,
+            "proc.name": proc,
+        },
+    }
+
+
+def skewed_stream(heavy, rare, seed=7):
+    """heavy 个高频取值各出现多次，rare 个低频取值各出现一次，顺序打乱"""
+    values = [f"heavy{i}" for i in range(heavy) for _ in range(50 + 10 * i)]
+    values += [f"rare{i}" for i in range(rare)]
+    random.Random(seed).shuffle(values)
+    return values
+
+
+class SpaceSavingTest(unittest.TestCase):
+
+    def test_keeps_everything_below_capacity(self):
+        sketch = SpaceSaving(4)
+        for value in "abcab":
+            sketch.add(value)
+        self.assertEqual(sketch.floor(), 0)
+        self.assertEqual({value: counter[0] for value, counter in sketch.counters.items()}, {"a": 2, "b": 2, "c": 1})
+        self.assertTrue(all(sketch.is_heavy(value) for value in "abc"))
+        self.assertFalse(sketch.is_heavy("d"))
+
+    def test_error_bounds_and_heavy_hitters(self):
+        stream = skewed_stream(heavy=5, rare=400)
+        truth = Counter(stream)
+        sketch = SpaceSaving(16)
+        for value in stream:
+            sketch.add(value)
+        self.assertEqual(len(sketch.counters), 16)
+        # 计数器之和等于总事件数，估计值减误差不超过真实值，估计值不低于真实值
+        self.assertEqual(sum(counter[0] for counter in sketch.counters.values()), len(stream))
+        for value, (count, error) in sketch.counters.items():
+            self.assertLessEqual(count - error, truth[value])
+            self.assertGreaterEqual(count, truth[value])
+        floor = sketch.floor()
+        self.assertEqual({value for value in sketch.counters if sketch.is_heavy(value, floor)},
+                         {f"heavy{i}" for i in range(5)})
+
+    def test_weights(self):
+        sketch = SpaceSaving(2)
+        sketch.add("a", 10)
+        sketch.add("b", 3)
+        sketch.add("c")
+        self.assertEqual(sketch.counters["c"], [4, 3])
+        self.assertNotIn("b", sketch.counters)
+        self.assertFalse(sketch.is_heavy("c"))
+        self.assertTrue(sketch.is_heavy("a"))
+
+
+class FoldingTest(unittest.TestCase):
+
+    def test_limiter_maps_rare_values_to_other(self):
+        limiter = CardinalityLimiter({"process_name": 2})
+        self.assertEqual(limiter.observe("process_name", {"a": 5, "b": 1}), {"a": "a", "b": "b"})
+        mapping = limiter.observe("process_name", {"a": 5, "c": 1})
+        self.assertEqual(mapping, {"a": "a", "c": OTHER_VALUE})
+
+    def test_aggregator_folds_rare_process_names(self):
+        stream = skewed_stream(heavy=3, rare=200)
+        aggregator = EventAggregator(CardinalityLimiter({"process_name": 8}))
+        for start in range(0, len(stream), 64):
+            aggregator.add_events([event(proc) for proc in stream[start:start + 64]])
+
+        position = EVENT_LABELS.index("process_name")
+        exported = Counter()
+        for key, count in aggregator.counts.items():
+            exported[key[position]] += count
+        # 事件总数不变，低频取值合并到 __other__，序列数受限额约束
+        self.assertEqual(sum(exported.values()), len(stream))
+        self.assertLessEqual(len(exported), 8 + 1)
+        self.assertEqual(exported[OTHER_VALUE], aggregator.folded["process_name"])
+        self.assertGreaterEqual(exported[OTHER_VALUE], 200 - 8)
+        for i in range(3):
+            self.assertIn(f"heavy{i}", exported)
+
+    def test_unlimited_labels_pass_through(self):
+        aggregator = EventAggregator(CardinalityLimiter({"process_name": 1}))
+        aggregator.add_events([event("bash", container=f"c{i}") for i in range(20)])
+        self.assertEqual(len(aggregator.last_timestamps), 20)
+        self.assertEqual(aggregator.folded, {"process_name": 0})
+
+
+class ShardedAggregatorTest(unittest.TestCase):
+    """两个 worker 折叠、HTTP 进程集中限制 process_name，结果与单进程 EventAggregator 相同"""
+
+    limits = {"process_name": 4, "container_name": 100}
+
+    def setUp(self):
+        # worker 进程从环境变量读取按容器分区的限额
+        self.previous = os.environ.get(LABEL_LIMITS_ENV)
+        os.environ[LABEL_LIMITS_ENV] = ",".join(f"{label}={limit}" for label, limit in self.limits.items())
+        self.sharded = ShardedAggregator(2, EventAggregator(CardinalityLimiter(self.limits)), flush_interval=0.01)
+
+    def tearDown(self):
+        self.sharded.close()
+        if self.previous is None:
+            os.environ.pop(LABEL_LIMITS_ENV, None)
+        else:
+            os.environ[LABEL_LIMITS_ENV] = self.previous
+
+    def wait_for(self, events):
+        deadline = time.monotonic() + 10
+        while self.sharded.aggregator.events < events and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(self.sharded.aggregator.events, events)
+
+    def test_matches_single_process(self):
+        reference = EventAggregator(CardinalityLimiter(self.limits))
+        stream = skewed_stream(heavy=3, rare=60)
+        containers = [f"pod{i}" for i in range(8)]
+        self.assertEqual({self.sharded.partition_for(name) for name in containers}, {0, 1})
+        sent = 0
+        for batch, start in enumerate(range(0, len(stream), 100)):
+            events = [event(proc, containers[(batch + i) % len(containers)])
+                      for i, proc in enumerate(stream[start:start + 100])]
+            partitions = [[item for item in events
+                           if self.sharded.partition_for(item["output_fields"]["container.name"]) == partition]
+                          for partition in (0, 1)]
+            # 逐个分区发送并等待合并，使集中草图看到的增量顺序与单进程逐批折叠相同
+            for bucket in partitions:
+                self.sharded.add_events(bucket)
+                sent += len(bucket)
+                self.wait_for(sent)
+                reference.add_events(bucket)
+
+        aggregator = self.sharded.aggregator
+        self.assertEqual(aggregator.counts, reference.counts)
+        self.assertEqual(aggregator.folded, reference.folded)
+        self.assertEqual(aggregator.last_timestamps, reference.last_timestamps)
+        position = EVENT_LABELS.index("process_name")
+        exported = Counter()
+        for key, count in aggregator.counts.items():
+            exported[key[position]] += count
+        self.assertEqual(sum(exported.values()), len(stream))
+        self.assertEqual(exported[OTHER_VALUE], aggregator.folded["process_name"])
+        self.assertGreater(aggregator.folded["process_name"], 0)
+        self.assertEqual(len({key[2] for key in aggregator.counts}), len(containers))
+
+
+if __name__ == "__main__":
+    unittest.main()
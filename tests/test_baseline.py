@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+import unittest
+
+from hanabi.models.baseline import BaselineStore
+from hanabi.models.hbt_builder import HBTBuilder
+
+IMAGE = "registry.local/web"
+
+
+def model(container_id, *paths):
+    builder = HBTBuilder(container_id, storage="tree")
+    for path in paths:
+        node = builder.process_branch
+        for name in path:
+            node = node.add_child(name, "test")
+        node.increment_events_count()
+    builder.learn_state.learning = False
+    return builder
+
+
+def shape(node):
+    return (node.name, node.events_count, sorted(shape(child) for child in node.children.values()))
+
+
+class BaselineStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = BaselineStore(tempfile.mkdtemp(), max_age=3600)
+        self.store.publish(IMAGE, "a", model("a", ("execve", "bash")))
+        self.store.publish(IMAGE, "b", model("b", ("execve", "curl")))
+
+    def test_merged_baseline_is_cached(self):
+        first = self.store.load(IMAGE)
+        second = self.store.load(IMAGE)
+        self.assertEqual(shape(first.root), shape(second.root))
+        self.assertEqual((self.store.merges, self.store.cache_hits), (1, 1))
+        self.assertEqual(BaselineStore(self.store.directory).load(IMAGE).container_id, IMAGE)
+        self.assertEqual(self.store.merges, 1)
+
+        inherited = self.store.inherit(IMAGE, "c")
+        self.assertEqual(sorted(inherited.process_branch.get_child("execve").children), ["bash", "curl"])
+        self.assertEqual(self.store.merges, 1)
+
+    def test_republish_invalidates_cache(self):
+        self.store.load(IMAGE)
+        self.store.publish(IMAGE, "b", model("b", ("execve", "wget")))
+        baseline = self.store.load(IMAGE)
+        self.assertEqual(sorted(baseline.process_branch.get_child("execve").children), ["bash", "wget"])
+        self.assertEqual(self.store.merges, 2)
+        directory = os.path.dirname(self.store.contributors(IMAGE)[0])
+        self.assertEqual(sum(name.endswith(".hbtm") for name in os.listdir(directory)), 1)
+
+    def test_expired_contributors_are_pruned(self):
+        stale = self.store.contributors(IMAGE)[0]
+        old = time.time() - 7200
+        os.utime(stale, (old, old))
+        self.assertEqual(len(self.store.contributors(IMAGE)), 1)
+        self.assertEqual(self.store.prune(), 1)
+        self.assertFalse(os.path.exists(stale))
+        baseline = self.store.load(IMAGE)
+        self.assertEqual(len(baseline.process_branch.get_child("execve").children), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from hanabi.utils.queue import BatchQueue
+
+
+def events(*numbers, priority="Notice"):
+    return [{"rule": "r", "priority": priority, "n": n} for n in numbers]
+
+
+def drain(queue):
+    return [e["n"] for e in queue.get_batch(1000, timeout=0)]
+
+
+class BatchQueueTest(unittest.TestCase):
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BatchQueue(policy="lifo")
+
+    def test_batches_keep_order(self):
+        queue = BatchQueue(maxsize=10)
+        queue.put_many(events(1, 2, 3))
+        queue.put(events(4)[0])
+        self.assertEqual([e["n"] for e in queue.get_batch(2, timeout=0)], [1, 2])
+        self.assertEqual(drain(queue), [3, 4])
+        self.assertEqual(queue.get_batch(timeout=0), [])
+
+    def test_block_waits_for_space(self):
+        queue = BatchQueue(maxsize=2)
+        queue.put_many(events(1, 2))
+        self.assertFalse(queue.put_many(events(3), timeout=0.05))
+        consumer = threading.Timer(0.05, queue.get_batch, args=(1,))
+        consumer.start()
+        self.assertTrue(queue.put_many(events(3), timeout=2))
+        consumer.join()
+        self.assertEqual(drain(queue), [2, 3])
+        self.assertGreater(queue.stats()["blocked_seconds"], 0)
+
+    def test_drop_oldest(self):
+        queue = BatchQueue(maxsize=3, policy="drop_oldest")
+        queue.put_many(events(1, 2, 3, 4, 5))
+        self.assertEqual(drain(queue), [3, 4, 5])
+        self.assertEqual(queue.stats()["dropped"], {("evicted", "Notice"): 2})
+
+    def test_drop_newest(self):
+        queue = BatchQueue(maxsize=3, policy="drop_newest")
+        queue.put_many(events(1, 2, 3, 4, 5))
+        self.assertEqual(drain(queue), [1, 2, 3])
+        self.assertEqual(queue.stats()["dropped"], {("rejected", "Notice"): 2})
+        self.assertEqual(queue.stats()["high_watermark"], 3)
+
+    def test_sample(self):
+        queue = BatchQueue(maxsize=2, policy="sample", sample_every=3)
+        queue.put_many(events(*range(1, 9)))
+        # Overflowing events 3..8: every third one (5 and 8) replaces the oldest
+        self.assertEqual(drain(queue), [5, 8])
+        self.assertEqual(queue.stats()["dropped_total"], 6)
+
+    def test_priority_evicts_lower_priority_first(self):
+        queue = BatchQueue(maxsize=3, policy="priority")
+        queue.put_many(events(1, priority="Debug") + events(2, priority="Warning") + events(3, priority="Debug"))
+        queue.put_many(events(4, priority="Critical") + events(5, priority="Notice") + events(6, priority="Debug"))
+        self.assertEqual(drain(queue), [2, 4, 5])
+        self.assertEqual(queue.stats()["dropped"], {("evicted", "Debug"): 2, ("rejected", "Debug"): 1})
+
+    def test_rule_priorities_override(self):
+        queue = BatchQueue(maxsize=1, policy="priority", rule_priorities={"shell": "critical"})
+        queue.put_many(events(1, priority="Error"))
+        queue.put_many([{"rule": "shell", "priority": "Debug", "n": 2}])
+        self.assertEqual(drain(queue), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from concurrent.futures import Future
+
+from hanabi.models import embedding
+from hanabi.models.detection_index import DetectionIndex
+from hanabi.models.tree_node import TreeNode
+
+PATHS = [
+    ("execve", "bash", "-c"),
+    ("execve", "bash", "--login"),
+    ("execve", "curl", "-s"),
+    ("connect", "nginx", "10.0.0.2:443:ipv4"),
+    ("openat", "cat", "/etc/passwd"),
+]
+
+
+def branch():
+    root = TreeNode("process_branch", "branch")
+    for path in PATHS:
+        node = root
+        for name in path:
+            node = node.add_child(name, "test")
+    return root
+
+
+def walk(root, path):
+    """按名称逐层查找（精确或归一化后相同），返回能匹配上的前缀层数"""
+    node = root
+    for depth, token in enumerate(path):
+        child = node.children.get(token)
+        if child is None:
+            child = next((c for name, c in node.children.items()
+                          if embedding.normalize_token(name) == embedding.normalize_token(token)), None)
+        if child is None:
+            return depth
+        node = child
+    return len(path)
+
+
+class StalledService:
+    """submit_many返回永远不会完成（或立即失败）的Future"""
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def submit_many(self, texts):
+        future = Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        return future
+
+
+class MatcherSettings(unittest.TestCase):
+    ngram_accept = ngram_reject = 1.0
+
+    def setUp(self):
+        self.settings = dict(embedding._matcher_settings)
+        embedding.configure_matcher(ngram_accept=self.ngram_accept, ngram_reject=self.ngram_reject)
+
+    def tearDown(self):
+        embedding._matcher_settings.update(self.settings)
+
+
+class DetectionIndexTest(MatcherSettings):
+    """只用精确、归一化与n-gram层（不相同即拒绝），不需要模型"""
+
+    def test_matches_tree_walk(self):
+        root = branch()
+        index = DetectionIndex(root)
+        queries = PATHS + [
+            ("execve", "BASH", "-c"),
+            ("execve", "bash", "-x"),
+            ("execve", "zsh"),
+            ("ptrace",),
+            ("openat", "cat", "/etc/passwd", "extra"),
+            ("connect", "nginx", "10.0.0.2:443:IPV4"),
+        ]
+        for path in queries:
+            with self.subTest(path=path):
+                self.assertEqual(index.match(path), walk(root, path))
+        for path in PATHS:
+            self.assertTrue(index.known(path))
+        self.assertFalse(index.known(("execve", "zsh")))
+        self.assertEqual(index.stats()["paths"], 12)
+
+    def test_cache_serves_repeated_misses(self):
+        index = DetectionIndex(branch())
+        index.match(("execve", "zsh"))
+        index.match(("execve", "zsh"))
+        stats = index.stats()
+        self.assertEqual((stats["fuzzy_lookups"], stats["cache_hits"]), (1, 1))
+
+
+class ModelTierFailureTest(MatcherSettings):
+    """向量推理停滞或失败时按未命中处理，不阻塞、不缓存"""
+
+    # 让所有非精确/归一化的查询都交给模型层
+    ngram_reject = 0.0
+
+    def check(self, service):
+        index = DetectionIndex(branch(), service, wait_timeout=0.05)
+        path = ("execve", "bash-wrapper")
+        self.assertEqual(index.match(path), 1)
+        self.assertEqual(index.stats()["model_failures"], 1)
+        self.assertEqual(index.stats()["cached"], 0)
+        self.assertEqual(index.match(("execve", "bash")), 2)
+
+    def test_stalled_service(self):
+        self.check(StalledService())
+
+    def test_failed_encode(self):
+        self.check(StalledService(RuntimeError("model crashed")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+
+from hanabi.utils.queue import DockerLogQueue
+
+
+def event(time_ns, number):
+    return {"rule": "r", "output_fields": {"evt.time": time_ns, "evt.num": number}}
+
+
+def numbers(events):
+    return [e["output_fields"]["evt.num"] for e in events]
+
+
+class DockerCursorTest(unittest.TestCase):
+    """Cursor bookkeeping of DockerLogQueue, driven through _filter_events without Docker"""
+
+    def test_live_events_out_of_order_are_kept(self):
+        source = DockerLogQueue()
+        kept = source._filter_events([event(30, 3), event(10, 1), event(20, 2)])
+        self.assertEqual(numbers(kept), [3, 1, 2])
+        self.assertEqual(source.cursor_ns, 30)
+        self.assertEqual(source.duplicates_dropped, 0)
+
+    def test_replay_drops_already_queued_events(self):
+        source = DockerLogQueue()
+        source._filter_events([event(10, 1), event(20, 2), event(30, 3)])
+        # Reconnect: everything before the new connection is backlog
+        source._replay_until_ns = 100
+        kept = source._filter_events([event(20, 2), event(25, 9), event(30, 3), event(40, 4)])
+        self.assertEqual(numbers(kept), [9, 4])
+        self.assertEqual(source.duplicates_dropped, 2)
+        self.assertEqual(source.replayed_events, 2)
+        # After the replay window, a repeated key is a live event again
+        self.assertEqual(numbers(source._filter_events([event(150, 2)])), [2])
+
+    def test_cursor_file_resumes_dedup(self):
+        path = os.path.join(tempfile.mkdtemp(), "cursor.json")
+        source = DockerLogQueue(cursor_path=path)
+        source._filter_events([event(10, 1), event(20, 2)])
+        source.save_cursor()
+        with open(path) as f:
+            self.assertEqual(json.load(f), {"time_ns": 20, "keys": [1, 2]})
+
+        restarted = DockerLogQueue(cursor_path=path)
+        self.assertEqual(restarted._since(), 20 / 1e9)
+        restarted._replay_until_ns = 100
+        self.assertEqual(numbers(restarted._filter_events([event(20, 2), event(21, 3)])), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from hanabi.models import embedding
+
+
+class SlowBackend(embedding.EmbeddingBackend):
+    """加载很慢的假后端，记录构造次数"""
+
+    kind = "test"
+    created = 0
+
+    def __init__(self, model_name=embedding.DEFAULT_MODEL_NAME, *, batch_size=16, max_length=256,
+                 truncate_dim=None, **_):
+        super().__init__(model_name, batch_size=batch_size, max_length=max_length, truncate_dim=truncate_dim)
+        SlowBackend.created += 1
+        time.sleep(0.1)
+
+    def _encode_batch(self, batch):
+        return np.array([[len(text), 1.0, 0.0] for text in batch], dtype=np.float32)
+
+
+class EmbeddingTestCase(unittest.TestCase):
+    kind = "test"
+    factory = SlowBackend
+
+    def setUp(self):
+        self.settings = dict(embedding._backend_settings)
+        self.cache_settings = dict(embedding._cache_settings)
+        self.previous = embedding._BACKENDS.get(self.kind)
+        embedding.register_backend(self.kind, self.factory)
+        embedding.configure_backend(self.kind)
+        embedding.configure_embedding_cache()
+        SlowBackend.created = 0
+
+    def tearDown(self):
+        embedding._backend_settings.update(self.settings)
+        embedding._cache_settings.update(self.cache_settings)
+        if self.previous is None:
+            embedding._BACKENDS.pop(self.kind, None)
+        else:
+            embedding._BACKENDS[self.kind] = self.previous
+        embedding.configure_backend()
+        embedding.configure_embedding_cache()
+
+
+class ConcurrentStartupTest(EmbeddingTestCase):
+
+    def test_backend_and_cache_created_once(self):
+        barrier = threading.Barrier(4)
+        results = []
+
+        def query(text):
+            barrier.wait()
+            results.append(embedding.encode_texts([text]))
+
+        threads = [threading.Thread(target=query, args=(f"text{i}",)) for i in range(3)]
+        threads.append(threading.Thread(target=lambda: (barrier.wait(), embedding.prewarm(background=False))))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowBackend.created, 1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(embedding.get_embedding_cache_stats()), 1)
+
+    def test_configure_backend_rebuilds(self):
+        embedding.encode_texts(["a"])
+        embedding.encode_texts(["b"])
+        self.assertEqual(SlowBackend.created, 1)
+        embedding.configure_backend(truncate_dim=2)
+        self.assertEqual(embedding.encode_texts(["c"]).shape, (1, 2))
+        self.assertEqual(SlowBackend.created, 2)
+
+
+class FakeRemoteBackend(SlowBackend):
+    kind = "remote"
+
+
+class RemoteCacheTest(EmbeddingTestCase):
+    """remote后端的向量缓存在服务端共享内存中，worker只保留很小的LRU且不写磁盘"""
+
+    kind = "remote"
+    factory = FakeRemoteBackend
+
+    def test_local_cache_is_small(self):
+        embedding.configure_embedding_cache(directory=tempfile.mkdtemp())
+        embedding.encode_texts([f"text{i}" for i in range(embedding.REMOTE_CACHE_CAPACITY + 100)])
+        (stats,) = embedding.get_embedding_cache_stats().values()
+        (cache,) = embedding._CACHES.values()
+        self.assertEqual(cache.capacity, embedding.REMOTE_CACHE_CAPACITY)
+        self.assertIsNone(cache.directory)
+        self.assertEqual(stats["evictions"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
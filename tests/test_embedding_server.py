@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from hanabi.models.embedding_server import EmbeddingServer, RemoteBackend
+
+
+class CountingBackend:
+    """按文本确定向量的假后端，记录每次encode的输入"""
+
+    cache_namespace = "test"
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def vector(text):
+        return np.array([len(text), sum(map(ord, text)) % 97, 1.0], dtype=np.float32)
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([self.vector(text) for text in texts])
+
+
+class EmbeddingServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = os.path.join(self.directory, "embedding.sock")
+        self.backend = CountingBackend()
+
+    def start(self, **options):
+        self.server = EmbeddingServer(self.address, backend=self.backend, **options)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        while not os.path.exists(self.address):
+            time.sleep(0.01)
+        self.client = RemoteBackend(server_address=self.address, client_name="test")
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join(2)
+        os.rmdir(self.directory)
+
+    def assertVectors(self, texts, vectors):
+        expected = np.stack([CountingBackend.vector(text) for text in texts]).astype(np.float16)
+        np.testing.assert_array_equal(vectors.astype(np.float16), expected)
+
+    def test_encode_reuses_resident_rows(self):
+        self.start()
+        texts = ["bash", "curl", "bash"]
+        self.assertVectors(texts, self.client.encode(texts))
+        calls = len(self.backend.calls)
+        self.assertVectors(["curl"], self.client.encode(["curl"]))
+        self.assertEqual(len(self.backend.calls), calls)
+        stats = self.client.server_stats()
+        self.assertEqual(stats["resident_rows"], 2)
+        self.assertEqual(stats["clients"]["test"]["requests"], 2)
+
+    def test_busy_until_pending_work_drains(self):
+        self.start(max_pending_texts=2)
+        with self.server._lock:
+            self.server._pending_texts = 2
+
+        def drain():
+            time.sleep(0.05)
+            with self.server._lock:
+                self.server._pending_texts = 0
+
+        threading.Thread(target=drain).start()
+        self.assertVectors(["bash"], self.client.encode(["bash"]))
+        self.assertGreater(self.client.busy_retries, 0)
+        self.assertGreater(self.client.server_stats()["clients"]["test"]["busy_rejections"], 0)
+
+    def test_row_evicted_before_reply_is_reencoded(self):
+        self.start(capacity_rows=2)
+        self.client.encode(["bash"])
+        submit_many = self.server._service.submit_many
+
+        def evicting(texts):
+            # 另一个请求在本请求等待推理时占满了全部行
+            future = submit_many(texts)
+            future.result()
+            with self.server._lock:
+                for name in ("x", "y"):
+                    self.server._assign(name, CountingBackend.vector(name))
+            return future
+
+        self.server._service.submit_many = evicting
+        self.assertVectors(["bash", "curl"], self.client.encode(["bash", "curl"]))
+        self.assertIn(["bash"], self.backend.calls[1:])
+        self.assertEqual(self.server.stats()["pending_texts"], 0)
+
+    def test_client_retries_overwritten_rows(self):
+        self.start()
+        self.client.encode(["bash"])
+        request = self.client._request
+        overwritten = []
+
+        def racing(texts):
+            rows = request(texts)
+            if not overwritten:
+                # 客户端读取之前该行被淘汰并分配给了另一个文本
+                row, _ = rows[0]
+                with self.server._lock:
+                    del self.server._rows["curl"]
+                    self.server._free_rows.append(row)
+                    self.server._assign("other", CountingBackend.vector("other"))
+                overwritten.append(row)
+            return rows
+
+        self.client._request = racing
+        self.assertVectors(["curl"], self.client.encode(["curl"]))
+        self.assertEqual(overwritten, [self.server._rows["other"]])
+        self.assertEqual(self.backend.calls.count(["curl"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import random
+import unittest
+
+import numpy as np
+
+from hanabi.models.hbt_columnar import ColumnarTree, _ChildIndex
+from hanabi.models.tree_node import TreeNode
+
+
+def colliding_keys(index, count):
+    """找出count个落在同一个初始槽位的键"""
+    by_slot = {}
+    key = 0
+    while True:
+        keys = by_slot.setdefault(index._slot(key), [])
+        keys.append(key)
+        if len(keys) == count:
+            return keys
+        key += 1
+
+
+def shape(node):
+    return (node.name, node.node_type, node.events_count, sorted((node.metadata or {}).items()),
+            sorted(shape(child) for child in node.children.values()))
+
+
+class ChildIndexTest(unittest.TestCase):
+
+    def test_set_get_delete(self):
+        index = _ChildIndex()
+        index.set(1 << 32 | 7, 3)
+        index.set(2 << 32 | 7, 4)
+        index.set(1 << 32 | 7, 5)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get(1 << 32 | 7), 5)
+        self.assertEqual(index.get(3 << 32 | 7), -1)
+        index.delete(2 << 32 | 7)
+        self.assertEqual(index.get(2 << 32 | 7), -1)
+        self.assertEqual(len(index), 1)
+        with self.assertRaises(KeyError):
+            index.delete(2 << 32 | 7)
+
+    def test_reinsert_after_tombstone(self):
+        index = _ChildIndex()
+        first, second, third = colliding_keys(index, 3)
+        for value, key in enumerate((first, second, third)):
+            index.set(key, value)
+        index.delete(second)
+        # 墓碑不能截断探测链
+        self.assertEqual(index.get(third), 2)
+        self.assertEqual(index.get(second), -1)
+        filled = index.filled
+        # 重新插入复用墓碑槽位，不占用新的空槽
+        index.set(second, 10)
+        self.assertEqual(index.filled, filled)
+        self.assertEqual(len(index), 3)
+        self.assertEqual([index.get(key) for key in (first, second, third)], [0, 10, 2])
+        # 已存在的键即使排在墓碑之后也只更新值，不产生重复项
+        index.delete(first)
+        index.set(third, 20)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index.keys).count(third), 1)
+
+    def test_growth(self):
+        index = _ChildIndex()
+        rng = random.Random(0)
+        expected = {}
+        while len(expected) < 5000:
+            key = rng.getrandbits(20) << 32 | rng.getrandbits(16)
+            expected[key] = len(expected)
+            index.set(key, expected[key])
+        capacity = len(index.keys)
+        self.assertEqual(capacity & (capacity - 1), 0)
+        self.assertLessEqual(len(expected) * 2, capacity)
+        self.assertEqual(len(index), len(expected))
+        self.assertTrue(all(index.get(key) == value for key, value in expected.items()))
+
+    def test_churn_does_not_grow(self):
+        # 反复增删时墓碑在原容量下重建清理，而不是无限扩容
+        index = _ChildIndex()
+        for key in range(10000):
+            index.set(key, key)
+            if key >= 8:
+                index.delete(key - 8)
+        self.assertEqual(len(index.keys), 64)
+        self.assertEqual(len(index), 8)
+        self.assertEqual([index.get(key) for key in range(9990, 10000)], [-1, -1] + list(range(9992, 10000)))
+
+    def test_bulk_load_matches_set(self):
+        rng = np.random.default_rng(0)
+        for count in (0, 1, 31, 32, 33, 1000):
+            parents = rng.integers(0, 1 << 20, count)
+            names = rng.integers(0, 1 << 16, count)
+            keys = np.unique((parents << 32) | names)
+            rng.shuffle(keys)
+            values = np.arange(len(keys), dtype=np.int32)
+            bulk = _ChildIndex.bulk_load(keys, values)
+            sequential = _ChildIndex()
+            for key, value in zip(keys.tolist(), values.tolist()):
+                sequential.set(key, value)
+            # 槽位排列可以不同，但容量、内容和查找结果一致
+            self.assertEqual(len(bulk.keys), len(sequential.keys))
+            self.assertEqual((len(bulk), bulk.filled), (sequential.used, sequential.filled))
+            self.assertEqual(sorted(zip(bulk.keys, bulk.values)), sorted(zip(sequential.keys, sequential.values)))
+            self.assertEqual([bulk.get(key) for key in keys.tolist()], values.tolist())
+            missing = rng.integers(1 << 20, 1 << 21, 100) << 32
+            self.assertEqual([bulk.get(key) for key in missing.tolist()], [-1] * 100)
+
+    def test_bulk_loaded_index_stays_mutable(self):
+        keys = np.array([(parent << 32) | 1 for parent in range(100)], dtype=np.int64)
+        index = _ChildIndex.bulk_load(keys, np.arange(100))
+        index.delete(int(keys[10]))
+        for parent in range(100, 300):
+            index.set((parent << 32) | 1, parent)
+        self.assertEqual(len(index), 299)
+        self.assertEqual(index.get(int(keys[10])), -1)
+        self.assertEqual(index.get(int(keys[11])), 11)
+        self.assertEqual(index.get((299 << 32) | 1), 299)
+
+
+class ColumnarConversionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = TreeNode("root", "root")
+        for path in (("execve", "bash", "-c"), ("execve", "bash", "--login"), ("execve", "curl"),
+                     ("connect", "nginx", "10.0.0.1:80:tcp"), ("openat", "cat", "/etc/passwd")):
+            node = self.root
+            for name in path:
+                node = node.add_child(name, "test")
+            node.increment_events_count(len(path))
+        self.root.get_child("execve").get_child("curl").update_metadata("note", "x")
+
+    def test_tree_node_round_trip(self):
+        tree = ColumnarTree.from_tree_node(self.root)
+        self.assertEqual(tree.to_dict(), self.root.to_dict())
+        restored = tree.to_tree_node()
+        self.assertEqual(shape(restored), shape(self.root))
+        self.assertEqual(restored.get_child("execve").get_child("bash").last_updated_ns,
+                         self.root.get_child("execve").get_child("bash").last_updated_ns)
+
+    def test_lookups_after_conversion(self):
+        tree = ColumnarTree.from_tree_node(self.root)
+        execve = tree.root.get_child("execve")
+        self.assertEqual(execve.get_child("bash").get_child("-c").events_count, 3)
+        self.assertIsNone(execve.get_child("nginx"))
+        # 经to_arrays/from_arrays用bulk_load重建索引后查找结果不变
+        rebuilt = ColumnarTree.from_arrays(tree.to_arrays())
+        for node_id in range(1, len(tree)):
+            name = tree.names.strings[tree.name_id[node_id]]
+            self.assertEqual(rebuilt.child(tree.parent[node_id], name), node_id)
+        self.assertEqual(rebuilt.to_dict(), tree.to_dict())
+
+    def test_detached_nodes_are_dropped(self):
+        tree = ColumnarTree.from_tree_node(self.root)
+        execve = tree.root.get_child("execve")
+        bash = execve.remove_child("bash")
+        self.assertIsNone(execve.get_child("bash"))
+        # 摘下后在另一个父节点下重新挂载
+        tree.root.get_child("connect").attach_child(bash)
+        self.root.get_child("connect").attach_child(self.root.get_child("execve").remove_child("bash"))
+        self.assertEqual(shape(tree.to_tree_node()), shape(self.root))
+        # 摘下后不再挂载的节点不出现在转换结果中
+        execve.remove_child("curl")
+        self.root.get_child("execve").remove_child("curl")
+        self.assertEqual(shape(tree.to_tree_node()), shape(self.root))
+        self.assertEqual(tree.node_count(), len(tree) - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import unittest
+
+from hanabi.utils.queue import LineFramer, decode_lines
+
+
+class LineFramerTest(unittest.TestCase):
+
+    def test_lines_split_across_chunks(self):
+        framer = LineFramer()
+        self.assertEqual(framer.feed(b'{"a":'), [])
+        self.assertEqual(framer.pending(), 5)
+        self.assertEqual(framer.feed(b'1}\n{"b":2}\n{"c"'), [b'{"a":1}', b'{"b":2}'])
+        self.assertEqual(framer.feed(b':3}\n'), [b'{"c":3}'])
+        self.assertEqual(framer.pending(), 0)
+
+    def test_blank_lines_are_skipped(self):
+        framer = LineFramer()
+        self.assertEqual(framer.feed(b'\n\n  \n{"a":1}\r\n\n'), [b'{"a":1}\r'])
+
+    def test_many_lines_in_one_chunk(self):
+        lines = [json.dumps({"n": n}).encode() for n in range(1000)]
+        framer = LineFramer()
+        self.assertEqual(framer.feed(b'\n'.join(lines) + b'\n{"n":'), lines)
+        self.assertEqual(framer.pending(), len(b'{"n":'))
+
+
+class DecodeLinesTest(unittest.TestCase):
+
+    def test_valid_lines(self):
+        events, errors = decode_lines([b'{"a":1}', b' {"b":[1,2]} \r', '{"c":"é"}'.encode()])
+        self.assertEqual(events, [{"a": 1}, {"b": [1, 2]}, {"c": "é"}])
+        self.assertEqual(errors, [])
+
+    def test_malformed_lines_are_not_fused(self):
+        # 两行损坏的数据拼接后恰好是合法的JSON，不能变成一个虚构的事件
+        events, errors = decode_lines([b'{"a":1},{"b":2', b'"c":3}'])
+        self.assertEqual(events, [])
+        self.assertEqual([index for index, _ in errors], [0, 1])
+
+    def test_bad_lines_are_reported_by_index(self):
+        events, errors = decode_lines([b'{"a":1}', b'1, 2', b'\xff{}', b'{"b":', b'{"c":3}'])
+        self.assertEqual(events, [{"a": 1}, {"c": 3}])
+        self.assertEqual([index for index, _ in errors], [1, 2, 3])
+        self.assertIsInstance(errors[1][1], UnicodeDecodeError)
+        self.assertIsInstance(errors[0][1], json.JSONDecodeError)
+
+    def test_empty(self):
+        self.assertEqual(decode_lines([]), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import time
+import unittest
+
+import numpy as np
+from prometheus_client import CollectorRegistry, generate_latest
+
+from hanabi.models import embedding
+from hanabi.models.manager import HBTModelManager, ModelRegistryMetrics, ShardedModelManager
+
+
+def event(container, proc="bash", cmdline="bash -c ls", rule="r"):
+    return {
+        "rule": rule,
+        "output_fields": {
+            "container.id": container,
+            "evt.type": "execve",
+            "proc.name": proc,
+            "proc.cmdline": cmdline,
+        },
+    }
+
+
+class HashBackend(embedding.EmbeddingBackend):
+    """按文本确定向量的假后端，不需要torch"""
+
+    def __init__(self, model_name=embedding.DEFAULT_MODEL_NAME, *, batch_size=16, max_length=256,
+                 truncate_dim=None, **_):
+        super().__init__(model_name, batch_size=batch_size, max_length=max_length, truncate_dim=truncate_dim)
+
+    def _encode_batch(self, batch):
+        return np.array([[len(text), sum(map(ord, text)) % 97, 1.0] for text in batch], dtype=np.float32)
+
+
+def scrape(manager):
+    registry = CollectorRegistry()
+    registry.register(ModelRegistryMetrics(manager))
+    return generate_latest(registry).decode()
+
+
+class RegistryMetricsTest(unittest.TestCase):
+
+    def test_in_process_counts(self):
+        manager = HBTModelManager(max_resident=2, maintain_interval=0)
+        try:
+            manager.add_events([event(f"c{i}") for i in range(5)])
+            metrics = scrape(manager)
+            self.assertIn('hanabi_models{state="resident"} 2.0', metrics)
+            self.assertIn('hanabi_models{state="spilled"} 3.0', metrics)
+            self.assertIn("hanabi_model_evictions_total 3.0", metrics)
+            self.assertEqual(sorted(manager.get_models(include_spilled=False)), ["c3", "c4"])
+            self.assertEqual(len(manager.get_models()), 5)
+            self.assertEqual(manager.registry_counts()["spilled"], 3)
+        finally:
+            manager.close()
+
+    def test_sharded_counts(self):
+        manager = ShardedModelManager(2, embedding_server="")
+        try:
+            manager.add_events([event(f"c{i}") for i in range(6)])
+            # 计数在分片处理完下一条消息前写入
+            manager.get_registry_stats()
+            deadline = time.monotonic() + 10
+            while manager.registry_counts()["resident"] < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIn('hanabi_models{state="resident"} 6.0', scrape(manager))
+            self.assertEqual(len(manager.get_models(include_spilled=False)), 6)
+        finally:
+            manager.close()
+
+
+class SpillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = dict(embedding._backend_settings)
+        embedding.register_backend("test-hash", HashBackend)
+        embedding.configure_backend("test-hash")
+        self.manager = HBTModelManager(maintain_interval=0, idle_ttl=3600)
+
+    def tearDown(self):
+        self.manager.close()
+        embedding._BACKENDS.pop("test-hash", None)
+        embedding._backend_settings.update(self.settings)
+        embedding.configure_backend()
+        embedding.configure_embedding_cache()
+
+    def test_spill_reload_round_trip(self):
+        manager = self.manager
+        manager.add_events([event("c1", proc, f"{proc} --x", rule="process") for proc in ("bash", "curl", "bash", "sh")])
+        manager.reconcile()
+        before = manager.get_models()["c1"]
+        self.assertIn("curl", str(before))
+        manager.spill("c1")
+        path = manager.spilled["c1"]
+        self.assertTrue(os.path.exists(path))
+        # 换出状态下读取不改变换出状态
+        self.assertEqual(manager.get_models()["c1"], before)
+        self.assertIn("c1", manager.spilled)
+        model = manager.get_or_create("c1")
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(model.get_model(), before)
+        self.assertEqual(manager.registry_counts(),
+                         {"resident": 1, "spilled": 0, "evictions": 1, "reloads": 1, "expired": 0})
+        # 加载后的模型继续学习
+        manager.add_events([event("c1", "wget", "wget x", rule="process")])
+        self.assertNotEqual(manager.get_models()["c1"], before)
+
+    def test_expired_spills_are_deleted(self):
+        manager = self.manager
+        manager.spill_max_age = 60
+        manager.add_events([event(f"c{i}") for i in range(3)])
+        for key in ("c0", "c1", "c2"):
+            manager.spill(key)
+        paths = dict(manager.spilled)
+        now = time.monotonic()
+        manager.spilled_at["c0"] = now - 120
+        manager.spilled_at["c1"] = now - 90
+        manager.maintain(force=True)
+        self.assertEqual(list(manager.spilled), ["c2"])
+        self.assertFalse(os.path.exists(paths["c0"]) or os.path.exists(paths["c1"]))
+        self.assertTrue(os.path.exists(paths["c2"]))
+        self.assertEqual(manager.registry_counts()["expired"], 2)
+        self.assertIn("hanabi_model_spill_expired_total 2.0", scrape(manager))
+        # 过期的容器再出现时按新容器处理
+        manager.add_events([event("c0")])
+        self.assertEqual(manager.reloads, 0)
+        self.assertEqual(sorted(manager.models), ["c0"])
+
+    def test_zero_max_age_keeps_spills(self):
+        manager = self.manager
+        manager.spill_max_age = 0
+        manager.add_events([event("c0")])
+        manager.spill("c0")
+        manager.spilled_at["c0"] -= 10 ** 6
+        manager.maintain(force=True)
+        self.assertIn("c0", manager.spilled)
+
+
+if __name__ == "__main__":
+    unittest.main()
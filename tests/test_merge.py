@@ -0,0 +1,79 @@
+import itertools
+import unittest
+
+from hanabi.models.hbt_columnar import ColumnarTree
+from hanabi.models.merge import ALIASES_KEY, merge_learning, merge_trees
+from hanabi.models.tree_node import TreeNode
+
+
+def tree(*paths, metadata=None):
+    root = TreeNode("root", "root")
+    for path in paths:
+        node = root
+        for name in path:
+            node = node.add_child(name, "test")
+        node.increment_events_count()
+    for name, (key, value) in (metadata or {}).items():
+        root.get_child("execve").get_child(name).update_metadata(key, value)
+    return root
+
+
+def shape(node):
+    return (node.name, node.node_type, node.events_count, sorted((node.metadata or {}).items()),
+            sorted(shape(child) for child in node.children.values()))
+
+
+class MergeTreesTest(unittest.TestCase):
+
+    def setUp(self):
+        # 归一化后相同的名称（大小写不同、路径中的数字不同）分散在不同的树中
+        self.trees = [
+            tree(("execve", "bash", "-c"), ("execve", "curl"), metadata={"bash": ("note", "a")}),
+            tree(("execve", "BASH", "-c"), ("connect", "nginx", "10.0.0.1:80:tcp")),
+            tree(("execve", "Bash", "--login"), ("connect", "nginx", "10.0.0.2:80:tcp"),
+                 metadata={"Bash": ("note", "b")}),
+            tree(("openat", "cat", "/proc/123/stat"), ("openat", "cat", "/proc/4567/stat")),
+        ]
+
+    def test_commutative(self):
+        expected = shape(merge_trees(self.trees))
+        for order in itertools.permutations(self.trees):
+            self.assertEqual(shape(merge_trees(order)), expected)
+
+    def test_associative(self):
+        a, b, c, d = self.trees
+        expected = shape(merge_trees(self.trees))
+        groupings = [
+            [merge_trees([a, b]), merge_trees([c, d])],
+            [merge_trees([merge_trees([a, b]), c]), d],
+            [a, merge_trees([b, merge_trees([c, d])])],
+            [merge_trees([d, b]), merge_trees([c, a])],
+        ]
+        for grouping in groupings:
+            self.assertEqual(shape(merge_trees(grouping)), expected)
+
+    def test_aliases_and_counts(self):
+        merged = merge_trees(self.trees)
+        bash = merged.get_child("execve").get_child("BASH")
+        self.assertEqual(bash.metadata[ALIASES_KEY], ["Bash", "bash"])
+        self.assertEqual(bash.metadata["note"], "b")
+        self.assertEqual(bash.get_child("-c").events_count, 2)
+        self.assertEqual(len(merged.get_child("openat").get_child("cat").children), 1)
+
+    def test_inputs_unchanged_and_columnar(self):
+        before = [shape(root) for root in self.trees]
+        columnar = [ColumnarTree.from_tree_node(root).root for root in self.trees]
+        self.assertEqual(shape(merge_trees(columnar)), shape(merge_trees(self.trees)))
+        self.assertEqual([shape(root) for root in self.trees], before)
+
+    def test_merge_learning(self):
+        self.assertTrue(merge_learning([False, True]))
+        self.assertFalse(merge_learning([False, False]))
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            merge_trees([])
+
+
+if __name__ == "__main__":
+    unittest.main()
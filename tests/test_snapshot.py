@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import unittest
+
+from hanabi.models import snapshot
+from hanabi.models.hbt_columnar import ColumnarTree
+
+
+def build(tree, paths):
+    for path in paths:
+        node = tree.root
+        for name in path:
+            node = node.add_child(name, "test")
+        node.increment_events_count()
+
+
+def shape(node):
+    # 子节点顺序不属于模型内容
+    return (node.name, node.events_count, dict(node.metadata),
+            sorted(shape(child) for child in node.children.values()))
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.tree = ColumnarTree()
+        build(self.tree, [("execve", "bash", "-c"), ("execve", "curl"), ("connect", "nginx", "80:tcp")])
+
+    def assertSameTree(self, restored):
+        self.assertEqual(shape(restored.root), shape(self.tree.root))
+
+    def test_full_round_trip(self):
+        self.tree.root.get_child("execve").update_metadata("note", "seen")
+        decoded = snapshot.decode(snapshot.encode_full(self.tree, {"learning": True}))
+        arrays, state = snapshot.merge([decoded])
+        self.assertSameTree(ColumnarTree.from_arrays(arrays))
+        self.assertEqual(state, {"learning": True})
+
+    def test_delta_contains_only_changes(self):
+        log = snapshot.SnapshotLog(self.directory)
+        # 已有节点早于增量的时钟容差
+        for node_id in range(len(self.tree)):
+            self.tree.last_seen[node_id] = time.time_ns() - 10 * snapshot.CLOCK_SLACK_NS
+        first = log.checkpoint(self.tree, {"n": 1})
+        self.assertTrue(first.endswith(".full.hbts"))
+        build(self.tree, [("execve", "bash", "-x"), ("openat", "cat", "/etc/passwd")])
+        second = log.checkpoint(self.tree, {"n": 2})
+        self.assertTrue(second.endswith(".delta.hbts"))
+        with open(second, "rb") as f:
+            delta = snapshot.decode(f.read())
+        # 只有新建的4个节点，已有节点没有变化
+        self.assertEqual(sorted(delta["ids"].tolist()), list(range(len(self.tree) - 4, len(self.tree))))
+
+        restored, state = snapshot.load_directory(self.directory)
+        self.assertSameTree(restored)
+        self.assertEqual(state, {"n": 2})
+
+    def test_removed_child_follows_delta(self):
+        log = snapshot.SnapshotLog(self.directory)
+        log.checkpoint(self.tree)
+        moved = self.tree.root.get_child("execve").remove_child("curl")
+        self.tree.root.get_child("connect").attach_child(moved)
+        log.checkpoint(self.tree)
+        restored, _ = snapshot.load_directory(self.directory)
+        self.assertSameTree(restored)
+        self.assertIsNone(restored.root.get_child("execve").get_child("curl"))
+
+    def test_compaction(self):
+        log = snapshot.SnapshotLog(self.directory, compact_every=3)
+        for round_ in range(7):
+            build(self.tree, [("execve", f"proc{round_}")])
+            log.checkpoint(self.tree, {"round": round_})
+            restored, state = snapshot.load_directory(self.directory)
+            self.assertSameTree(restored)
+            self.assertEqual(state, {"round": round_})
+        # 每3个增量写一次全量并删除之前的文件
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(sum(name.endswith(".full.hbts") for name in files), 1)
+        self.assertLessEqual(len(files), 4)
+
+        build(self.tree, [("execve", "late")])
+        log.checkpoint(self.tree)
+        path = snapshot.compact(self.directory)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(path)])
+        restored, _ = snapshot.load_directory(self.directory)
+        self.assertSameTree(restored)
+
+    def test_manager_defaults_to_columnar_with_snapshots(self):
+        from hanabi.models.hbt_builder import STORAGE_ENV
+        from hanabi.models.manager import HBTModelManager
+        if STORAGE_ENV in os.environ:
+            self.skipTest(f"{STORAGE_ENV} is set")
+        self.assertEqual(HBTModelManager(snapshot_dir=self.directory).storage, "columnar")
+        self.assertEqual(HBTModelManager(snapshot_dir=self.directory, storage="tree").storage, "tree")
+
+    def test_rejects_foreign_data(self):
+        with self.assertRaises(ValueError):
+            snapshot.decode(b"NOPE" + bytes(64))
+
+
+if __name__ == "__main__":
+    unittest.main()